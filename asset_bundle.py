@@ -0,0 +1,145 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import pygame
+
+BUNDLE_PATH = "assets.bundle"
+MAGIC = b"MEDBNDL2"
+ALIGNMENT = 16  # Byte alignment of every pixel buffer in the file
+ATLAS_FORMAT = "BGRA"  # Byte order of convert_alpha()'d surfaces on 32-bit displays, so frames blit without conversion
+
+# Layout of a bundle file:
+#   MAGIC, then the length of the index as a little-endian uint32, then the index as UTF-8 JSON, then
+#   raw pixel buffers starting at the next ALIGNMENT boundary. The index lists every image with its offset
+#   into the pixel data, size and pixel format, the rect of every animation frame in the "atlas" image, and
+#   the modification time of every source file so a stale bundle can be detected.
+# Frames are baked already packed into one atlas, so they load as subsurfaces of a single mapped texture.
+# The atlas is stored in the display's pixel layout; on a display with a different one, it is converted
+# once when loaded (the one copy made), rather than on every blit.
+
+# Pre-scaled, pre-flipped sprite frames and the scaled background, read straight from a memory-mapped
+# bundle file. Surfaces are made with pygame.image.frombuffer over the mapping, so loading copies nothing
+# and decodes nothing; pages are read from disk as the surfaces are first drawn.
+class AssetBundle:
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        (index_length,) = struct.unpack_from("<I", self.data, len(MAGIC))
+        index_start = len(MAGIC) + 4
+        index = json.loads(bytes(self.data[index_start:index_start + index_length]).decode("utf-8"))
+        header_length = index_start + index_length
+        self.data_start = header_length + -header_length % ALIGNMENT
+        self.sources = index["sources"]  # key: source path, value: modification time when baked
+        self.images = index["images"]  # key: image name, value: {"offset", "width", "height", "format"}
+        self.frame_lists = {tuple(entry["key"]): entry["rects"] for entry in index["frames"]}
+        self.view = memoryview(self.data)
+        self.atlas = None  # Surface over the mapped atlas, made when the first frames are asked for
+
+    def is_stale(self):
+        # True if any source file changed since the bundle was baked
+        for source, mtime in self.sources.items():
+            if not os.path.exists(source) or os.path.getmtime(source) != mtime:
+                return True
+        return False
+
+    def close(self):
+        self.atlas = None
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+    def get_image(self, name):
+        # Surface for one image in the bundle, or None if it isn't there
+        entry = self.images.get(name)
+        if entry is None:
+            return None
+        size = (entry["width"], entry["height"])
+        start = self.data_start + entry["offset"]
+        length = entry["width"] * entry["height"] * len(entry["format"])
+        return pygame.image.frombuffer(self.view[start:start + length], size, entry["format"])
+
+    def get_frames(self, key):
+        # Frame list for an AnimationCache frames key, or None if it wasn't baked
+        rects = self.frame_lists.get(tuple(key))
+        if rects is None:
+            return None
+        return [self.get_atlas().subsurface(rect) for rect in rects]
+
+    def get_atlas(self):
+        if self.atlas is None:
+            atlas = self.get_image(ATLAS_NAME)
+            if pygame.display.get_surface() is not None and atlas.get_masks() != get_display_alpha_masks():
+                atlas = atlas.convert_alpha()
+            self.atlas = atlas
+        return self.atlas
+
+ATLAS_NAME = "atlas"
+
+def get_display_alpha_masks():
+    # Pixel layout convert_alpha() gives on the current display
+    return pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks()
+
+def get_background_name(size):
+    return f"background_{size[0]}x{size[1]}"
+
+# Write every frame in an AnimationCache, packed into its atlas, and the background scaled to each size into one bundle file
+def bake(animation_cache, background_path, background_sizes, sources, path=BUNDLE_PATH):
+    images = {}
+    buffers = []
+    offset = 0
+
+    def add_image(name, surface, pixel_format):
+        nonlocal offset
+        pixels = pygame.image.tobytes(surface, pixel_format)
+        padding = -offset % ALIGNMENT
+        buffers.append(b"\0" * padding)
+        offset += padding
+        images[name] = {"offset": offset, "width": surface.get_width(), "height": surface.get_height(), "format": pixel_format}
+        buffers.append(pixels)
+        offset += len(pixels)
+
+    frames = []
+    atlas = animation_cache.pack_atlas()
+    if atlas is not None:
+        add_image(ATLAS_NAME, atlas, ATLAS_FORMAT)
+    for key, frame_list in animation_cache.frames.items():
+        rects = [[*frame.get_offset(), *frame.get_size()] for frame in frame_list]
+        frames.append({"key": list(key), "rects": rects})
+
+    background_original = pygame.image.load(background_path)
+    for size in background_sizes:
+        add_image(get_background_name(size), pygame.transform.scale(background_original, size), "RGB")
+
+    index = {
+        "sources": {source: os.path.getmtime(source) for source in sources},
+        "images": images,
+        "frames": frames,
+    }
+    index_bytes = json.dumps(index).encode("utf-8")
+    header_length = len(MAGIC) + 4 + len(index_bytes)
+
+    with open(path, "wb") as bundle_file:
+        bundle_file.write(MAGIC)
+        bundle_file.write(struct.pack("<I", len(index_bytes)))
+        bundle_file.write(index_bytes)
+        bundle_file.write(b"\0" * (-header_length % ALIGNMENT))
+        for buffer in buffers:
+            bundle_file.write(buffer)
+    return path
+
+if __name__ == "__main__":
+    # Usage: python asset_bundle.py [width height]
+    # Bakes the starting characters' frames and the map scaled to the screen size
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    from simulation import Simulation, sprite_sheet_paths
+    from sprite_cache import animation_cache
+    size = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (1280, 720)
+    Simulation(*size)  # Loads every frame the starting characters use into animation_cache
+    bake(animation_cache, "map.jpg", [size], sprite_sheet_paths + ["map.jpg"])
+    print(f"Wrote {BUNDLE_PATH}")
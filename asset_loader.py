@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import pygame
+
+# Decodes images on a thread pool while the main thread stays free, e.g. to draw a loading screen.
+# pygame releases the GIL while decoding, so several images load in parallel. Jobs are keyed, so asking
+# for the same image twice shares one load. convert()/convert_alpha() touch the display and are only
+# done on the main thread, in get().
+class AssetLoader:
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}  # key: job key, value: Future
+        self.converted = {}  # key: (job key, convert mode), value: Surface
+
+    def submit(self, key, function, *args):
+        # Run function(*args) in the background, once per key
+        future = self.futures.get(key)
+        if future is None:
+            future = self.executor.submit(function, *args)
+            self.futures[key] = future
+        return future
+
+    def load_image(self, path):
+        return self.submit(path, pygame.image.load, path)
+
+    def load_scaled_image(self, path, size):
+        # Decode and scale in the same background job
+        return self.submit((path, size), load_scaled_image, path, size)
+
+    def get_progress(self):
+        # (finished jobs, all jobs), for a progress bar
+        done = sum(1 for future in self.futures.values() if future.done())
+        return done, len(self.futures)
+
+    def is_done(self):
+        return all(future.done() for future in self.futures.values())
+
+    def wait(self):
+        wait(list(self.futures.values()))
+
+    def get(self, key, convert=None):
+        # Result of a job, waiting for it if needed. convert is None, "opaque" or "alpha" and is applied
+        # on the calling (main) thread once a display exists. Errors from the job are raised here.
+        if key not in self.futures:
+            if isinstance(key, str):
+                self.load_image(key)
+            else:
+                raise KeyError(key)
+        if convert is None or pygame.display.get_surface() is None:
+            return self.futures[key].result()
+        cache_key = (key, convert)
+        surface = self.converted.get(cache_key)
+        if surface is None:
+            surface = self.futures[key].result()
+            surface = surface.convert_alpha() if convert == "alpha" else surface.convert()
+            self.converted[cache_key] = surface
+        return surface
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def load_scaled_image(path, size):
+    return pygame.transform.scale(pygame.image.load(path), size)
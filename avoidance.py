@@ -0,0 +1,188 @@
+import math
+from movement import np
+
+DEFAULT_RADIUS = 12  # Pixels two characters keep between them
+DEFAULT_STRENGTH = 0.5  # Share of the overlap removed per 1/60 s
+DEFAULT_TURN = math.radians(30)  # Pushes are turned this far so characters meeting head-on step around each other
+WALKING_PUSH = 0.5  # Most a walking character is pushed per tick, as a share of its step, so it always gets ahead
+DEFAULT_MAX_NEIGHBORS = 8  # Characters looked at per bucket, so a packed crowd doesn't cost the square of its size
+KEY_STRIDE = 1 << 32  # Packs a bucket's (column, row) into one integer key
+HALF_NEIGHBORHOOD = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))  # A bucket and the neighbors with greater keys
+ZERO_DISTANCE_ANGLES = (0.618034, 0.381966)  # Spread characters on exactly the same spot in different directions
+
+# Pushes characters that come closer than radius apart, so crowds spread out instead of drawing on top of
+# each other. Each tick the positions are hashed into buckets radius wide, and each character only looks at
+# the characters in its own and the eight surrounding buckets, so the cost grows with the number of
+# characters rather than with its square; in a bucket packed fuller than max_neighbors only the first
+# max_neighbors are looked at, and the crowd thins out over a few ticks instead. Both characters of an
+# overlapping pair are pushed apart equally, turned a little to the same side, and no character moves more
+# than max_push in one tick, or than half its step while walking so it still reaches every node of its path.
+# Characters standing still make way for those walking but don't push them, so a crowd gathering at a
+# location spreads out around it while newcomers still reach it. The player takes part too, but only
+# pushes: NPCs make way for the player, and the player goes exactly where it was sent.
+# With NumPy, the whole pass runs over arrays; BatchMovement's positions are pushed in place.
+class Separation:
+    def __init__(self, radius=DEFAULT_RADIUS, strength=DEFAULT_STRENGTH, turn=DEFAULT_TURN, max_push=None,
+                 max_neighbors=DEFAULT_MAX_NEIGHBORS):
+        self.radius = radius
+        self.strength = strength
+        self.cos_turn = math.cos(turn)
+        self.sin_turn = math.sin(turn)
+        self.max_push = max_push if max_push is not None else radius / 4
+        self.max_neighbors = max_neighbors
+
+    def apply(self, character_manager, dt=1):
+        # Separate the characters after they moved this tick; dt is the length of the tick in 1/60 s
+        mover = character_manager.mover
+        player = character_manager.player
+        if mover is not None:
+            # The mover's rows with the player added as the last one
+            count = mover.count
+            positions = np.append(mover.pos[:count], [(player.pos.x, player.pos.y)], axis=0)
+            walking = np.append(mover.active[:count], bool(player.path))
+            speeds = np.append(mover.speed[:count], player.speed)
+            fixed = np.zeros(count + 1, dtype=bool)
+            fixed[count] = True
+            if self.separate_array(positions, walking, speeds, dt, fixed):
+                mover.pos[:count] = positions[:count]
+            return
+        characters = list(character_manager.NPC.values()) + [player]
+        if np is None:
+            self.separate_characters(characters, dt, player)
+            return
+        positions = np.array([(character.pos.x, character.pos.y) for character in characters], dtype=np.float64)
+        walking = np.array([bool(character.path) for character in characters])
+        speeds = np.array([character.speed for character in characters], dtype=np.float64)
+        fixed = np.zeros(len(characters), dtype=bool)
+        fixed[-1] = True
+        if self.separate_array(positions, walking, speeds, dt, fixed):
+            for character, (x, y) in zip(characters[:-1], positions.tolist()):
+                character.pos.update(x, y)
+
+    def separate_array(self, pos, walking, speed, dt=1, fixed=None):
+        # Push apart the rows of an (n, 2) array in place; walking flags the rows that are on a path, speed
+        # holds their speeds and fixed, if given, flags rows that push others but are never pushed.
+        # Returns whether any were close enough to push.
+        count = len(pos)
+        if count < 2:
+            return False
+        radius = self.radius
+        x = pos[:, 0].copy()
+        y = pos[:, 1].copy()
+        keys = np.floor(x / radius).astype(np.int64) * KEY_STRIDE + np.floor(y / radius).astype(np.int64)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        # Every pair of characters in the same or neighboring buckets, once: each bucket is paired with
+        # itself and the four neighbors after it. Positions here are in bucket order, so each lookup searches
+        # for sorted keys, which is much faster.
+        positions = np.arange(count)
+        firsts = []
+        seconds = []
+        for dx, dy in HALF_NEIGHBORHOOD:
+            neighbor_keys = sorted_keys + (dx * KEY_STRIDE + dy)
+            starts = np.searchsorted(sorted_keys, neighbor_keys, "left")
+            counts = np.searchsorted(sorted_keys, neighbor_keys, "right") - starts
+            np.minimum(counts, self.max_neighbors, out=counts)
+            total = int(counts.sum())
+            if not total:
+                continue
+            run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+            first = np.repeat(positions, counts)
+            second = np.repeat(starts, counts) + np.arange(total) - run_starts
+            if dx == 0 and dy == 0:
+                later = second > first
+                first, second = first[later], second[later]
+            firsts.append(order[first])
+            seconds.append(order[second])
+        first = np.concatenate(firsts)
+        second = np.concatenate(seconds)
+        delta_x = x[first] - x[second]
+        delta_y = y[first] - y[second]
+        distance = np.hypot(delta_x, delta_y)
+        close = distance < radius
+        if not close.any():
+            return False
+        first, second = first[close], second[close]
+        delta_x, delta_y, distance = delta_x[close], delta_y[close], distance[close]
+
+        # Unit vectors from the other character, with a made-up but symmetric one for characters on the same spot
+        on_top = distance == 0
+        if on_top.any():
+            low = np.minimum(first[on_top], second[on_top])
+            high = np.maximum(first[on_top], second[on_top])
+            angle = 2 * math.pi * (low * ZERO_DISTANCE_ANGLES[0] + high * ZERO_DISTANCE_ANGLES[1])
+            side = np.where(first[on_top] == low, 1.0, -1.0)
+            delta_x[on_top] = np.cos(angle) * side
+            delta_y[on_top] = np.sin(angle) * side
+            distance[on_top] = 1
+        amount = (radius - distance) * (0.5 * min(self.strength * dt, 1)) / distance
+        push_x = (delta_x * self.cos_turn - delta_y * self.sin_turn) * amount
+        push_y = (delta_x * self.sin_turn + delta_y * self.cos_turn) * amount
+
+        # Add up each character's pushes, the second of a pair pushed the other way, and limit their length
+        first_walking = walking[first]
+        second_walking = walking[second]
+        first_pushed = ~(first_walking & ~second_walking)
+        second_pushed = ~(second_walking & ~first_walking)
+        if fixed is not None:
+            first_fixed = fixed[first]
+            second_fixed = fixed[second]
+            first_pushed = (first_pushed | second_fixed) & ~first_fixed
+            second_pushed = (second_pushed | first_fixed) & ~second_fixed
+        rows = np.concatenate((first[first_pushed], second[second_pushed]))
+        push = np.empty((count, 2))
+        push[:, 0] = np.bincount(rows, np.concatenate((push_x[first_pushed], -push_x[second_pushed])), count)
+        push[:, 1] = np.bincount(rows, np.concatenate((push_y[first_pushed], -push_y[second_pushed])), count)
+        length = np.hypot(push[:, 0], push[:, 1])
+        limit = np.where(walking, np.minimum(speed * (WALKING_PUSH * dt), self.max_push), self.max_push)
+        too_long = length > limit
+        push[too_long] *= (limit[too_long] / length[too_long])[:, None]
+        pos += push
+        return True
+
+    def separate_characters(self, characters, dt=1, fixed=None):
+        # The same pass as separate_array over Character objects, with a dict of buckets; fixed is a character
+        # that pushes but is never pushed
+        radius = self.radius
+        buckets = {}
+        for character in characters:
+            buckets.setdefault((math.floor(character.pos.x / radius), math.floor(character.pos.y / radius)), []).append(character)
+        scale = 0.5 * min(self.strength * dt, 1)
+        indexes = {id(character): index for index, character in enumerate(characters)}
+        pushes = []
+        for index, character in enumerate(characters):
+            if character is fixed:
+                pushes.append((0, 0))
+                continue
+            x, y = character.pos
+            cell_x, cell_y = math.floor(x / radius), math.floor(y / radius)
+            push_x = push_y = 0
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for other in buckets.get((cell_x + dx, cell_y + dy), ())[:self.max_neighbors]:
+                        if other is character or (character.path and not other.path and other is not fixed):
+                            continue
+                        delta_x = x - other.pos.x
+                        delta_y = y - other.pos.y
+                        distance = math.hypot(delta_x, delta_y)
+                        if distance >= radius:
+                            continue
+                        if distance == 0:
+                            other_index = indexes[id(other)]
+                            low, high = min(index, other_index), max(index, other_index)
+                            angle = 2 * math.pi * (low * ZERO_DISTANCE_ANGLES[0] + high * ZERO_DISTANCE_ANGLES[1])
+                            side = 1 if index < other_index else -1
+                            delta_x, delta_y, distance = math.cos(angle) * side, math.sin(angle) * side, 1
+                        amount = (radius - distance) * scale / distance
+                        push_x += (delta_x * self.cos_turn - delta_y * self.sin_turn) * amount
+                        push_y += (delta_x * self.sin_turn + delta_y * self.cos_turn) * amount
+            length = math.hypot(push_x, push_y)
+            limit = min(character.speed * WALKING_PUSH * dt, self.max_push) if character.path else self.max_push
+            if length > limit:
+                push_x *= limit / length
+                push_y *= limit / length
+            pushes.append((push_x, push_y))
+        for character, (push_x, push_y) in zip(characters, pushes):
+            character.pos.x += push_x
+            character.pos.y += push_y
@@ -0,0 +1,284 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # No window; nothing here draws
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # Keep stdout to the JSON report
+import pygame
+from world import Graph, astar_search, distance, map_width, map_height
+from compact_graph import CompactGraph
+from flow_field import FlowFieldCache
+from farm import FarmGame, np
+from simulation import Simulation
+from characters import npc_animations_config, npc_idle_config
+from npc_schedule import daily_schedules
+from shards import ShardedPopulation
+
+SEED = 1  # Every run builds the same graphs, queries and characters, so results can be compared
+DEFAULT_GRAPH_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_CHARACTER_COUNTS = [100, 1000, 10000]
+DEFAULT_TILE_COUNTS = [100, 10000, 1000000]
+DEFAULT_REPEATS = 20
+DEFAULT_TOLERANCE = 0.2  # Slowdown over the baseline reported as a regression
+
+# Synthetic towns and timings of the hot paths on them, without a display.
+# Results are JSON: one record per (benchmark, size) with the time per call in milliseconds.
+# Save a run as a baseline and pass it to --compare on a later run to find regressions.
+
+def make_graph(node_count, seed=SEED, drop=0.3):
+    # Road network shaped like World's graph: nodes spread over the map and joined by bidirectional edges
+    # costing their length. It is a jittered grid where every row is a road and column 0 joins the rows,
+    # so all nodes are connected; the other crossings each exist with probability 1 - drop.
+    rng = random.Random(seed)
+    cols = max(2, round(math.sqrt(node_count * map_width / map_height)))
+    rows = math.ceil(node_count / cols)
+    spacing_x = map_width / cols
+    spacing_y = map_height / rows
+    graph = Graph(cell_size=max(spacing_x, spacing_y))
+    for node_id in range(node_count):
+        row, col = divmod(node_id, cols)
+        graph.add_node(node_id, pygame.Vector2((col + rng.uniform(0.1, 0.9)) * spacing_x,
+                                               (row + rng.uniform(0.1, 0.9)) * spacing_y))
+    for node_id in range(node_count):
+        row, col = divmod(node_id, cols)
+        right = node_id + 1
+        below = node_id + cols
+        if col + 1 < cols and right < node_count:
+            graph.add_bidirectional_edge(node_id, right, distance(graph.nodes[node_id], graph.nodes[right]))
+        if below < node_count and (col == 0 or rng.random() >= drop):
+            graph.add_bidirectional_edge(node_id, below, distance(graph.nodes[node_id], graph.nodes[below]))
+    return graph
+
+def measure(function, repeats):
+    # Wall time of each call, in seconds. The garbage collector is held off so it doesn't land in one run
+    # and not another.
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return times
+
+def make_result(name, size, times, calls=1):
+    per_call_ms = [t * 1000 / calls for t in times]
+    return {
+        "name": name,
+        "size": size,
+        "calls": calls,  # Calls timed together in each repeat
+        "repeats": len(times),
+        "median_ms": statistics.median(per_call_ms),
+        "min_ms": min(per_call_ms),
+        "max_ms": max(per_call_ms),
+    }
+
+def bench_graph(node_count, repeats):
+    rng = random.Random(SEED)
+    graph = make_graph(node_count)
+    pairs = [(rng.randrange(node_count), rng.randrange(node_count)) for _ in range(repeats)]
+    pair_iter = iter(pairs)
+    results = [make_result("astar_search", node_count,
+                           measure(lambda: astar_search(graph, *next(pair_iter)), repeats))]
+
+    compact = CompactGraph.from_graph(graph, graph.node_index.cell_size)
+    pair_iter = iter(pairs)
+    results.append(make_result("astar_search_compact", node_count,
+                               measure(lambda: compact.astar_search(*next(pair_iter)), repeats)))
+
+    # Many characters heading for the same place: one flow field, then a lookup per hop for each of them
+    crowd = [rng.randrange(node_count) for _ in range(100)]
+    goals = iter([rng.randrange(node_count) for _ in range(repeats)])
+    flow_fields = FlowFieldCache(graph)
+
+    def crowd_paths():
+        goal = next(goals)
+        for start in crowd:
+            flow_fields.get_path(start, goal)
+    results.append(make_result("flow_field_crowd", node_count, measure(crowd_paths, repeats), len(crowd)))
+
+    lookups = 1000
+    points = [pygame.Vector2(rng.uniform(0, map_width), rng.uniform(0, map_height)) for _ in range(lookups)]
+
+    def nearest_nodes():
+        for point in points:
+            graph.nearest_node(point)
+    results.append(make_result("nearest_node", node_count, measure(nearest_nodes, repeats), lookups))
+    return results
+
+def bench_characters(character_count, repeats, batch_movement, separation=False):
+    # NPCs walking between random named locations of the real town, one update per repeat
+    rng = random.Random(SEED)
+    simulation = Simulation(load_images=False, batch_movement=batch_movement, separation=separation)
+    try:
+        character_manager = simulation.character_manager
+        locations = simulation.world.allowed_positions
+        for index in range(character_count):
+            character_manager.add_character(
+                f"Villager {index}", None, npc_animations_config, npc_idle_config,
+                initial_pos=rng.choice(locations)["pos"], speed=rng.choice([1, 2.5, 7]))
+        for character in character_manager.NPC.values():
+            character.target_location_name = rng.choice(locations)["name"]
+            character.compute_path()
+        name = "character_manager_update_batch" if batch_movement else "character_manager_update"
+        if separation:
+            name += "_separation"
+        return [make_result(name, character_count, measure(character_manager.update, repeats))]
+    finally:
+        simulation.close()
+
+def bench_sharded(character_count, repeats, shard_count):
+    # The NPCs of bench_characters moved by shard_count worker processes, one step per repeat
+    rng = random.Random(SEED)
+    population = ShardedPopulation(shard_count, capacity=character_count)
+    try:
+        locations = population.world.allowed_positions
+        for index in range(character_count):
+            population.add_character(f"Villager {index}", rng.choice(locations)["pos"], rng.choice([1, 2.5, 7]))
+        for index in range(character_count):
+            population.set_target(index, rng.choice(locations)["name"])
+        population.step()  # Let the workers take in the characters before timing
+        return [make_result(f"sharded_update_{shard_count}", character_count, measure(population.step, repeats))]
+    finally:
+        population.close()
+
+def bench_schedule(character_count, repeats, frames=60, minutes_per_frame=0.5):
+    # NPCs on the daily schedules deciding where to go as in-game time passes, some frames per repeat
+    rng = random.Random(SEED)
+    simulation = Simulation(load_images=False)
+    try:
+        character_manager = simulation.character_manager
+        npc_scheduler = simulation.npc_scheduler
+        schedules = list(daily_schedules.values())
+        locations = simulation.world.allowed_positions
+        now = simulation.time_manager.total_minutes
+        for index in range(character_count):
+            name = f"Villager {index}"
+            character_manager.add_character(name, None, npc_animations_config, npc_idle_config,
+                                            initial_pos=rng.choice(locations)["pos"], speed=1)
+            npc_scheduler.add(character_manager.NPC[name], rng.choice(schedules), now + rng.uniform(0, 60))
+        frame_times = iter(now + minutes_per_frame * frame for frame in range(repeats * frames))
+
+        def update_frames():
+            for _ in range(frames):
+                npc_scheduler.update(next(frame_times))
+        return [make_result("npc_scheduler_update", character_count, measure(update_frames, repeats), frames)]
+    finally:
+        simulation.close()
+
+def bench_farm(tile_count, repeats, tile_size=10, frames=10):
+    # Every tile planted at a random time, then some 60 fps frames of growth per repeat
+    rng = random.Random(SEED)
+    cols = math.ceil(math.sqrt(tile_count))
+    rows = math.ceil(tile_count / cols)
+    # FarmGame insets its grid by 20 pixels at the sides and 50 + 20 at the top and bottom
+    farm_game = FarmGame(pygame.Rect(0, 0, cols * tile_size + 40, rows * tile_size + 70), tile_size=tile_size)
+    for cell in range(farm_game.rows * farm_game.cols):
+        farm_game.current_time = rng.uniform(0, 5000)
+        farm_game.handle_click(cell)
+    frame_ms = 1000 / 60
+    frame_times = iter(5000 + frame_ms * frame for frame in range(repeats * frames))
+
+    def update_frames():
+        for _ in range(frames):
+            farm_game.update(next(frame_times))
+    return [make_result("farm_game_update", farm_game.rows * farm_game.cols, measure(update_frames, repeats), frames)]
+
+def get_environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__ if np is not None else None,
+        "commit": commit,
+        "seed": SEED,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def run(graph_sizes, character_counts, tile_counts, repeats, only=None, shard_counts=()):
+    selected = lambda group: only is None or group in only
+    results = []
+    for node_count in graph_sizes if selected("graph") else []:
+        log(f"graph with {node_count} nodes")
+        results.extend(bench_graph(node_count, repeats))
+    for character_count in character_counts if selected("characters") else []:
+        log(f"{character_count} characters")
+        results.extend(bench_characters(character_count, repeats, batch_movement=False))
+        if np is not None:
+            results.extend(bench_characters(character_count, repeats, batch_movement=True))
+            results.extend(bench_characters(character_count, repeats, batch_movement=True, separation=True))
+        results.extend(bench_schedule(character_count, repeats))
+        for shard_count in shard_counts if np is not None else []:
+            results.extend(bench_sharded(character_count, repeats, shard_count))
+    for tile_count in tile_counts if selected("farm") else []:
+        log(f"farm with {tile_count} tiles")
+        results.extend(bench_farm(tile_count, repeats))
+    return {"environment": get_environment(), "repeats": repeats, "results": results}
+
+def compare(baseline, report, tolerance=DEFAULT_TOLERANCE):
+    # Print each result next to the baseline's. Returns the results more than tolerance slower.
+    baseline_results = {(result["name"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = baseline_results.get((result["name"], result["size"]))
+        if old is None:
+            log(f"{result['name']:34} {result['size']:>9} {result['median_ms']:12.4f} ms   (no baseline)")
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else math.inf
+        flag = "  REGRESSION" if ratio > 1 + tolerance else ""
+        log(f"{result['name']:34} {result['size']:>9} {result['median_ms']:12.4f} ms  x{ratio:6.2f}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+def log(message):
+    # Progress goes to stderr so stdout is only the JSON report
+    print(message, file=sys.stderr)
+
+def parse_sizes(text):
+    return [int(float(size)) for size in text.split(",") if size]
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [--graph-sizes 100,1e6] [--output results.json] [--compare baseline.json]
+    parser = argparse.ArgumentParser(description="Time pathfinding, character and farm updates on synthetic data")
+    parser.add_argument("--graph-sizes", type=parse_sizes, default=DEFAULT_GRAPH_SIZES)
+    parser.add_argument("--characters", type=parse_sizes, default=DEFAULT_CHARACTER_COUNTS)
+    parser.add_argument("--tiles", type=parse_sizes, default=DEFAULT_TILE_COUNTS)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--only", type=lambda text: text.split(","), help="graph, characters and/or farm")
+    parser.add_argument("--shards", type=parse_sizes, default=[], help="Also time the characters in this many processes")
+    parser.add_argument("--output", help="Write the JSON report here instead of to stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    pygame.init()
+    report = run(args.graph_sizes, args.characters, args.tiles, args.repeats, args.only, args.shards)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), report, args.tolerance)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,88 @@
+import pygame
+
+SCROLL_TOLERANCE = 1e-6  # Screen pixels a scroll can be off by whole pixels from float rounding
+
+# Scrolling and zooming view onto the world.
+# World coordinates are the simulation's (the whole map spans world_width x world_height); at zoom 1 the
+# whole world fits the view, as in the fixed full-screen map. Higher zoom shows a smaller part of it.
+# The center is kept on whole screen pixels, so panning moves the view by whole pixels and a drawing of
+# the view can be scrolled instead of redrawn.
+class Camera:
+    def __init__(self, view_width, view_height, world_width, world_height, max_zoom=8):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.max_zoom = max_zoom
+        self.zoom = 1
+        self.center = pygame.Vector2(world_width / 2, world_height / 2)
+        self.version = 0  # Bumped whenever the view changes, so cached drawings of it can be rebuilt
+
+    def get_scale(self):
+        # Screen pixels per world unit along x and y
+        return (self.view_width / self.world_width * self.zoom,
+                self.view_height / self.world_height * self.zoom)
+
+    def world_to_screen(self, pos):
+        scale_x, scale_y = self.get_scale()
+        return pygame.Vector2((pos[0] - self.center.x) * scale_x + self.view_width / 2,
+                              (pos[1] - self.center.y) * scale_y + self.view_height / 2)
+
+    def screen_to_world(self, pos):
+        scale_x, scale_y = self.get_scale()
+        return pygame.Vector2((pos[0] - self.view_width / 2) / scale_x + self.center.x,
+                              (pos[1] - self.view_height / 2) / scale_y + self.center.y)
+
+    def get_visible_rect(self):
+        # Part of the world in view, in world coordinates
+        scale_x, scale_y = self.get_scale()
+        width = self.view_width / scale_x
+        height = self.view_height / scale_y
+        return pygame.Rect(self.center.x - width / 2, self.center.y - height / 2, width + 1, height + 1)
+
+    def clamp(self):
+        # Keep the view inside the world, with the center on a whole screen pixel
+        scale_x, scale_y = self.get_scale()
+        half_width = self.view_width / scale_x / 2
+        half_height = self.view_height / scale_y / 2
+        self.center.x = min(max(round(self.center.x * scale_x) / scale_x, half_width), self.world_width - half_width)
+        self.center.y = min(max(round(self.center.y * scale_y) / scale_y, half_height), self.world_height - half_height)
+
+    def get_scroll(self, center, zoom):
+        # Whole screen pixels the view moved by since it was at center and zoom, or None if it zoomed or
+        # didn't move by whole pixels
+        if zoom != self.zoom:
+            return None
+        scale_x, scale_y = self.get_scale()
+        dx = (center[0] - self.center.x) * scale_x
+        dy = (center[1] - self.center.y) * scale_y
+        if abs(dx - round(dx)) > SCROLL_TOLERANCE or abs(dy - round(dy)) > SCROLL_TOLERANCE:
+            return None
+        return round(dx), round(dy)
+
+    def pan(self, dx, dy):
+        # Move the view by a number of screen pixels
+        scale_x, scale_y = self.get_scale()
+        self.center.x += dx / scale_x
+        self.center.y += dy / scale_y
+        self.clamp()
+        self.version += 1
+
+    def look_at(self, pos):
+        old_center = self.center.copy()
+        self.center.update(pos)
+        self.clamp()
+        if self.center != old_center:
+            self.version += 1
+
+    def zoom_by(self, factor, anchor=None):
+        # Zoom in (factor > 1) or out, keeping the world point under the screen position anchor in place
+        if anchor is None:
+            anchor = (self.view_width / 2, self.view_height / 2)
+        anchor_world = self.screen_to_world(anchor)
+        self.zoom = min(max(self.zoom * factor, 1), self.max_zoom)
+        scale_x, scale_y = self.get_scale()
+        self.center.x = anchor_world.x - (anchor[0] - self.view_width / 2) / scale_x
+        self.center.y = anchor_world.y - (anchor[1] - self.view_height / 2) / scale_y
+        self.clamp()
+        self.version += 1
@@ -0,0 +1,368 @@
+import pygame
+from world import astar_search
+from movement import BatchMovement, DIRECTIONS, np
+from path_service import PathService
+from avoidance import Separation
+from sprite_cache import animation_cache
+
+# Unified Character class
+class Character:
+    def __init__(self, world, character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction="down", is_player=False, load_images=True):
+        self.world = world
+        self.character_name = character_name
+        # Frame counts come from the configs so a headless character can animate without any sprites
+        self.frame_counts = {direction: params[1] for direction, params in animations_config.items()}
+        self.idle_frame_counts = {direction: params[1] for direction, params in idle_config.items()}
+        if load_images:
+            # Frames are shared with every other character using the same sheet and config; the sheet itself
+            # is only decoded if the frames aren't already cached or baked
+            self.animations = animation_cache.get_animations(sprite_sheet_path, animations_config)
+            self.idle_animations = animation_cache.get_animations(sprite_sheet_path, idle_config)
+        else:
+            self.animations = None
+            self.idle_animations = None
+        self.pos = pygame.Vector2(initial_pos)
+        self.previous_pos = self.pos.copy()  # Position before the last tick, for drawing between ticks
+        self.speed = speed  # Pixels per 1/60 s, like animation_speed and idle_timer
+        self.path = []
+        self.path_segments = None  # Rest of a path handed out a piece at a time, after self.path
+        self.direction = direction
+        self.frame_index = 0
+        self.animation_speed = 0.1
+        self.idle_timer = 0  # Time since last movement
+        self.is_idle = False  # Flag to check if character is idle
+        self.is_player = is_player  # Flag to check if character is controlled by player
+        self.hunger = 80
+        self.energy = 100
+        self.current_location_name = "Farm"
+        self.target_location_name = None
+        self.previous_location_name = None
+        self.mover = None  # BatchMovement that moves this character, if any
+        self.mover_index = None
+        self.path_service = None  # PathService that plans this character's paths, if any
+        self.path_ticket = None  # PathTicket for the path being planned
+
+    def move_along_path(self, dt=1):
+        # dt is the length of the tick in 1/60 s
+        distance_moved = 0  # Initialize distance moved
+        self.previous_pos.update(self.pos)
+        if self.path:
+            self.current_location_name = None
+            target_node = self.path[0]
+            target_pos = self.world.graph.nodes[target_node]
+
+            move_direction = target_pos - self.pos
+            distance = move_direction.length()
+            step = self.speed * dt
+            if distance > step:
+                move_direction = move_direction.normalize()
+                old_pos = self.pos.copy()
+                self.pos += move_direction * step
+                self.update_direction(move_direction)
+                distance_moved = (self.pos - old_pos).length()
+
+                # Reset idle timer and flag when moving
+                self.idle_timer = 0
+                self.is_idle = False
+
+                # Update frame index for movement animation
+                self.frame_index += self.animation_speed * dt
+                if self.frame_index >= self.frame_counts[self.direction]:
+                    self.frame_index = 0
+            else:
+                self.pos = target_pos.copy()
+                self.path.pop(0)
+                distance_moved = distance
+                if not self.path:
+                    self.path = self.take_next_segment()
+
+                if not self.path:
+                    # Arrived at destination
+                    self.previous_location_name = self.current_location_name
+                    self.current_location_name = self.target_location_name
+
+        else:
+            # Increment idle timer and ensure idle animation updates
+            self.idle_timer += dt
+            if self.idle_timer > 100:  # Adjust the threshold as needed
+                self.is_idle = True
+                self.frame_index += self.animation_speed * dt
+                if self.frame_index >= self.idle_frame_counts[self.direction]:
+                    self.frame_index = 0
+            else:
+                self.is_idle = False
+                self.frame_index = 0  # Reset frame index if not idle
+        return distance_moved
+
+    def update_direction(self, move_direction):
+        if abs(move_direction.x) > abs(move_direction.y):
+            self.direction = "right" if move_direction.x > 0 else "left"
+        else:
+            self.direction = "down" if move_direction.y > 0 else "up"
+
+    def get_current_sprite(self):
+        if self.is_idle:
+            return self.idle_animations[self.direction][int(self.frame_index)]
+        else:
+            return self.animations[self.direction][int(self.frame_index)]
+
+    def get_draw_rect(self, sprite, pos=None):
+        # Adjust position for center alignment
+        if pos is None:
+            pos = self.pos
+        return pygame.Rect(pos.x - sprite.get_width() // 2, pos.y - sprite.get_height() // 2, sprite.get_width(), sprite.get_height())
+
+    def get_draw_pos(self, alpha=1):
+        # Position alpha of the way from the previous tick's position to the current one
+        if alpha >= 1:
+            return self.pos
+        return self.previous_pos.lerp(self.pos, alpha)
+
+    def draw(self, surface):
+        sprite = self.get_current_sprite()
+        surface.blit(sprite, self.get_draw_rect(sprite))
+
+    def handle_input(self, click_pos):
+        if self.is_player:
+            # Only consider allowed_positions for destinations
+            closest_location = self.world.nearest_location(click_pos, self.world.grid_size * 2)
+            if closest_location is not None:
+                self.target_location_name = closest_location['name']
+                self.compute_path()
+
+    def compute_path(self):
+        graph = self.world.graph
+        if self.mover is not None:
+            self.mover.sync_character(self)
+
+        # Find the closest node to current position (could be an intermediate node)
+        closest_node = graph.nearest_node(self.pos)
+
+        # Get target node (must be a named location)
+        target_node = self.world.node_ids[self.target_location_name]
+
+        self.path_segments = None
+        if self.path_service is not None:
+            # Stand still until CharacterManager hands over the path
+            self.path_ticket = self.path_service.request(closest_node, target_node, self)
+            self.path = []
+            if self.mover is not None:
+                self.mover.set_path(self)
+            return
+        self.path_ticket = None
+
+        # Look the path up in the precomputed shortest-path table or the destination's flow field, or plan it
+        # through the regions (only the first piece now, the rest as it is walked), or fall back to A*
+        if self.world.path_table is not None:
+            path = self.world.path_table.get_path(closest_node, target_node)
+        elif self.world.flow_fields is not None:
+            path = self.world.flow_fields.get_path(closest_node, target_node)
+        elif self.world.region_graph is not None:
+            self.path_segments = self.world.region_graph.find_path_segments(closest_node, target_node)
+            path = self.take_next_segment()
+        else:
+            try:
+                path = astar_search(graph, closest_node, target_node)
+            except KeyError:
+                path = []  # Unreachable, as the other routes report it
+        self.start_path(path, closest_node)
+
+    def start_path(self, path, closest_node):
+        if not path:
+            # The target can't be reached: stay here, still at the location the character was at
+            self.path = []
+            self.path_segments = None
+            if self.mover is not None:
+                self.mover.set_path(self)
+            return
+        self.path = path
+
+        # Ensure the path starts from the current position
+        if self.pos != self.world.graph.nodes[closest_node]:
+            self.path.insert(0, closest_node)
+
+        if self.mover is not None:
+            self.mover.set_path(self)
+
+    def take_next_segment(self):
+        # Next piece of a path from find_path_segments, or [] once there are none left
+        if self.path_segments is not None:
+            for segment in self.path_segments:
+                if segment:
+                    return segment
+            self.path_segments = None
+        return []
+
+    def check_for_allowed_position(self):
+        loc = self.world.nearest_location(self.pos, self.world.grid_size // 2)
+        if loc is not None:
+            self.current_location_name = loc['name']
+            return True
+        return False
+
+    def has_arrived_at_new_location(self):
+        # Check if the player is at an allowed position (named location)
+        loc = self.world.nearest_location(self.pos, self.world.grid_size // 2)
+        if loc is not None and self.current_location_name != loc['name']:
+            self.previous_location_name = self.current_location_name
+            self.current_location_name = loc['name']
+            return True
+        return False
+
+# NPC Manager to handle multiple NPCs and player
+class CharacterManager:
+    def __init__(self, world, load_images=True, batch_movement=False, async_paths=False, path_processes=0, separation=False):
+        self.world = world
+        self.load_images = load_images  # False for headless runs that never draw
+        self.NPC = {}
+        self.player = None
+        # Move all NPCs in one vectorized step instead of one move_along_path call each
+        self.mover = BatchMovement(world.graph) if batch_movement else None
+        # Plan paths a few at a time under a time budget, or in worker processes, instead of on request
+        self.path_service = PathService(world, processes=path_processes) if async_paths or path_processes else None
+        # Keep NPCs from walking through and standing on each other
+        self.separation = Separation() if separation else None
+        self.sprite_extent = 0  # Width or height of the largest frame, for culling without looking at each sprite
+
+    def add_character(self, character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction="down", is_player=False):
+        character = Character(self.world, character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction, is_player, self.load_images)
+        character.path_service = self.path_service
+        if character.animations is not None:
+            for frames in list(character.animations.values()) + list(character.idle_animations.values()):
+                for frame in frames:
+                    self.sprite_extent = max(self.sprite_extent, frame.get_width(), frame.get_height())
+        if is_player:
+            self.player = character
+        else:
+            self.NPC[character_name] = character
+            if self.mover is not None:
+                self.mover.add(character)
+
+    def update(self, dt=1):
+        # dt is the length of the tick in 1/60 s
+        if self.path_service is not None:
+            self.deliver_paths()
+        if self.mover is not None:
+            self.mover.update(dt)
+        else:
+            for character_name in self.NPC:
+                self.NPC[character_name].move_along_path(dt)
+        if self.separation is not None:
+            self.separation.apply(self, dt)
+        distance_moved = self.player.move_along_path(dt)
+        return distance_moved
+
+    def close(self):
+        # Stop the path planning worker processes, if any
+        if self.path_service is not None:
+            self.path_service.close()
+
+    def begin_frame(self):
+        # Called before the ticks of each frame, so path searches get their time budget per frame
+        if self.path_service is not None:
+            self.path_service.begin_frame()
+
+    def deliver_paths(self):
+        # Start characters on the paths that finished planning, unless they have asked for another since
+        for ticket in self.path_service.update():
+            for character in ticket.waiters:
+                if character.path_ticket is ticket:
+                    character.path_ticket = None
+                    character.start_path(list(ticket.path), ticket.start)
+
+    def sync(self):
+        # Bring the Character objects up to date with batched movement before they are read
+        if self.mover is not None:
+            self.mover.sync()
+
+    def is_anyone_moving(self):
+        # Whether the player or any NPC is walking a path
+        if self.player.path:
+            return True
+        if self.mover is not None:
+            return bool(self.mover.active[:self.mover.count].any())
+        return any(character.path for character in self.NPC.values())
+
+    def get_characters(self):
+        # All characters, with the player last
+        return list(self.NPC.values()) + [self.player]
+
+    # The (sprite, screen rect, character) of every character that can be seen, in draw order, for Surface.blits.
+    # Characters wholly outside view (a screen Rect) or wholly behind covered (e.g. the open modal's rect) are
+    # left out, and the rest are sorted by the bottom of their sprite so nearer characters are drawn over
+    # farther ones. alpha is how far to draw between the last two ticks, and camera maps world to screen.
+    # With batched movement the NPCs are culled over the mover's arrays and only the visible ones are looked
+    # at one by one, straight from the arrays, so nothing has to be synced first.
+    def get_sprite_batch(self, alpha=1, camera=None, view=None, covered=None):
+        entries = []
+        if self.mover is None:
+            characters = self.get_characters()
+        else:
+            entries.extend(self.get_mover_sprites(alpha, camera, view))
+            characters = [self.player]
+        for character in characters:
+            sprite = character.get_current_sprite()
+            pos = character.get_draw_pos(alpha)
+            if camera is not None:
+                pos = camera.world_to_screen(pos)
+            rect = character.get_draw_rect(sprite, pos)
+            if view is None or view.colliderect(rect):
+                entries.append((sprite, rect, character))
+        if covered is not None:
+            entries = [entry for entry in entries if not covered.contains(entry[1])]
+        # Stable, so characters level with each other keep the order get_characters() gives them
+        entries.sort(key=lambda entry: entry[1].bottom)
+        return entries
+
+    def get_mover_sprites(self, alpha, camera, view):
+        mover = self.mover
+        count = mover.count
+        pos = mover.pos[:count]
+        if alpha < 1:
+            pos = mover.previous_pos[:count] + (pos - mover.previous_pos[:count]) * alpha
+        x = pos[:, 0]
+        y = pos[:, 1]
+        if camera is not None:
+            scale_x, scale_y = camera.get_scale()
+            x = (x - camera.center.x) * scale_x + camera.view_width / 2
+            y = (y - camera.center.y) * scale_y + camera.view_height / 2
+        rows = np.arange(count)
+        if view is not None:
+            # Sprites are centered on the position, so one whose center is more than its size away is out of view
+            extent = self.sprite_extent
+            visible = (x > view.left - extent) & (x < view.right + extent) & (y > view.top - extent) & (y < view.bottom + extent)
+            rows = np.flatnonzero(visible)
+        characters = mover.characters
+        directions = mover.direction[rows].tolist()
+        frame_indexes = mover.frame_index[rows].tolist()
+        idle_flags = mover.is_idle[rows].tolist()
+        for row, screen_x, screen_y, direction, frame_index, is_idle in zip(
+                rows.tolist(), x[rows].tolist(), y[rows].tolist(), directions, frame_indexes, idle_flags):
+            character = characters[row]
+            animations = character.idle_animations if is_idle else character.animations
+            sprite = animations[DIRECTIONS[direction]][int(frame_index)]
+            width, height = sprite.get_size()
+            rect = pygame.Rect(screen_x - width // 2, screen_y - height // 2, width, height)
+            if view is None or view.colliderect(rect):
+                yield sprite, rect, character
+
+    def draw(self, surface, alpha=1, camera=None, covered=None):
+        # Every visible character in one blits call
+        batch = self.get_sprite_batch(alpha, camera, surface.get_clip(), covered)
+        surface.blits([(sprite, rect) for sprite, rect, _ in batch], doreturn=False)
+
+# Animation configurations for player and NPC
+player_animations_config = {
+    "down": (3, 6, False),
+    "up": (5, 6, False),
+    "right": (4, 6, False),
+    "left": (4, 6, True)
+}
+player_idle_config = {
+    "down": (0, 6, False),
+    "up": (2, 6, False),
+    "right": (1, 6, False),
+    "left": (1, 6, True)
+}
+npc_animations_config = player_animations_config
+npc_idle_config = player_idle_config
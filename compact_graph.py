@@ -0,0 +1,188 @@
+import heapq
+import math
+from array import array
+import pygame
+from spatial_index import PackedSpatialGrid
+
+INF = float("inf")
+
+# Compact, read-only form of Graph for large generated maps.
+# Nodes are the integers 0..n-1, coordinates live in two contiguous float arrays and adjacency is stored
+# in CSR form: the neighbors of node i are neighbors[offsets[i]:offsets[i + 1]] with matching costs.
+class CompactGraph:
+    def __init__(self, xs, ys, offsets, neighbors, costs, cell_size=20):
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.costs = costs
+        self.listeners = []
+        self.node_index = PackedSpatialGrid(xs, ys, cell_size)  # Nearest-node lookups over xs and ys
+        # Dict-like views so code written against Graph.nodes / Graph.edges keeps working
+        self.nodes = CompactNodes(self)
+        self.edges = CompactEdges(self)
+
+    @classmethod
+    def from_graph(cls, graph, cell_size=20):
+        # Node ids must already be 0..n-1, which is how World numbers them
+        node_count = len(graph.nodes)
+        if sorted(graph.nodes) != list(range(node_count)):
+            raise ValueError("CompactGraph needs node ids 0..n-1")
+        xs = array('d', (graph.nodes[node_id].x for node_id in range(node_count)))
+        ys = array('d', (graph.nodes[node_id].y for node_id in range(node_count)))
+        offsets = array('i', [0])
+        neighbors = array('i')
+        costs = array('d')
+        for node_id in range(node_count):
+            for neighbor, cost in graph.edges[node_id]:
+                neighbors.append(neighbor)
+                costs.append(cost)
+            offsets.append(len(neighbors))
+        return cls(xs, ys, offsets, neighbors, costs, cell_size)
+
+    @classmethod
+    def from_edges(cls, positions, edges, cell_size=20):
+        # Build straight from the (x, y) of nodes 0..n-1 in order and (from_node, to_node, cost) bidirectional
+        # edges, without a Graph in between. Neighbors are listed in the order Graph.add_bidirectional_edge
+        # would add them, so searches break ties the same way as on a Graph built from the same edges.
+        xs = array('d')
+        ys = array('d')
+        for x, y in positions:
+            xs.append(x)
+            ys.append(y)
+        node_count = len(xs)
+        froms = array('i')
+        tos = array('i')
+        edge_costs = array('d')
+        for from_node, to_node, cost in edges:
+            if not (0 <= from_node < node_count and 0 <= to_node < node_count):
+                raise KeyError((from_node, to_node))
+            froms.append(from_node)
+            tos.append(to_node)
+            edge_costs.append(cost)
+
+        # Counting sort of both directions of every edge by the node they start from
+        offsets = array('i', [0]) * (node_count + 1)
+        for from_node, to_node in zip(froms, tos):
+            offsets[from_node + 1] += 1
+            offsets[to_node + 1] += 1
+        for node_id in range(node_count):
+            offsets[node_id + 1] += offsets[node_id]
+        neighbors = array('i', [0]) * offsets[node_count]
+        costs = array('d', [0]) * offsets[node_count]
+        next_slot = offsets[:-1]
+        for from_node, to_node, cost in zip(froms, tos, edge_costs):
+            slot = next_slot[from_node]
+            neighbors[slot] = to_node
+            costs[slot] = cost
+            next_slot[from_node] = slot + 1
+            slot = next_slot[to_node]
+            neighbors[slot] = from_node
+            costs[slot] = cost
+            next_slot[to_node] = slot + 1
+        return cls(xs, ys, offsets, neighbors, costs, cell_size)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def add_listener(self, listener):
+        # The graph never changes, so listeners are kept but never called
+        self.listeners.append(listener)
+
+    def heuristic(self, a, b):
+        return math.hypot(self.xs[a] - self.xs[b], self.ys[a] - self.ys[b])
+
+    def nearest_node(self, pos):
+        return self.node_index.nearest(pos)
+
+    def astar_search(self, start, goal):
+        xs = self.xs
+        ys = self.ys
+        offsets = self.offsets
+        neighbors = self.neighbors
+        costs = self.costs
+        goal_x = xs[goal]
+        goal_y = ys[goal]
+        hypot = math.hypot
+
+        node_count = len(xs)
+        cost_so_far = array('d', [INF]) * node_count
+        came_from = array('i', [-1]) * node_count
+        cost_so_far[start] = 0
+        frontier = [(0, start)]
+
+        while frontier:
+            _, current = heapq.heappop(frontier)
+
+            if current == goal:
+                break
+
+            current_cost = cost_so_far[current]
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = neighbors[edge]
+                new_cost = current_cost + costs[edge]
+                if new_cost < cost_so_far[neighbor]:
+                    cost_so_far[neighbor] = new_cost
+                    priority = new_cost + hypot(goal_x - xs[neighbor], goal_y - ys[neighbor])
+                    heapq.heappush(frontier, (priority, neighbor))
+                    came_from[neighbor] = current
+
+        # Reconstruct path
+        current = goal
+        path = []
+        while current != start:
+            if current == -1:
+                raise KeyError(goal)  # Goal is unreachable, as astar_search does on a Graph
+            path.append(current)
+            current = came_from[current]
+        path.append(start)
+        path.reverse()
+        return path
+
+# Read-only view of node positions, indexed like Graph.nodes
+class CompactNodes:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.xs)
+
+    def __iter__(self):
+        return iter(range(len(self.graph.xs)))
+
+    def __contains__(self, node_id):
+        return 0 <= node_id < len(self.graph.xs)
+
+    def __getitem__(self, node_id):
+        return pygame.Vector2(self.graph.xs[node_id], self.graph.ys[node_id])
+
+    def keys(self):
+        return range(len(self.graph.xs))
+
+    def items(self):
+        for node_id in range(len(self.graph.xs)):
+            yield node_id, self[node_id]
+
+# Read-only view of adjacency lists, indexed like Graph.edges
+class CompactEdges:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.xs)
+
+    def __iter__(self):
+        return iter(range(len(self.graph.xs)))
+
+    def __getitem__(self, node_id):
+        graph = self.graph
+        start = graph.offsets[node_id]
+        end = graph.offsets[node_id + 1]
+        return list(zip(graph.neighbors[start:end], graph.costs[start:end]))
+
+    def keys(self):
+        return range(len(self.graph.xs))
+
+    def items(self):
+        for node_id in range(len(self.graph.xs)):
+            yield node_id, self[node_id]
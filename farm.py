@@ -0,0 +1,141 @@
+import pygame
+from array import array
+from scheduler import EventScheduler
+
+try:
+    import numpy as np
+except ImportError:  # Fall back to the array module, which supports the same indexing
+    np = None
+
+# Colors for each growth stage; stage 0 is bare soil
+stage_colors = [(139,69,19), (85,107,47), (34,139,34), (0,128,0)]
+
+def make_array(kind, size, fill=0):
+    # kind is "bool", "int" or "float"
+    if np is not None:
+        return np.full(size, fill, dtype={"bool": np.bool_, "int": np.int8, "float": np.float64}[kind])
+    return array({"bool": 'b', "int": 'b', "float": 'd'}[kind], [fill]) * size
+
+# Define the FarmGame class for the farming mini-game.
+# The plots form a grid stored as parallel arrays (planted, growth stage, time of the next stage) indexed
+# by cell number row * cols + col, so a click maps to its cell by integer division and a cell's position
+# comes from its number. Drawing is one batched blit of pre-rendered stage tiles, for only the rows and
+# columns inside the surface's clip area.
+class FarmGame:
+    # growth_stage_durations is in the same unit as the times passed to update(),
+    # e.g. simulated milliseconds or TimeManager minutes
+    def __init__(self, modal_rect, growth_stage_durations=None, tile_size=100):
+        self.modal_rect = modal_rect
+        self.farm_rect = pygame.Rect(modal_rect.x + 20, modal_rect.y + 50, modal_rect.width - 40, modal_rect.height - 70)
+        self.tile_size = tile_size
+        self.max_growth_stage = 3
+        self.growth_stage_durations = growth_stage_durations or [5000, 5000, 5000]  # milliseconds for each stage
+        self.current_time = 0  # Set by update()
+        self.init_tiles()
+        self.stage_tiles = self.render_stage_tiles()
+
+    def init_tiles(self):
+        # Initialize a grid of farm tiles
+        self.rows = self.farm_rect.height // self.tile_size
+        self.cols = self.farm_rect.width // self.tile_size
+        tile_count = self.rows * self.cols
+        self.planted = make_array("bool", tile_count, False)
+        self.growth_stage = make_array("int", tile_count, 0)
+        self.next_growth_time = make_array("float", tile_count, 0)  # Only meaningful while a tile is growing
+        self.scheduler = EventScheduler()  # Next growth stage of every growing tile, by cell number
+
+    def render_stage_tiles(self):
+        # One pre-drawn tile per growth stage, with its border
+        tiles = []
+        for color in stage_colors:
+            tile = pygame.Surface((self.tile_size, self.tile_size))
+            tile.fill(color)
+            pygame.draw.rect(tile, (0, 0, 0), tile.get_rect(), 1)
+            tiles.append(tile)
+        return tiles
+
+    def get_cell(self, pos):
+        # Cell number of the tile under pos, or None if pos is not on a tile
+        col = (pos[0] - self.farm_rect.x) // self.tile_size
+        row = (pos[1] - self.farm_rect.y) // self.tile_size
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return int(row * self.cols + col)
+        return None
+
+    def get_tile_rect(self, cell):
+        row, col = divmod(cell, self.cols)
+        return pygame.Rect(self.farm_rect.x + col * self.tile_size, self.farm_rect.y + row * self.tile_size,
+                           self.tile_size, self.tile_size)
+
+    def schedule_growth(self, cell, stage_start_time):
+        # Queue the cell's next stage if it is still growing
+        if self.planted[cell] and self.growth_stage[cell] < self.max_growth_stage:
+            growth_time = stage_start_time + self.growth_stage_durations[self.growth_stage[cell] - 1]
+            self.next_growth_time[cell] = growth_time
+            self.scheduler.schedule(growth_time, cell)
+
+    def reschedule(self):
+        # Rebuild the scheduler from the arrays, e.g. after they were loaded from a save
+        self.scheduler = EventScheduler()
+        if np is not None:
+            cells = np.flatnonzero(self.planted & (self.growth_stage < self.max_growth_stage))
+            self.scheduler.schedule_all(zip(self.next_growth_time[cells].tolist(), cells.tolist()))
+        else:
+            self.scheduler.schedule_all(
+                (self.next_growth_time[cell], cell) for cell in range(len(self.planted))
+                if self.planted[cell] and self.growth_stage[cell] < self.max_growth_stage
+            )
+
+    def handle_click(self, cell):
+        if not self.planted[cell]:
+            self.planted[cell] = True
+            self.growth_stage[cell] = 1
+            self.schedule_growth(cell, self.current_time)
+        elif self.growth_stage[cell] == self.max_growth_stage:
+            # Harvest the plant
+            self.planted[cell] = False
+            self.growth_stage[cell] = 0
+            # Maybe add to player's inventory
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            cell = self.get_cell(event.pos)
+            if cell is not None:
+                self.handle_click(cell)
+
+    def update(self, current_time):
+        self.current_time = current_time
+        # Grow only the plants whose next stage is due. Each stage starts when the previous one was due,
+        # so a large time step (fast-forward) catches up on every stage it covers.
+        for growth_time, cell in self.scheduler.pop_due(current_time):
+            # Skip events left over from a harvested or replanted tile
+            if not self.planted[cell] or self.next_growth_time[cell] != growth_time or self.growth_stage[cell] >= self.max_growth_stage:
+                continue
+            self.growth_stage[cell] += 1
+            self.schedule_growth(cell, growth_time)
+
+    def draw(self, surface):
+        # Draw the farm tiles that can be seen in one batch
+        area = surface.get_clip().clip(self.get_grid_rect())
+        if not area.width or not area.height:
+            return
+        tile_size = self.tile_size
+        left, top = self.farm_rect.topleft
+        first_col = (area.left - left) // tile_size
+        last_col = (area.right - 1 - left) // tile_size
+        first_row = (area.top - top) // tile_size
+        last_row = (area.bottom - 1 - top) // tile_size
+        stage_tiles = self.stage_tiles
+        cols = self.cols
+        batch = []
+        for row in range(first_row, last_row + 1):
+            y = top + row * tile_size
+            start = row * cols
+            stages = self.growth_stage[start + first_col:start + last_col + 1].tolist()
+            batch.extend((stage_tiles[stage], (left + col * tile_size, y))
+                         for col, stage in enumerate(stages, first_col))
+        surface.blits(batch, doreturn=False)
+
+    def get_grid_rect(self):
+        # Area the tiles cover, which can stop short of farm_rect's right and bottom edge
+        return pygame.Rect(self.farm_rect.topleft, (self.cols * self.tile_size, self.rows * self.tile_size))
@@ -0,0 +1,91 @@
+import heapq
+from collections import OrderedDict
+
+INF = float("inf")
+EPSILON = 1e-9  # Tolerance when comparing summed float edge costs
+DEFAULT_MAX_FIELDS = 64  # Destinations kept; each field holds an entry per node
+
+# Every node's next hop towards one goal, from a single Dijkstra run outwards from the goal.
+# Edges are bidirectional, so the distance from the goal is the distance to it. Any number of characters
+# heading for the goal share the field, and each hop of their path is one lookup.
+class FlowField:
+    def __init__(self, graph, goal):
+        self.goal = goal
+        self.dist = {goal: 0}  # key: node id, value: path length to the goal
+        self.next_hop = {goal: goal}  # key: node id, value: neighbor one step nearer the goal
+        frontier = [(0, goal)]
+        while frontier:
+            current_dist, current = heapq.heappop(frontier)
+            if current_dist > self.dist[current]:
+                continue
+            for neighbor, cost in graph.edges[current]:
+                new_dist = current_dist + cost
+                if new_dist < self.dist.get(neighbor, INF):
+                    self.dist[neighbor] = new_dist
+                    self.next_hop[neighbor] = current
+                    heapq.heappush(frontier, (new_dist, neighbor))
+
+    def get_path(self, start):
+        # Same shape as astar_search: starts with start and ends with the goal. Empty if the goal is unreachable.
+        next_hop = self.next_hop
+        if start not in next_hop:
+            return []
+        path = [start]
+        current = start
+        while current != self.goal:
+            current = next_hop[current]
+            path.append(current)
+        return path
+
+    def is_changed_by_edge(self, from_node, to_node, cost, added):
+        # Whether adding or removing the edge can change any next hop
+        dist = self.dist
+        if added:
+            # It matters only if it shortens the way from one end through the other
+            return (dist.get(from_node, INF) + cost < dist.get(to_node, INF) - EPSILON
+                    or dist.get(to_node, INF) + cost < dist.get(from_node, INF) - EPSILON)
+        # It matters only if some node's next hop runs over it
+        return self.next_hop.get(from_node) == to_node or self.next_hop.get(to_node) == from_node
+
+# Flow fields by destination, built when a destination is first asked for and kept for the next
+# characters heading there, up to max_fields of them (least recently used go first). It listens to
+# the graph and drops only the fields an edge change affects.
+class FlowFieldCache:
+    def __init__(self, graph, max_fields=DEFAULT_MAX_FIELDS):
+        self.graph = graph
+        self.max_fields = max_fields
+        self.fields = OrderedDict()  # key: goal node id, value: FlowField
+        graph.add_listener(self)
+
+    def get_field(self, goal):
+        field = self.fields.get(goal)
+        if field is None:
+            field = FlowField(self.graph, goal)
+            self.fields[goal] = field
+            if len(self.fields) > self.max_fields:
+                self.fields.popitem(last=False)
+        else:
+            self.fields.move_to_end(goal)
+        return field
+
+    def get_path(self, start, goal):
+        return self.get_field(goal).get_path(start)
+
+    def clear(self):
+        self.fields.clear()
+
+    # Graph listener callbacks
+
+    def node_added(self, node_id):
+        pass  # Not connected to anything yet, so no field changes
+
+    def edge_added(self, from_node, to_node, cost):
+        self.drop_changed(from_node, to_node, cost, True)
+
+    def edge_removed(self, from_node, to_node, cost):
+        self.drop_changed(from_node, to_node, cost, False)
+
+    def drop_changed(self, from_node, to_node, cost, added):
+        for goal in [goal for goal, field in self.fields.items()
+                     if field.is_changed_by_edge(from_node, to_node, cost, added)]:
+            del self.fields[goal]
@@ -0,0 +1,61 @@
+import time
+import pygame
+
+# Events that count as the player doing something, which ends idle mode
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL, pygame.MOUSEMOTION)
+
+# Paces the main loop: how many simulation ticks each frame runs, and how long to sleep after it.
+# Real time since the last frame goes into an accumulator that is spent in whole ticks, so the simulation
+# advances tick_rate ticks per real second whatever the frame rate is. What is left over is alpha, the
+# fraction of a tick to draw characters between their last two positions. One Clock lives for the whole
+# game, so tick() really caps the frame rate and sleeps instead of spinning.
+# Frames drop to idle_fps while the window is in the background, or after idle_after seconds without
+# input while the caller says nothing needs watching; any input brings the full rate back.
+class FrameScheduler:
+    def __init__(self, tick_rate, fps=60, idle_fps=15, idle_after=10, max_ticks_per_frame=8):
+        self.tick_duration = 1 / tick_rate
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after  # Seconds
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.clock = pygame.time.Clock()
+        self.accumulator = 0  # Real seconds not yet simulated
+        self.alpha = 0
+        self.frame_time = 0  # Real seconds since the previous frame
+        self.last_time = None
+        self.last_input_time = time.perf_counter()
+        self.focused = True
+        self.idle = False
+
+    def handle_event(self, event):
+        if event.type in INPUT_EVENTS:
+            self.last_input_time = time.perf_counter()
+        elif event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            self.focused = False
+        elif event.type in (pygame.WINDOWFOCUSGAINED, pygame.WINDOWRESTORED, pygame.WINDOWSHOWN):
+            self.focused = True
+            self.last_input_time = time.perf_counter()
+
+    def advance(self):
+        # Number of ticks to simulate this frame
+        now = time.perf_counter()
+        if self.last_time is None:
+            self.last_time = now
+        self.frame_time = now - self.last_time
+        self.last_time = now
+        self.accumulator += self.frame_time
+        ticks = int(self.accumulator / self.tick_duration)
+        if ticks > self.max_ticks_per_frame:
+            # Too far behind to catch up, e.g. after the window was dragged; drop the backlog instead of
+            # running ever more ticks per frame
+            ticks = self.max_ticks_per_frame
+            self.accumulator = ticks * self.tick_duration
+        self.accumulator -= ticks * self.tick_duration
+        self.alpha = self.accumulator / self.tick_duration
+        return ticks
+
+    def wait(self, busy=False):
+        # Sleep until the next frame is due. busy means something on screen needs the full frame rate.
+        idle_for = time.perf_counter() - self.last_input_time
+        self.idle = not self.focused or (not busy and idle_for > self.idle_after)
+        self.clock.tick(self.idle_fps if self.idle else self.fps)
@@ -1,659 +1,199 @@
+import argparse
+import os
 import pygame
 import sys
-import heapq  # For priority queue in A* algorithm
-
-# Initialize pygame
-pygame.init()
-
-# Screen settings
-screen_info = pygame.display.Info()  # Get screen resolution
-#screen_width, screen_height = screen_info.current_w, screen_info.current_h
-#screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
-screen_width, screen_height = 1280, 720
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Medieval")
-
-# Load the background image (original size)
-background_image_original = pygame.image.load("map.jpg")
-original_width, original_height = background_image_original.get_size()
-
-# Scale the background image to full screen
-background_image = pygame.transform.scale(background_image_original, (screen_width, screen_height))
-
-# Grid settings
-grid_size = 20  # Size of each grid cell in pixels
-
-# Define allowed movement positions with names based on the original image's coordinates
-allowed_positions_original = [
-    {"name": "Farm", "pos": pygame.Vector2(1300, 2500)},
-    {"name": "Miller", "pos": pygame.Vector2(1100, 5000)},
-    {"name": "Tavern", "pos": pygame.Vector2(4100, 630)},
-    {"name": "Bakery", "pos": pygame.Vector2(5300, 630)},
-    {"name": "Brewery", "pos": pygame.Vector2(6600, 630)},
-    {"name": "Butcher", "pos": pygame.Vector2(7900, 630)},
-    {"name": "Herbalist", "pos": pygame.Vector2(4300, 2600)},
-    {"name": "Cartwright", "pos": pygame.Vector2(4200, 4800)},
-    {"name": "Carpenter", "pos": pygame.Vector2(5000, 5800)},
-    {"name": "Blacksmith", "pos": pygame.Vector2(6400, 5800)},
-    {"name": "Elder", "pos": pygame.Vector2(7600, 5800)},
-    {"name": "Manor", "pos": pygame.Vector2(9700, 5900)},
-    {"name": "Church", "pos": pygame.Vector2(9500, 4300)},
-    {"name": "Market", "pos": pygame.Vector2(9300, 1800)},
-]
-# Define modal coordinates (position and size)
-modal_position_original = pygame.Vector2(4800, 1720)
-modal_size_original = pygame.Vector2(3000, 3380)
-
-# Define intermediate nodes (positions the player passes through but can't stop at)
-intermediate_positions_original = [
-    {"pos": pygame.Vector2(2500, 4500)},
-    {"pos": pygame.Vector2(3500, 2500)},
-    {"pos": pygame.Vector2(4500, 2500)},
-]
-
-def scale_position(pos):
-    # Scale a position from the original image size to the scaled display size.
-    x_scale = screen_width / original_width
-    y_scale = screen_height / original_height
-    return pygame.Vector2(pos.x * x_scale, pos.y * y_scale)
-
-# Scale allowed positions
-allowed_positions = []
-for loc in allowed_positions_original:
-    scaled_pos = scale_position(loc["pos"])
-    allowed_positions.append({"name": loc["name"], "pos": scaled_pos})
-
-# Scale modal position and size
-modal_position = scale_position(modal_position_original)
-modal_size = scale_position(modal_size_original)
-
-# Scale intermediate positions
-intermediate_positions = [scale_position(node['pos']) for node in intermediate_positions_original]
-
-# Define the graph nodes and edges
-class Graph:
-    def __init__(self):
-        self.nodes = {}  # key: node id, value: position
-        self.edges = {}  # key: node id, value: list of tuples (neighbor_id, cost)
-
-    def add_node(self, node_id, position):
-        self.nodes[node_id] = position
-        self.edges[node_id] = []
-
-    def add_bidirectional_edge(self, from_node, to_node, cost):
-        self.edges[from_node].append((to_node, cost))
-        self.edges[to_node].append((from_node, cost))
-
-# Create the graph
-graph = Graph()
-
-# Add nodes to the graph
-# Assign an id to each node
-node_id_counter = 0
-node_ids = {}  # Map positions to node ids
-
-for loc in allowed_positions:
-    node_id = node_id_counter
-    node_id_counter += 1
-    graph.add_node(node_id, loc['pos'])
-    node_ids[loc['name']] = node_id
-node_id_counter = len(allowed_positions)
-
-# Add intermediate nodes to the graph
-for pos in intermediate_positions:
-    node_id = node_id_counter
-    node_id_counter += 1
-    graph.add_node(node_id, pos)
-
-# Update connections to include intermediate nodes
-# For example, connecting 'Farm' to an intermediate node, then to 'Herbalist'
-intermediate_node_ids = list(range(len(allowed_positions), len(allowed_positions) + len(intermediate_positions)))
-
-# Example intermediate nodes (you should define actual paths)
-# For simplicity, let's assume direct paths between some locations
-# In a real game, you'd define paths that follow roads or other constraints
-
-# Add edges (paths) between nodes
-def distance(pos1, pos2):
-    return (pos1 - pos2).length()
-
-# Define connections
-connections = [
-    ("Farm", intermediate_node_ids[0]),
-    (intermediate_node_ids[0], "Herbalist"),
-    ("Herbalist", "Tavern"),
-    ("Tavern", "Bakery"),
-    ("Bakery", "Brewery"),
-    ("Brewery", "Butcher"),
-    ("Herbalist", "Cartwright"),
-    ("Cartwright", "Miller"),
-    ("Miller", "Carpenter"),
-    ("Carpenter", "Blacksmith"),
-    ("Blacksmith", "Elder"),
-    ("Elder", "Manor"),
-    ("Manor", "Church"),
-    ("Church", "Market"),
-    ("Market", "Butcher"),
-    ("Butcher", "Elder"),
-    # ... add more connections as needed
-]
-
-# Convert named locations to node IDs in connections
-def get_node_id(name_or_id):
-    if isinstance(name_or_id, str):
-        return node_ids[name_or_id]
-    else:
-        return name_or_id
-
-# Add edges to the graph
-for from_loc, to_loc in connections:
-    from_node = get_node_id(from_loc)
-    to_node = get_node_id(to_loc)
-    from_pos = graph.nodes[from_node]
-    to_pos = graph.nodes[to_node]
-    cost = distance(from_pos, to_pos)
-    graph.add_bidirectional_edge(from_node, to_node, cost)
-
-# A* Pathfinding algorithm
-def heuristic(a, b):
-    return (graph.nodes[a] - graph.nodes[b]).length()
-
-def astar_search(start, goal):
-    frontier = []
-    heapq.heappush(frontier, (0, start))
-    came_from = {start:None}
-    cost_so_far = {start: 0}
-
-    while frontier:
-        _, current = heapq.heappop(frontier)
-
-        if current == goal:
-            break
-
-        for neighbor, cost in graph.edges[current]:
-            new_cost = cost_so_far[current] + cost
-            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                cost_so_far[neighbor] = new_cost
-                priority = new_cost + heuristic(goal, neighbor)
-                heapq.heappush(frontier, (priority, neighbor))
-                came_from[neighbor] = current
-
-    # Reconstruct path
-    current = goal
-    path = []
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.append(start)
-    path.reverse()
-    return path
-
-# Function to load a specific row of sprites from a sprite sheet
-def load_sprites(sprite_sheet, row, num_columns, sprite_width=32, sprite_height=32, scale_factor=2, flip=False):
-    sprites = []
-    for col in range(num_columns):
-        sprite = sprite_sheet.subsurface((col * sprite_width, row * sprite_height, sprite_width, sprite_height))
-        sprite = pygame.transform.scale(sprite, (sprite_width * scale_factor, sprite_height * scale_factor))
-        if flip:
-            sprite = pygame.transform.flip(sprite, True, False)
-        sprites.append(sprite)
-    return sprites
-
-# Draw an "X" on the screen at the given position
-def draw_x(position, size=20, color=(255, 0, 0)):
-    pygame.draw.line(screen, color, (position.x - size, position.y - size), (position.x + size, position.y + size), 3)
-    pygame.draw.line(screen, color, (position.x + size, position.y - size), (position.x - size, position.y + size), 3)
-
-# TimeManager class to handle the game's time
-class TimeManager:
-    def __init__(self):
-        self.total_minutes = 8 * 60  # Start at Day 1, 8:00 AM
-
-    def advance_time(self, minutes):
-        self.total_minutes += minutes
-
-    def get_current_time(self):
-        total_minutes = int(self.total_minutes)
-        current_day = total_minutes // (24 * 60) + 1
-        minutes_in_day = total_minutes % (24 * 60)
-        current_hour = minutes_in_day // 60
-        current_minute = minutes_in_day % 60
-        return current_day, current_hour, current_minute
-
-    def draw_time(self, surface):
-        current_day, current_hour, current_minute = self.get_current_time()
-        font = pygame.font.Font(None, 36)
-        time_text = f"Day {current_day}, {current_hour:02d}:{current_minute:02d}"
-        time_surf = font.render(time_text, True, (255, 255, 255))
-        # Position at top-left corner
-        surface.blit(time_surf, (10, 10))
-
-# Unified Character class
-class Character:
-    def __init__(self, character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction="down", is_player=False):
-        self.character_name = character_name
-        self.image = pygame.image.load(sprite_sheet_path)
-        self.animations = self.load_animations(animations_config)
-        self.idle_animations = self.load_animations(idle_config)
-        self.pos = pygame.Vector2(initial_pos)
-        self.speed = speed
-        self.path = []
-        self.direction = direction
-        self.frame_index = 0
-        self.animation_speed = 0.1
-        self.idle_timer = 0  # Time since last movement
-        self.is_idle = False  # Flag to check if character is idle
-        self.is_player = is_player  # Flag to check if character is controlled by player
-        self.hunger = 80
-        self.energy = 100
-        self.current_location_name = "Farm"
-        self.target_location_name = None
-        self.previous_location_name = None
-
-    def load_animations(self, config):
-        animations = {}
-        for direction, params in config.items():
-            row, num_columns, flip = params
-            animations[direction] = load_sprites(self.image, row, num_columns, flip=flip)
-        return animations
-
-    def move_along_path(self):
-        distance_moved = 0  # Initialize distance moved
-        if self.path:
-            self.current_location_name = None
-            target_node = self.path[0]
-            target_pos = graph.nodes[target_node]
-
-            move_direction = target_pos - self.pos
-            distance = move_direction.length()
-            if distance > self.speed:
-                move_direction = move_direction.normalize()
-                old_pos = self.pos.copy()
-                self.pos += move_direction * self.speed
-                self.update_direction(move_direction)
-                distance_moved = (self.pos - old_pos).length()
-
-                # Reset idle timer and flag when moving
-                self.idle_timer = 0
-                self.is_idle = False
-
-                # Update frame index for movement animation
-                self.frame_index += self.animation_speed
-                if self.frame_index >= len(self.animations[self.direction]):
-                    self.frame_index = 0
-            else:
-                self.pos = target_pos.copy()
-                self.path.pop(0)
-                distance_moved = distance
-
-                if not self.path:
-                    # Arrived at destination
-                    self.previous_location_name = self.current_location_name
-                    self.current_location_name = self.target_location_name
-
-        else:
-            # Increment idle timer and ensure idle animation updates
-            self.idle_timer += 1
-            if self.idle_timer > 100:  # Adjust the threshold as needed
-                self.is_idle = True
-                self.frame_index += self.animation_speed
-                if self.frame_index >= len(self.idle_animations[self.direction]):
-                    self.frame_index = 0
-            else:
-                self.is_idle = False
-                self.frame_index = 0  # Reset frame index if not idle
-        return distance_moved
-
-    def update_direction(self, move_direction):
-        if abs(move_direction.x) > abs(move_direction.y):
-            self.direction = "right" if move_direction.x > 0 else "left"
-        else:
-            self.direction = "down" if move_direction.y > 0 else "up"
-
-    def get_current_sprite(self):
-        if self.is_idle:
-            return self.idle_animations[self.direction][int(self.frame_index)]
-        else:
-            return self.animations[self.direction][int(self.frame_index)]
-
-    def draw(self, surface):
-        sprite = self.get_current_sprite()
-
-        # Adjust position for center alignment
-        adjusted_pos = (self.pos.x - sprite.get_width() // 2, self.pos.y - sprite.get_height() // 2)
-        surface.blit(sprite, adjusted_pos)
-
-    def handle_input(self, click_pos):
-        if self.is_player:
-            # Only consider allowed_positions for destinations
-            closest_location = min(
-                allowed_positions,
-                key=lambda loc: loc['pos'].distance_to(click_pos)
-            )
-            if closest_location['pos'].distance_to(click_pos) < grid_size * 2:
-                self.target_location_name = closest_location['name']
-                self.compute_path()
-
-    def compute_path(self):
-        # Find the closest node to current position (could be an intermediate node)
-        closest_node = min(
-            graph.nodes.keys(),
-            key=lambda node_id: (self.pos - graph.nodes[node_id]).length()
-        )
-
-        # Get target node (must be a named location)
-        target_node = node_ids[self.target_location_name]
-
-        # Compute path using A*
-        self.path = astar_search(closest_node, target_node)
-
-        # Ensure the path starts from the current position
-        if self.pos != graph.nodes[closest_node]:
-            self.path.insert(0, closest_node)
-
-    def check_for_allowed_position(self):
-        for loc in allowed_positions:
-            if self.pos.distance_to(loc['pos']) < grid_size // 2:
-                self.current_location_name = loc['name']
-                return True
-        return False
-
-    def has_arrived_at_new_location(self):
-        # Check if the player is at an allowed position (named location)
-        for loc in allowed_positions:
-            if self.pos.distance_to(loc['pos']) < grid_size // 2:
-                if self.current_location_name != loc['name']:
-                    self.previous_location_name = self.current_location_name
-                    self.current_location_name = loc['name']
-                    return True
-        return False
-
-# NPC Manager to handle multiple NPCs and player
-class CharacterManager:
-    def __init__(self):
-        self.NPC = {}
-        self.player = None
-
-    def add_character(self, character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction="down", is_player=False):
-        character = Character(character_name, sprite_sheet_path, animations_config, idle_config, initial_pos, speed, direction, is_player)
-        if is_player:
-            self.player = character
-        else:
-            self.NPC[character_name] = character
-
-    def update(self):
-        for character_name in self.NPC:
-            self.NPC[character_name].move_along_path()
-        distance_moved = self.player.move_along_path()
-        return distance_moved
-
-    def draw(self):
-        for character_name in self.NPC:
-            self.NPC[character_name].draw(screen)
-        self.player.draw(screen)
-
-# Animation configurations for player and NPC
-player_animations_config = {
-    "down": (3, 6, False),
-    "up": (5, 6, False),
-    "right": (4, 6, False),
-    "left": (4, 6, True)
-}
-player_idle_config = {
-    "down": (0, 6, False),
-    "up": (2, 6, False),
-    "right": (1, 6, False),
-    "left": (1, 6, True)
-}
-npc_animations_config = player_animations_config
-npc_idle_config = player_idle_config
-
-# Initialize the CharacterManager and add characters
-character_manager = CharacterManager()
-initial_pos = allowed_positions[0]['pos']
-character_manager.add_character("player", "Cute_Fantasy_Free/Player/player.png", player_animations_config, player_idle_config,
-                                initial_pos=initial_pos, speed=20, is_player=True)
-character_manager.add_character("enemy1", "Cute_Fantasy_Free/Enemies/Skeleton.png", npc_animations_config, npc_idle_config,
-                                initial_pos=(scale_position(pygame.Vector2(2990, 3860))), direction="left", speed=1)
-character_manager.add_character("enemy2", "Cute_Fantasy_Free/Enemies/Skeleton.png", npc_animations_config, npc_idle_config,
-                                initial_pos=(scale_position(pygame.Vector2(3000, 4350))), direction="left", speed=1)
-character_manager.add_character("butcher", "Cute_Fantasy_Free/Player/player.png", npc_animations_config, npc_idle_config,
-                                initial_pos=allowed_positions[5]['pos'], speed=1)
-character_manager.add_character("brewer", "Cute_Fantasy_Free/Player/player.png", npc_animations_config, npc_idle_config,
-                                initial_pos=allowed_positions[4]['pos'], speed=1)
-
-# Initialize the TimeManager
-time_manager = TimeManager()
-
-# Define a Button class for modal interactions
-class Button:
-    def __init__(self, rect, text, callback):
-        self.rect = rect
-        self.text = text
-        self.callback = callback
-        self.font = pygame.font.Font(None, 24)
-        self.text_surf = self.font.render(self.text, True, (255, 255, 255))
-        self.text_rect = self.text_surf.get_rect(center=self.rect.center)
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.rect.collidepoint(event.pos):
-                self.callback()
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (100, 100, 100), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 2)
-        surface.blit(self.text_surf, self.text_rect)
-
-# Define the FarmTile class for the farming mini-game
-class FarmTile:
-    def __init__(self, rect):
-        self.rect = rect
-        self.planted = False
-        self.growth_stage = 0
-        self.growth_time = 0
-        self.max_growth_stage = 3
-        self.growth_stage_durations = [5000, 5000, 5000]  # milliseconds for each stage
-        self.last_update_time = pygame.time.get_ticks()
-
-    def handle_click(self):
-        if not self.planted:
-            self.planted = True
-            self.growth_stage = 1
-            self.last_update_time = pygame.time.get_ticks()
-        elif self.growth_stage == self.max_growth_stage:
-            # Harvest the plant
-            self.planted = False
-            self.growth_stage = 0
-            # Maybe add to player's inventory
-
-    def update(self):
-        if self.planted and self.growth_stage < self.max_growth_stage:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.last_update_time > self.growth_stage_durations[self.growth_stage - 1]:
-                self.growth_stage += 1
-                self.last_update_time = current_time
-
-    def draw(self, surface):
-        # Draw the tile
-        if self.planted:
-            # Draw the plant image according to growth stage
-            color = [(139,69,19), (85,107,47), (34,139,34), (0,128,0)][self.growth_stage]
-            pygame.draw.rect(surface, color, self.rect)
-        else:
-            # Draw soil
-            pygame.draw.rect(surface, (139,69,19), self.rect)
-        # Draw tile border
-        pygame.draw.rect(surface, (0, 0, 0), self.rect, 1)
-
-# Define the FarmGame class for the farming mini-game
-class FarmGame:
-    def __init__(self, modal_rect):
-        self.modal_rect = modal_rect
-        self.farm_rect = pygame.Rect(modal_rect.x + 20, modal_rect.y + 50, modal_rect.width - 40, modal_rect.height - 70)
-        self.tiles = []  # List of tiles
-        self.init_tiles()
-
-    def init_tiles(self):
-        # Initialize a grid of farm tiles
-        tile_size = 100
-        rows = self.farm_rect.height // tile_size
-        cols = self.farm_rect.width // tile_size
-        self.tiles = []
-        for row in range(rows):
-            for col in range(cols):
-                tile_rect = pygame.Rect(self.farm_rect.x + col * tile_size, self.farm_rect.y + row * tile_size, tile_size, tile_size)
-                tile = FarmTile(tile_rect)
-                self.tiles.append(tile)
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            # Check if click is within any tile
-            for tile in self.tiles:
-                if tile.rect.collidepoint(event.pos):
-                    tile.handle_click()
-                    break
-
-    def update(self):
-        # Update the growth of plants
-        for tile in self.tiles:
-            tile.update()
-
-    def draw(self, surface):
-        # Draw the farm tiles
-        for tile in self.tiles:
-            tile.draw(surface)
-
-# Define the Modal class to handle different modal windows
-class Modal:
-    def __init__(self, position, size):
-        self.rect = pygame.Rect(position.x, position.y, size.x, size.y)
-        self.active = False
-        self.background_image = None
-        self.interactive_elements = []
-        self.location_name = ""
-        self.curr_game = None  # Will hold the farming mini-game instance when at farm
-
-    def set_content(self, location_name):
-        self.location_name = location_name
-        self.curr_game = None
-        # Load the background image and interactive components based on location
-        if self.location_name == "Farm":
-            self.background_image = pygame.Surface(self.rect.size)
-            self.background_image.fill((200, 255, 200))  # Light green background
-            self.curr_game = farm_game
-        else:
-            self.background_image = pygame.Surface(self.rect.size)
-            self.background_image.fill((200, 200, 200))
-            self.curr_game = None  # No farming game at other locations
-
-    def handle_event(self, event):
-        if self.active:
-            if self.curr_game == farm_game:
-                farm_game.handle_event(event)
-
-    def update(self):
-        """
-        if self.active:
-            if self.curr_game == farm_game:
-                farm_game.update()
-        """
-
-    def draw(self, surface):
-        if self.active:
-            # Draw the modal background
-            surface.blit(self.background_image, self.rect.topleft)
-            # Draw the interactive elements
-            if self.location_name == "Farm":
-                farm_game.draw(surface)
-            else:
-                # For other locations, display the location name
-                font = pygame.font.Font(None, 36)
-                text_surf = font.render(self.location_name, True, (0, 0, 0))
-                text_rect = text_surf.get_rect(center=self.rect.center)
-                surface.blit(text_surf, text_rect)
-            # Draw the modal border
-            pygame.draw.rect(surface, (0, 0, 0), self.rect, 3)
-
-# Initialize the Modal
-modal = Modal(modal_position, modal_size)
-
-# Initialize the FarmGame once when the program first runs
-farm_game = FarmGame(modal.rect)
-
-# Function to draw everything on the screen, other than modal content
-def draw():
-    # Draw background
-    screen.blit(background_image, (0, 0))
-
-    # Draw allowed positions as "X" marks
-    for loc in allowed_positions:
-        draw_x(loc['pos'])
-
-    # Draw edges (paths) between nodes
-    for node_id, edges in graph.edges.items():
-        for neighbor_id, _ in edges:
-            start_pos = graph.nodes[node_id]
-            end_pos = graph.nodes[neighbor_id]
-            pygame.draw.line(screen, (255, 255, 0), start_pos, end_pos, 2)
-
-    # Draw all characters
-    character_manager.draw()
-
-    # Draw the modal if active
-    if modal.active:
-        modal.draw(screen)
-
-    # Draw current time
-    time_manager.draw_time(screen)
-
-    # Update the display
-    pygame.display.flip()
-
-# Main game loop
-running = True
-in_game_movement_speed = 200  # Pixels per in-game minute
-
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if modal.active:
-                modal.handle_event(event)
-            character_manager.player.handle_input(pygame.Vector2(event.pos))
-
-    if modal.active:
-        modal.update()
-
-    # Update mini-games
-    farm_game.update()
-
-    # Update character positions and get distance moved by player
-    distance_moved = character_manager.update()
-
-    # Advance time whenever Player is moving
-    if distance_moved > 0:
-        time_increment_in_minutes = distance_moved / in_game_movement_speed
-        time_manager.advance_time(time_increment_in_minutes)
-
-    # Check if player has arrived at a new location
-    if character_manager.player.has_arrived_at_new_location():
-        # Display modal
-        modal.active = True
-        modal.set_content(character_manager.player.current_location_name)
-    elif character_manager.player.current_location_name is None:
-        modal.active = False
-
-    # Draw everything
-    draw()
-
-    # Cap the frame rate
-    pygame.time.Clock().tick(60)
-
-# Clean up and quit pygame
-pygame.quit()
-sys.exit()
+import time
+from camera import Camera
+from map_tiles import MapTiles, TILE_DIRECTORY
+from simulation import Simulation, sprite_sheet_paths
+from world import map_width, map_height
+from asset_loader import AssetLoader
+from asset_bundle import AssetBundle, BUNDLE_PATH, get_background_name
+from renderer import Renderer
+from profiler import FrameProfiler, ProfilerOverlay
+from frame_pacing import FrameScheduler
+from savegame import SaveJournal, SAVE_PATH
+from replay import InputRecorder
+from sprite_cache import animation_cache
+
+PAN_SPEED = 600  # Screen pixels per second when scrolling with the arrow keys
+AUTOSAVE_INTERVAL = 30  # Seconds between autosaves
+
+# Draw a progress bar until the loader has finished. Returns False if the window was closed.
+def show_loading_screen(screen, loader):
+    clock = pygame.time.Clock()
+    bar = pygame.Rect(0, 0, screen.get_width() // 2, 24)
+    bar.center = screen.get_rect().center
+    while not loader.is_done():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        done, total = loader.get_progress()
+        screen.fill((0, 0, 0))
+        pygame.draw.rect(screen, (255, 255, 255), bar, 2)
+        filled = bar.inflate(-6, -6)
+        filled.width = filled.width * done // max(total, 1)
+        pygame.draw.rect(screen, (255, 255, 255), filled)
+        pygame.display.flip()
+        clock.tick(30)
+    return True
+
+def main(record_path=None):
+    # Initialize pygame
+    pygame.init()
+
+    # Screen settings
+    screen_info = pygame.display.Info()  # Get screen resolution
+    #screen_width, screen_height = screen_info.current_w, screen_info.current_h
+    #screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
+    screen_width, screen_height = 1280, 720
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("Medieval")
+
+    # Stream the map from tiles with a scrolling, zooming camera once they have been cut
+    # (python map_tiles.py); otherwise show the whole map scaled to the screen
+    use_map_tiles = os.path.exists(os.path.join(TILE_DIRECTORY, "index.json"))
+
+    # Use the pre-scaled frames and background baked by python asset_bundle.py, unless the sources changed
+    bundle = None
+    if os.path.exists(BUNDLE_PATH):
+        bundle = AssetBundle(BUNDLE_PATH)
+        if bundle.is_stale():
+            bundle.close()
+            bundle = None
+    background_image = None
+    if bundle is not None:
+        animation_cache.bundle = bundle
+        if not use_map_tiles:
+            background_image = bundle.get_image(get_background_name((screen_width, screen_height)))
+
+    # Decode whatever the bundle doesn't have in the background while showing a loading screen
+    loader = AssetLoader()
+    if bundle is None:
+        for path in sprite_sheet_paths:
+            loader.load_image(path)
+    if not use_map_tiles and background_image is None:
+        loader.load_scaled_image("map.jpg", (screen_width, screen_height))
+    if not show_loading_screen(screen, loader):
+        loader.close()
+        pygame.quit()
+        sys.exit()
+    animation_cache.loader = loader
+
+    simulation = Simulation(screen_width, screen_height, separation=True)
+
+    # Carry on from the autosave, if there is one. A recorded game starts new so that it can be replayed.
+    save_journal = SaveJournal(SAVE_PATH)
+    if record_path is None and os.path.exists(SAVE_PATH):
+        try:
+            save_journal.load(simulation)
+        except ValueError as error:
+            print(f"Starting a new game: {error}")
+    next_autosave = time.perf_counter() + AUTOSAVE_INTERVAL
+    recorder = InputRecorder(record_path, simulation) if record_path is not None else None
+    # Put every character frame into one texture now that all characters are loaded; frames from the
+    # bundle already are
+    animation_cache.pack_atlas()
+
+    camera = None
+    map_tiles = None
+    if use_map_tiles:
+        camera = Camera(screen_width, screen_height, screen_width, screen_height)
+        map_tiles = MapTiles(TILE_DIRECTORY)
+        if (map_tiles.map_width, map_tiles.map_height) != (map_width, map_height):
+            sys.exit(f"{TILE_DIRECTORY} was built from a {map_tiles.map_width}x{map_tiles.map_height} map but map.jpg is "
+                     f"{map_width}x{map_height}; rebuild the tiles with python map_tiles.py")
+    elif background_image is None:
+        background_image = loader.get(("map.jpg", (screen_width, screen_height)), convert="opaque")
+    renderer = Renderer(screen, simulation, camera, map_tiles, background_image)
+    follow_player = False
+
+    # Time every frame's phases; F3 shows them over the game and F12 saves them to profile-*.json/csv
+    profiler = FrameProfiler()
+    simulation.profiler = profiler
+    profiler_overlay = ProfilerOverlay(profiler)
+
+    # Run the simulation at its own tick rate and the display at up to 60 fps, slower when idle
+    frame_scheduler = FrameScheduler(simulation.tick_rate)
+
+    # Main game loop
+    running = True
+    while running:
+        profiler.begin_frame()
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                frame_scheduler.handle_event(event)
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.key == pygame.K_f:
+                        follow_player = not follow_player
+                    elif event.key == pygame.K_F3:
+                        renderer.set_overlay(None if renderer.overlay else profiler_overlay)
+                    elif event.key == pygame.K_F12:
+                        print("Saved", ", ".join(profiler.export(time.strftime("profile-%Y%m%d-%H%M%S"))))
+                elif event.type == pygame.MOUSEWHEEL and camera is not None:
+                    # Zoom around the mouse cursor
+                    camera.zoom_by(1.25 ** event.y, pygame.mouse.get_pos())
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button in (4, 5):
+                        continue  # Wheel clicks, handled as MOUSEWHEEL
+                    if camera is not None:
+                        simulation.handle_click(event, camera.screen_to_world(event.pos))
+                    else:
+                        simulation.handle_click(event)
+                elif event.type == pygame.WINDOWEXPOSED:
+                    # The window contents may have been lost
+                    renderer.invalidate()
+
+        # Advance the simulation by the ticks that are due in real time
+        with profiler.phase("simulation"):
+            simulation.step(frame_scheduler.advance())
+        player = simulation.character_manager.player
+
+        # Scroll with the arrow keys, or keep the player centered where it is drawn
+        panning = False
+        if camera is not None:
+            keys = pygame.key.get_pressed()
+            distance = PAN_SPEED * frame_scheduler.frame_time
+            dx = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * distance
+            dy = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * distance
+            panning = bool(dx or dy)
+            if panning:
+                camera.pan(dx, dy)
+            elif follow_player:
+                camera.look_at(player.get_draw_pos(frame_scheduler.alpha))
+
+        # Draw everything
+        with profiler.phase("draw"):
+            renderer.draw(frame_scheduler.alpha)
+
+        # Append what changed since the last save to the save file
+        if time.perf_counter() >= next_autosave:
+            with profiler.phase("autosave"):
+                save_journal.save(simulation)
+            next_autosave = time.perf_counter() + AUTOSAVE_INTERVAL
+
+        # Cap the frame rate, lower while nothing is going on
+        with profiler.phase("wait"):
+            frame_scheduler.wait(busy=panning or simulation.character_manager.is_anyone_moving())
+        profiler.end_frame()
+
+    # Clean up and quit pygame
+    if recorder is not None:
+        print(f"Recorded {recorder.input_count} inputs to {record_path}, state hash {recorder.close()}")
+    save_journal.save(simulation)
+    simulation.close()
+    loader.close()
+    if map_tiles is not None:
+        map_tiles.close()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    # Usage: python main.py [--record session.replay], then python replay.py session.replay to play it back
+    parser = argparse.ArgumentParser(description="Medieval")
+    parser.add_argument("--record", help="Record the game's input here, starting a new game")
+    main(parser.parse_args().record)
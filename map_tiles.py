@@ -0,0 +1,222 @@
+import json
+import math
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+
+TILE_DIRECTORY = "map_tiles"
+
+# Cut the map into square tiles at several zoom levels, written to disk once before the game runs.
+# Level 0 is full resolution and each further level halves it, so a zoomed-out view needs few tiles.
+def build_map_tiles(source="map.jpg", directory=TILE_DIRECTORY, tile_size=512, levels=5):
+    image = pygame.image.load(source)
+    map_width, map_height = image.get_size()
+    index = {"tile_size": tile_size, "map_width": map_width, "map_height": map_height, "levels": []}
+    level_image = image
+    for level in range(levels):
+        if level > 0:
+            level_image = pygame.transform.smoothscale(
+                level_image, (max(1, level_image.get_width() // 2), max(1, level_image.get_height() // 2)))
+        width, height = level_image.get_size()
+        cols = math.ceil(width / tile_size)
+        rows = math.ceil(height / tile_size)
+        os.makedirs(os.path.join(directory, str(level)), exist_ok=True)
+        for row in range(rows):
+            for col in range(cols):
+                area = pygame.Rect(col * tile_size, row * tile_size, tile_size, tile_size).clip(level_image.get_rect())
+                pygame.image.save(level_image.subsurface(area), tile_path(directory, level, col, row))
+        index["levels"].append({"width": width, "height": height, "cols": cols, "rows": rows})
+    with open(os.path.join(directory, "index.json"), "w") as index_file:
+        json.dump(index, index_file, indent=2)
+    return index
+
+def tile_path(directory, level, col, row):
+    return os.path.join(directory, str(level), f"{col}_{row}.jpg")
+
+# Streams map tiles from disk for the part of the map a Camera shows.
+# Only visible tiles are loaded, decoded tiles are kept in an LRU cache, and tiles the player is about to
+# walk into can be prefetched on a background thread. The coarsest level is always loaded, so a missing
+# tile can be drawn blurry instead of blank while its detailed version loads.
+# Tiles scaled to their size on screen are kept in a second LRU cache, so redrawing the view at the same
+# zoom rescales nothing.
+class MapTiles:
+    def __init__(self, directory=TILE_DIRECTORY, cache_size=256, workers=2, scaled_cache_size=64):
+        with open(os.path.join(directory, "index.json")) as index_file:
+            index = json.load(index_file)
+        self.directory = directory
+        self.tile_size = index["tile_size"]
+        self.map_width = index["map_width"]
+        self.map_height = index["map_height"]
+        self.levels = index["levels"]
+        self.cache = OrderedDict()  # key: (level, col, row), value: Surface
+        self.cache_size = cache_size
+        self.scaled = OrderedDict()  # key: ((level, col, row), (width, height)), value: scaled Surface
+        self.scaled_cache_size = scaled_cache_size
+        self.pending = {}  # key: (level, col, row), value: Future of a decoded Surface
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        # Keep the coarsest level resident as the fallback for tiles still loading
+        self.coarsest_level = len(self.levels) - 1
+        self.fallback = {}
+        coarsest = self.levels[self.coarsest_level]
+        for row in range(coarsest["rows"]):
+            for col in range(coarsest["cols"]):
+                self.fallback[(self.coarsest_level, col, row)] = self.prepare(
+                    pygame.image.load(tile_path(directory, self.coarsest_level, col, row)))
+
+    def prepare(self, surface):
+        # convert() must run on the main thread, once a display exists
+        if pygame.display.get_surface() is not None:
+            return surface.convert()
+        return surface
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def choose_level(self, map_pixels_per_screen_pixel):
+        # The coarsest level that still has at least one map pixel per screen pixel
+        level = int(math.floor(math.log2(max(map_pixels_per_screen_pixel, 1))))
+        return min(max(level, 0), self.coarsest_level)
+
+    def get_tiles_in(self, level, map_rect):
+        # Keys of the tiles at a level covering a rect in full-resolution map pixels
+        level_scale = 2 ** level
+        info = self.levels[level]
+        span = self.tile_size * level_scale
+        first_col = max(int(map_rect.left // span), 0)
+        first_row = max(int(map_rect.top // span), 0)
+        last_col = min(int(map_rect.right // span), info["cols"] - 1)
+        last_row = min(int(map_rect.bottom // span), info["rows"] - 1)
+        return [(level, col, row) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+    def request(self, key):
+        # Start loading a tile in the background unless it is cached or already loading
+        if key in self.cache or key in self.pending or key in self.fallback:
+            return
+        self.pending[key] = self.executor.submit(pygame.image.load, tile_path(self.directory, *key))
+
+    def poll(self):
+        # Move finished background loads into the cache. Returns True if any arrived.
+        arrived = False
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                if future.exception() is None:
+                    self.store(key, self.prepare(future.result()))
+                    arrived = True
+        return arrived
+
+    def store(self, key, surface):
+        self.cache[key] = surface
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get(self, key):
+        surface = self.fallback.get(key)
+        if surface is None:
+            surface = self.cache.get(key)
+            if surface is not None:
+                self.cache.move_to_end(key)
+        return surface
+
+    def get_map_rect(self, camera):
+        # Visible part of the map in full-resolution map pixels
+        visible = camera.get_visible_rect()
+        map_scale_x = self.map_width / camera.world_width
+        map_scale_y = self.map_height / camera.world_height
+        return pygame.Rect(visible.x * map_scale_x, visible.y * map_scale_y,
+                           visible.width * map_scale_x, visible.height * map_scale_y)
+
+    def get_level(self, camera):
+        scale_x, scale_y = camera.get_scale()
+        return self.choose_level(min(self.map_width / camera.world_width / scale_x,
+                                     self.map_height / camera.world_height / scale_y))
+
+    def prefetch(self, camera, world_positions):
+        # Queue the tiles a view centered on each position would need, e.g. the nodes of the player's path
+        level = self.get_level(camera)
+        map_rect = self.get_map_rect(camera)
+        map_scale_x = self.map_width / camera.world_width
+        map_scale_y = self.map_height / camera.world_height
+        for pos in world_positions:
+            map_rect.center = (pos[0] * map_scale_x, pos[1] * map_scale_y)
+            for key in self.get_tiles_in(level, map_rect):
+                self.request(key)
+
+    def draw(self, surface, camera):
+        # Draw the visible part of the map, within the surface's clip area. Returns False if some tiles were
+        # still loading. Tiles that finished loading are only used after poll(), whose caller then knows to
+        # redraw everything they appear in.
+        level = self.get_level(camera)
+        map_rect = self.get_map_rect(camera)
+        complete = True
+        for key in self.get_tiles_in(level, map_rect):
+            tile = self.get(key)
+            if tile is None:
+                self.request(key)
+                complete = False
+                # Draw the part of the coarsest level under this tile until it arrives
+                previous_clip = surface.get_clip()
+                surface.set_clip(self.get_screen_rect(camera, key, self.tile_size, self.tile_size).clip(previous_clip))
+                for fallback_key in self.get_tiles_in(self.coarsest_level, self.get_tile_map_rect(key)):
+                    self.blit_tile(surface, camera, fallback_key, self.fallback[fallback_key], keep_scaled=False)
+                surface.set_clip(previous_clip)
+            else:
+                self.blit_tile(surface, camera, key, tile)
+        return complete
+
+    def get_tile_map_rect(self, key):
+        # Area a tile covers in full-resolution map pixels
+        level, col, row = key
+        span = self.tile_size * 2 ** level
+        return pygame.Rect(col * span, row * span, span, span)
+
+    def get_screen_rect(self, camera, key, width, height):
+        # Where a tile of the given pixel size lands on screen
+        level, col, row = key
+        level_scale = 2 ** level
+        world_per_map_x = camera.world_width / self.map_width
+        world_per_map_y = camera.world_height / self.map_height
+        left = col * self.tile_size * level_scale
+        top = row * self.tile_size * level_scale
+        right = left + width * level_scale
+        bottom = top + height * level_scale
+        # Round each edge on its own so neighboring tiles meet without gaps
+        top_left = camera.world_to_screen((left * world_per_map_x, top * world_per_map_y))
+        bottom_right = camera.world_to_screen((right * world_per_map_x, bottom * world_per_map_y))
+        x0, y0 = round(top_left.x), round(top_left.y)
+        x1, y1 = round(bottom_right.x), round(bottom_right.y)
+        return pygame.Rect(x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
+    def blit_tile(self, surface, camera, key, tile, keep_scaled=True):
+        # keep_scaled=False for the coarse stand-ins for missing tiles, which are shown briefly and can be
+        # scaled up to many times the screen size
+        rect = self.get_screen_rect(camera, key, tile.get_width(), tile.get_height())
+        if rect.width and rect.height and rect.colliderect(surface.get_clip()):
+            if keep_scaled:
+                surface.blit(self.get_scaled(key, tile, rect.size), rect)
+            else:
+                surface.blit(pygame.transform.scale(tile, rect.size), rect)
+
+    def get_scaled(self, key, tile, size):
+        scaled_key = (key, size)
+        scaled = self.scaled.get(scaled_key)
+        if scaled is None:
+            scaled = pygame.transform.scale(tile, size)
+            self.scaled[scaled_key] = scaled
+            while len(self.scaled) > self.scaled_cache_size:
+                self.scaled.popitem(last=False)
+        else:
+            self.scaled.move_to_end(scaled_key)
+        return scaled
+
+if __name__ == "__main__":
+    # Usage: python map_tiles.py [source image] [output directory]
+    pygame.init()
+    source = sys.argv[1] if len(sys.argv) > 1 else "map.jpg"
+    directory = sys.argv[2] if len(sys.argv) > 2 else TILE_DIRECTORY
+    index = build_map_tiles(source, directory)
+    print(f"Wrote {sum(level['cols'] * level['rows'] for level in index['levels'])} tiles to {directory}")
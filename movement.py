@@ -0,0 +1,223 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for batched movement
+    np = None
+
+# Direction names by the integer code stored in the arrays
+DIRECTIONS = ("down", "up", "right", "left")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+
+IDLE_THRESHOLD = 100  # 1/60 s without movement before the idle animation starts, as in Character.move_along_path
+# Arrays with one row per character, as allocated by BatchMovement.allocate
+ROW_ARRAYS = ("pos", "previous_pos", "target", "speed", "path_cursor", "active", "started", "direction", "frame_index",
+              "animation_speed", "idle_timer", "is_idle", "frame_counts", "idle_frame_counts")
+
+# Moves many characters at once with the same rules as Character.move_along_path.
+# Positions, speeds, targets and animation state live in NumPy arrays and are advanced in one vectorized
+# step; only characters that reach a path node are handled one by one. Paths are walked with a cursor
+# instead of pop(0). The arrays are the source of truth; sync() copies them back onto the Character objects.
+class BatchMovement:
+    def __init__(self, graph, capacity=64):
+        if np is None:
+            raise ImportError("BatchMovement needs NumPy")
+        self.graph = graph
+        self.characters = []
+        self.paths = []  # Path node ids per character, walked with path_cursor
+        self.count = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        # (Re)allocate the arrays, keeping the rows already in use
+        def grow(old, shape, dtype, fill=0):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+        old = self.__dict__
+        self.capacity = capacity
+        self.pos = grow(old.get("pos"), (capacity, 2), np.float64)
+        self.previous_pos = grow(old.get("previous_pos"), (capacity, 2), np.float64)
+        self.target = grow(old.get("target"), (capacity, 2), np.float64)
+        self.speed = grow(old.get("speed"), capacity, np.float64)
+        self.path_cursor = grow(old.get("path_cursor"), capacity, np.int64)
+        self.active = grow(old.get("active"), capacity, bool, False)
+        self.started = grow(old.get("started"), capacity, bool, False)
+        self.direction = grow(old.get("direction"), capacity, np.int8)
+        self.frame_index = grow(old.get("frame_index"), capacity, np.float64)
+        self.animation_speed = grow(old.get("animation_speed"), capacity, np.float64)
+        self.idle_timer = grow(old.get("idle_timer"), capacity, np.float64)
+        self.is_idle = grow(old.get("is_idle"), capacity, bool, False)
+        self.frame_counts = grow(old.get("frame_counts"), (capacity, len(DIRECTIONS)), np.int64, 1)
+        self.idle_frame_counts = grow(old.get("idle_frame_counts"), (capacity, len(DIRECTIONS)), np.int64, 1)
+
+    def add(self, character):
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+        index = self.count
+        self.count += 1
+        self.characters.append(character)
+        self.paths.append([])
+        character.mover = self
+        character.mover_index = index
+
+        self.speed[index] = character.speed
+        self.animation_speed[index] = character.animation_speed
+        for name, code in DIRECTION_CODES.items():
+            self.frame_counts[index, code] = character.frame_counts[name]
+            self.idle_frame_counts[index, code] = character.idle_frame_counts[name]
+        self.reset_character(character)
+
+    def remove(self, character):
+        # Stop moving the character, leaving its state on the Character. The last row moves into its place.
+        self.sync_character(character)
+        index = character.mover_index
+        last = self.count - 1
+        if index != last:
+            for name in ROW_ARRAYS:
+                values = getattr(self, name)
+                values[index] = values[last]
+            moved = self.characters[last]
+            self.characters[index] = moved
+            self.paths[index] = self.paths[last]
+            moved.mover_index = index
+        self.characters.pop()
+        self.paths.pop()
+        self.count = last
+        character.mover = None
+        character.mover_index = None
+
+    def reset_character(self, character):
+        # Take over the character's position, animation state and path, e.g. after loading a save
+        index = character.mover_index
+        self.pos[index] = character.pos
+        self.previous_pos[index] = character.previous_pos
+        self.direction[index] = DIRECTION_CODES[character.direction]
+        self.frame_index[index] = character.frame_index
+        self.idle_timer[index] = character.idle_timer
+        self.is_idle[index] = character.is_idle
+        self.set_path(character)
+
+    def set_path(self, character):
+        # Take over the character's current path; called whenever Character.path is replaced
+        index = character.mover_index
+        path = list(character.path)
+        self.paths[index] = path
+        self.path_cursor[index] = 0
+        self.pos[index] = character.pos
+        self.active[index] = bool(path)
+        self.started[index] = bool(path)
+        if path:
+            self.target[index] = self.graph.nodes[path[0]]
+
+    def update(self, dt=1):
+        # Advance every character by one tick of dt 1/60 s. Returns the distance each one moved.
+        n = self.count
+        pos = self.pos[:n]
+        self.previous_pos[:n] = pos
+        target = self.target[:n]
+        speed = self.speed[:n] * dt
+        active = self.active[:n]
+        frame_index = self.frame_index[:n]
+        idle_timer = self.idle_timer[:n]
+        is_idle = self.is_idle[:n]
+        direction = self.direction[:n]
+        rows = np.arange(n)
+        distance_moved = np.zeros(n)
+
+        # Characters on a path are no longer at a named location
+        started = np.flatnonzero(self.started[:n])
+        for index in started:
+            self.characters[index].current_location_name = None
+        self.started[:n] = False
+
+        delta = target - pos
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        moving = active & (distance > speed)
+        arriving = active & ~moving
+
+        # Step towards the current target node
+        if moving.any():
+            move_direction = delta[moving] / distance[moving, None]
+            old_pos = pos[moving]
+            pos[moving] += move_direction * speed[moving, None]
+            step = pos[moving] - old_pos
+            distance_moved[moving] = np.hypot(step[:, 0], step[:, 1])
+
+            # Same rule as Character.update_direction
+            horizontal = np.abs(move_direction[:, 0]) > np.abs(move_direction[:, 1])
+            direction[moving] = np.where(
+                horizontal,
+                np.where(move_direction[:, 0] > 0, DIRECTION_CODES["right"], DIRECTION_CODES["left"]),
+                np.where(move_direction[:, 1] > 0, DIRECTION_CODES["down"], DIRECTION_CODES["up"]),
+            )
+
+            # Reset idle timer and flag when moving, and advance the movement animation
+            idle_timer[moving] = 0
+            is_idle[moving] = False
+            frame_index[moving] += self.animation_speed[:n][moving] * dt
+            wrapped = moving & (frame_index >= self.frame_counts[:n][rows, direction])
+            frame_index[wrapped] = 0
+
+        # Snap to the target node and move on to the next one
+        for index in np.flatnonzero(arriving):
+            pos[index] = target[index]
+            distance_moved[index] = distance[index]
+            self.path_cursor[index] += 1
+            path = self.paths[index]
+            if self.path_cursor[index] == len(path):
+                path.extend(self.characters[index].take_next_segment())
+            if self.path_cursor[index] < len(path):
+                target[index] = self.graph.nodes[path[self.path_cursor[index]]]
+            else:
+                # Arrived at destination
+                active[index] = False
+                character = self.characters[index]
+                character.path = []
+                character.previous_location_name = character.current_location_name
+                character.current_location_name = character.target_location_name
+
+        # Idle characters count up towards the idle animation
+        idle = ~active & ~arriving
+        if idle.any():
+            idle_timer[idle] += dt
+            animating = idle & (idle_timer > IDLE_THRESHOLD)
+            resting = idle & ~animating
+            is_idle[animating] = True
+            frame_index[animating] += self.animation_speed[:n][animating] * dt
+            wrapped = animating & (frame_index >= self.idle_frame_counts[:n][rows, direction])
+            frame_index[wrapped] = 0
+            is_idle[resting] = False
+            frame_index[resting] = 0
+
+        return distance_moved
+
+    def sync_character(self, character):
+        # Copy one character's state back, e.g. before it plans a path from its current position
+        index = character.mover_index
+        character.pos.update(self.pos[index].tolist())
+        character.previous_pos.update(self.previous_pos[index].tolist())
+        character.direction = DIRECTIONS[self.direction[index]]
+        character.frame_index = float(self.frame_index[index])
+        character.idle_timer = float(self.idle_timer[index])
+        character.is_idle = bool(self.is_idle[index])
+        if character.path:
+            character.path = self.paths[index][self.path_cursor[index]:]
+
+    def sync(self):
+        # Copy positions and animation state back onto the Character objects, e.g. before drawing
+        positions = self.pos[:self.count].tolist()
+        previous_positions = self.previous_pos[:self.count].tolist()
+        directions = self.direction[:self.count].tolist()
+        frame_indexes = self.frame_index[:self.count].tolist()
+        idle_timers = self.idle_timer[:self.count].tolist()
+        idle_flags = self.is_idle[:self.count].tolist()
+        cursors = self.path_cursor[:self.count].tolist()
+        for index, character in enumerate(self.characters):
+            character.pos.update(positions[index])
+            character.previous_pos.update(previous_positions[index])
+            character.direction = DIRECTIONS[directions[index]]
+            character.frame_index = frame_indexes[index]
+            character.idle_timer = idle_timers[index]
+            character.is_idle = idle_flags[index]
+            if character.path:
+                character.path = self.paths[index][cursors[index]:]
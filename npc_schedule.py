@@ -0,0 +1,160 @@
+import bisect
+import math
+from scheduler import EventScheduler
+
+MINUTES_PER_DAY = 24 * 60
+WAKE_BUCKET_MINUTES = 5  # Decision times are rounded up to this, so NPCs due about the same time wake together
+RECHECK_MINUTES = 30  # How soon an NPC on its way somewhere looks again
+HUNGER_PER_MINUTE = 100 / (10 * 60)  # Food used up per in-game minute; hunger is how fed a character is, 0 to 100
+ENERGY_PER_MINUTE = 100 / (18 * 60)  # Energy used up per in-game minute away from home
+REST_PER_MINUTE = 100 / (6 * 60)  # Energy regained per in-game minute at home
+HUNGRY = 30  # Below this a character goes to eat
+TIRED = 20  # Below this a character goes home to rest until rested
+MEAL_MINUTES = 30
+
+# Where an NPC wants to be over the day: a list of (minute of the day, location name), each place
+# kept until the next entry's time and the last one until the first entry of the next day.
+# home is where it rests, meal_location where it eats.
+class DailySchedule:
+    def __init__(self, entries, home, meal_location="Tavern"):
+        entries = sorted(entries)
+        self.start_minutes = [minute for minute, _ in entries]
+        self.locations = [location for _, location in entries]
+        self.home = home
+        self.meal_location = meal_location
+
+    def get_location(self, total_minutes):
+        # Index -1 is the last entry of the day before
+        index = bisect.bisect_right(self.start_minutes, total_minutes % MINUTES_PER_DAY) - 1
+        return self.locations[index]
+
+    def get_next_change(self, total_minutes):
+        # TimeManager minutes when the scheduled location next changes
+        day_start = total_minutes - total_minutes % MINUTES_PER_DAY
+        index = bisect.bisect_right(self.start_minutes, total_minutes % MINUTES_PER_DAY)
+        if index == len(self.start_minutes):
+            return day_start + MINUTES_PER_DAY + self.start_minutes[0]
+        return day_start + self.start_minutes[index]
+
+# Daily routines of the starting NPCs, by character name
+daily_schedules = {
+    "butcher": DailySchedule([(6 * 60, "Butcher"), (12 * 60, "Market"), (14 * 60, "Butcher"), (19 * 60, "Tavern"),
+                              (22 * 60, "Elder")], home="Elder"),
+    "brewer": DailySchedule([(7 * 60, "Brewery"), (11 * 60, "Miller"), (13 * 60, "Brewery"), (18 * 60, "Tavern"),
+                             (23 * 60, "Manor")], home="Manor"),
+}
+
+# A scheduled NPC: its schedule, the need it is seeing to, if any, and when it is next due to decide
+class Routine:
+    def __init__(self, character, schedule, now):
+        self.character = character
+        self.schedule = schedule
+        self.need = None  # "eat" or "rest" while seeing to a need, which beats the schedule
+        self.needs_minutes = now  # When hunger and energy were last brought up to date
+        self.wake_time = now  # When it next decides
+        self.wake_entry = None  # EventScheduler entry of wake_time
+
+# Picks where NPCs go from their daily schedules, hunger and energy, and sends them there with compute_path.
+# Each NPC decides only at the TimeManager minute something can change for it: its scheduled location
+# changes, it gets hungry or tired, or it has eaten or rested. Those times wait in an EventScheduler,
+# so an update only touches the NPCs that are due and costs one comparison when none are. Hunger and
+# energy are worked out from the minutes since the last decision rather than every tick.
+class NPCScheduler:
+    def __init__(self):
+        self.scheduler = EventScheduler()  # Routines by TimeManager minute of their next decision
+        self.routines = {}  # key: character name, value: Routine
+
+    def add(self, character, schedule, now):
+        # Start following schedule with a decision at now
+        self.remove(character)
+        if not character.check_for_allowed_position():
+            character.current_location_name = None
+        routine = Routine(character, schedule, now)
+        self.routines[character.character_name] = routine
+        routine.wake_entry = self.scheduler.schedule(now, routine)
+
+    def remove(self, character):
+        routine = self.routines.pop(character.character_name, None)
+        if routine is not None:
+            self.scheduler.cancel(routine.wake_entry)
+
+    def reschedule(self):
+        # Queue every routine again at its wake_time, e.g. after loading a save changed them
+        self.scheduler = EventScheduler()
+        self.scheduler.schedule_all((routine.wake_time, routine) for routine in self.routines.values())
+        for entry in self.scheduler.heap:
+            entry[2].wake_entry = entry
+
+    def update(self, now):
+        # Let the NPCs due by now decide. Returns how many did.
+        next_time = self.scheduler.peek_time()
+        if next_time is None or next_time > now:
+            return 0
+        # Take everyone due first, so the decisions can't see each other's new wake times
+        due = [routine for _, routine in self.scheduler.pop_due(math.nextafter(now, math.inf))]
+        for routine in due:
+            wake_time = self.decide(routine, now)
+            # Round up to a bucket boundary after now
+            bucket = max(math.ceil(wake_time / WAKE_BUCKET_MINUTES), math.floor(now / WAKE_BUCKET_MINUTES) + 1)
+            routine.wake_time = bucket * WAKE_BUCKET_MINUTES
+            routine.wake_entry = self.scheduler.schedule(routine.wake_time, routine)
+        return len(due)
+
+    def decide(self, routine, now):
+        # Send the character where it should be now. Returns when it should decide next.
+        character = routine.character
+        schedule = routine.schedule
+        arrived_at = character.current_location_name  # None while walking
+        self.update_needs(routine, now, arrived_at)
+
+        if routine.need == "rest" and character.energy >= 100:
+            routine.need = None
+        if routine.need is None:
+            if character.hunger < HUNGRY:
+                routine.need = "eat"
+            elif character.energy < TIRED:
+                routine.need = "rest"
+        if routine.need == "eat" and arrived_at == schedule.meal_location:
+            character.hunger = 100  # Stays for the meal
+            routine.need = None
+            return now + MEAL_MINUTES
+
+        if routine.need == "eat":
+            goal = schedule.meal_location
+        elif routine.need == "rest":
+            goal = schedule.home
+        else:
+            goal = schedule.get_location(now)
+        self.go(character, goal)
+
+        # Next time something can change: the schedule, hunger or energy crossing a threshold, or arriving
+        wake_time = schedule.get_next_change(now)
+        if character.current_location_name != goal:
+            wake_time = min(wake_time, now + RECHECK_MINUTES)
+        if routine.need == "rest" and character.current_location_name == goal:
+            wake_time = min(wake_time, now + (100 - character.energy) / REST_PER_MINUTE)
+        if routine.need is None:
+            wake_time = min(wake_time, now + (character.hunger - HUNGRY) / HUNGER_PER_MINUTE)
+            if character.current_location_name != schedule.home:
+                wake_time = min(wake_time, now + (character.energy - TIRED) / ENERGY_PER_MINUTE)
+        return wake_time
+
+    def update_needs(self, routine, now, location):
+        # Use up food and energy for the minutes since the last decision, or rest at home
+        character = routine.character
+        minutes = now - routine.needs_minutes
+        routine.needs_minutes = now
+        character.hunger = max(character.hunger - HUNGER_PER_MINUTE * minutes, 0)
+        if location == routine.schedule.home:
+            character.energy = min(character.energy + REST_PER_MINUTE * minutes, 100)
+        else:
+            character.energy = max(character.energy - ENERGY_PER_MINUTE * minutes, 0)
+
+    def go(self, character, goal):
+        # Path to goal unless the character is there or already on its way
+        if character.current_location_name == goal:
+            return
+        if character.target_location_name == goal and (character.path or character.path_ticket is not None):
+            return
+        character.target_location_name = goal
+        character.compute_path()
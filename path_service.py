@@ -0,0 +1,217 @@
+import heapq
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pygame
+from world import Graph, heuristic
+from regions import RegionGraph
+from flow_field import FlowFieldCache
+
+DEFAULT_BUDGET_MS = 2  # Time given to path searches per frame
+STEPS_PER_CHECK = 64  # Nodes an incremental search expands between clock checks
+
+# A path that has been asked for. path stays None until the search is done, then holds the node ids
+# from start to goal, or [] if the goal can't be reached. waiters are whoever asked for it.
+class PathTicket:
+    def __init__(self, start, goal):
+        self.start = start
+        self.goal = goal
+        self.path = None
+        self.done = False
+        self.waiters = []
+        self.search = None  # Incremental search in progress
+        self.future = None  # Search running in a worker process
+        self.graph_version = None  # Graph version the worker process searched
+
+# Path searches run a little at a time instead of all at once when a character asks for a path.
+# Searches are queued and worked through for up to budget_ms each frame (None means no limit), shared by
+# the updates of all the ticks run in that frame, so many NPCs retargeting at once spread their searches
+# over several frames. begin_frame() starts a frame's budget. Asking for a (start, goal) pair that is
+# already queued shares that search. With processes > 0, searches run in worker processes on their own
+# copy of the graph instead, which is rebuilt when the graph changes; with a path table, every path is a
+# lookup that costs less than sending it to a worker, so no workers are started.
+class PathService:
+    def __init__(self, world, budget_ms=DEFAULT_BUDGET_MS, processes=0):
+        self.world = world
+        self.graph = world.graph
+        self.budget_ms = budget_ms
+        self.processes = processes if world.path_table is None else 0
+        self.budget_left_ms = budget_ms  # What is left of this frame's budget
+        self.executor = None
+        self.graph_version = 0
+        self.pending = {}  # key: (start, goal), value: PathTicket not done yet
+        self.queue = deque()  # PathTickets searched on this process, oldest first
+        self.running = []  # PathTickets searched in worker processes
+        self.graph.add_listener(self)
+
+    def request(self, start, goal, waiter=None):
+        ticket = self.pending.get((start, goal))
+        if ticket is None:
+            ticket = PathTicket(start, goal)
+            self.pending[(start, goal)] = ticket
+            if self.processes:
+                self.submit(ticket)
+                self.running.append(ticket)
+            else:
+                self.queue.append(ticket)
+        if waiter is not None:
+            ticket.waiters.append(waiter)
+        return ticket
+
+    def begin_frame(self):
+        self.budget_left_ms = self.budget_ms
+
+    def update(self):
+        # Work on the queued searches with what is left of the frame's budget. Returns the tickets that finished.
+        finished = []
+        if self.running:
+            self.poll(finished)
+        if not self.queue:
+            return finished
+        start = time.perf_counter()
+        if self.budget_ms is None:
+            deadline = None
+        elif self.budget_left_ms <= 0:
+            return finished  # Spent by the earlier ticks of this frame
+        else:
+            deadline = start + self.budget_left_ms / 1000
+        while self.queue:
+            ticket = self.queue[0]
+            if ticket.search is None:
+                ticket.search = self.search_steps(ticket.start, ticket.goal)
+            try:
+                next(ticket.search)
+            except StopIteration as stop:
+                self.queue.popleft()
+                self.finish(ticket, stop.value, finished)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        if self.budget_ms is not None:
+            self.budget_left_ms -= (time.perf_counter() - start) * 1000
+        return finished
+
+    def finish(self, ticket, path, finished):
+        ticket.path = path
+        ticket.done = True
+        ticket.search = None
+        ticket.future = None
+        del self.pending[(ticket.start, ticket.goal)]
+        finished.append(ticket)
+
+    def search_steps(self, start, goal):
+        # Generator that searches a bit per next() call and returns the path when it stops
+        if self.world.path_table is not None:
+            return self.world.path_table.get_path(start, goal)
+        if self.world.flow_fields is not None:
+            return self.world.flow_fields.get_path(start, goal)
+        if self.world.region_graph is not None:
+            return self.world.region_graph.find_path(start, goal)
+        return (yield from astar_steps(self.graph, start, goal))
+
+    def submit(self, ticket):
+        if self.executor is None:
+            region_size = self.world.region_graph.region_size if self.world.region_graph is not None else None
+            flow_fields = self.world.flow_fields is not None
+            nodes = {node_id: (pos[0], pos[1]) for node_id, pos in self.graph.nodes.items()}
+            edges = {node_id: list(neighbors) for node_id, neighbors in self.graph.edges.items()}
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes, initializer=init_worker, initargs=(nodes, edges, region_size, flow_fields))
+        ticket.graph_version = self.graph_version
+        ticket.future = self.executor.submit(search_in_worker, ticket.start, ticket.goal)
+
+    def poll(self, finished):
+        running = []
+        for ticket in self.running:
+            if not ticket.future.done():
+                running.append(ticket)
+            elif ticket.graph_version != self.graph_version:
+                # Searched an old copy of the graph
+                self.submit(ticket)
+                running.append(ticket)
+            else:
+                self.finish(ticket, ticket.future.result(), finished)
+        self.running = running
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    # Graph listener callbacks: searches in progress start over on the changed graph
+
+    def graph_changed(self):
+        self.graph_version += 1
+        for ticket in self.queue:
+            ticket.search = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            for ticket in self.running:
+                self.submit(ticket)
+
+    def node_added(self, node_id):
+        self.graph_changed()
+
+    def edge_added(self, from_node, to_node, cost):
+        self.graph_changed()
+
+    def edge_removed(self, from_node, to_node, cost):
+        self.graph_changed()
+
+# The same search as world.astar_search, pausing every STEPS_PER_CHECK expanded nodes.
+# Returns [] instead of failing when the goal can't be reached.
+def astar_steps(graph, start, goal):
+    frontier = [(0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    steps = 0
+    while frontier:
+        _, current = heapq.heappop(frontier)
+        if current == goal:
+            break
+        for neighbor, cost in graph.edges[current]:
+            new_cost = cost_so_far[current] + cost
+            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
+                cost_so_far[neighbor] = new_cost
+                priority = new_cost + heuristic(graph, goal, neighbor)
+                heapq.heappush(frontier, (priority, neighbor))
+                came_from[neighbor] = current
+        steps += 1
+        if steps % STEPS_PER_CHECK == 0:
+            yield
+    if goal not in came_from:
+        return []
+    path = []
+    current = goal
+    while current is not None:
+        path.append(current)
+        current = came_from[current]
+    path.reverse()
+    return path
+
+# Worker process side
+
+worker_graph = None
+worker_regions = None
+worker_flow_fields = None
+
+def init_worker(nodes, edges, region_size, flow_fields):
+    global worker_graph, worker_regions, worker_flow_fields
+    worker_graph = Graph()
+    for node_id, pos in nodes.items():
+        worker_graph.add_node(node_id, pygame.Vector2(pos))
+    worker_graph.edges.update(edges)
+    worker_regions = RegionGraph(worker_graph, region_size) if region_size else None
+    worker_flow_fields = FlowFieldCache(worker_graph) if flow_fields else None
+
+def search_in_worker(start, goal):
+    if worker_flow_fields is not None:
+        return worker_flow_fields.get_path(start, goal)
+    if worker_regions is not None:
+        return worker_regions.find_path(start, goal)
+    search = astar_steps(worker_graph, start, goal)
+    while True:
+        try:
+            next(search)
+        except StopIteration as stop:
+            return stop.value
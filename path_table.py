@@ -0,0 +1,86 @@
+import heapq
+
+INF = float("inf")
+EPSILON = 1e-9  # Tolerance when comparing summed float edge costs
+
+# Precomputed shortest paths between every pair of nodes in a Graph.
+# dist[s][t] is the path length from s to t and next_hop[s][t] is the first node after s on that path,
+# so a path query just follows next hops. The table listens to the graph and only updates the entries
+# an added or removed edge can affect, instead of recomputing everything.
+class PathTable:
+    def __init__(self, graph):
+        self.graph = graph
+        self.dist = {}
+        self.next_hop = {}
+        for source in graph.nodes:
+            self.compute_source(source)
+        graph.add_listener(self)
+
+    def compute_source(self, source):
+        # Dijkstra from one source, remembering which neighbor of the source each node was reached through
+        dist = {source: 0}
+        next_hop = {source: source}
+        frontier = [(0, source)]
+        while frontier:
+            current_dist, current = heapq.heappop(frontier)
+            if current_dist > dist[current]:
+                continue
+            for neighbor, cost in self.graph.edges[current]:
+                new_dist = current_dist + cost
+                if new_dist < dist.get(neighbor, INF):
+                    dist[neighbor] = new_dist
+                    next_hop[neighbor] = neighbor if current == source else next_hop[current]
+                    heapq.heappush(frontier, (new_dist, neighbor))
+        self.dist[source] = dist
+        self.next_hop[source] = next_hop
+
+    def get_distance(self, start, goal):
+        return self.dist[start].get(goal, INF)
+
+    def get_path(self, start, goal):
+        # Same shape as astar_search: starts with start and ends with goal. Empty if goal is unreachable.
+        next_hop = self.next_hop
+        if goal not in next_hop[start]:
+            return []
+        path = [start]
+        current = start
+        while current != goal:
+            current = next_hop[current][goal]
+            path.append(current)
+        return path
+
+    # Graph listener callbacks
+
+    def node_added(self, node_id):
+        self.dist[node_id] = {node_id: 0}
+        self.next_hop[node_id] = {node_id: node_id}
+
+    def edge_added(self, from_node, to_node, cost):
+        # A new edge can only shorten paths, and only those that now run through it
+        self.relax_through_edge(from_node, to_node, cost)
+        self.relax_through_edge(to_node, from_node, cost)
+
+    def relax_through_edge(self, u, v, cost):
+        # Improve s -> t wherever s -> u, then u -> v, then v -> t is shorter than the current path
+        dist_to_u = {source: row[u] for source, row in self.dist.items() if u in row}
+        dist_from_v = dict(self.dist[v])
+        for source, source_to_u in dist_to_u.items():
+            dist_row = self.dist[source]
+            hop_row = self.next_hop[source]
+            first_hop = v if source == u else hop_row[u]
+            for target, v_to_target in dist_from_v.items():
+                new_dist = source_to_u + cost + v_to_target
+                if new_dist < dist_row.get(target, INF) - EPSILON:
+                    dist_row[target] = new_dist
+                    hop_row[target] = first_hop
+
+    def edge_removed(self, from_node, to_node, cost):
+        # Only sources with a shortest path over the removed edge can change; rerun Dijkstra for those
+        affected = []
+        for source, row in self.dist.items():
+            to_from = row.get(from_node, INF)
+            to_to = row.get(to_node, INF)
+            if abs(to_from + cost - to_to) < EPSILON or abs(to_to + cost - to_from) < EPSILON:
+                affected.append(source)
+        for source in affected:
+            self.compute_source(source)
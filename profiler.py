@@ -0,0 +1,192 @@
+import csv
+import json
+import time
+from collections import deque
+import pygame
+from text_cache import text_cache
+
+FRAME_BUDGET_MS = 1000 / 60
+SLOW_FRAME_MS = FRAME_BUDGET_MS * 1.1  # Frames longer than this show up red; a capped frame runs slightly over
+OVERLAY_TEXT_SIZE = 20
+
+# Times the phases of each frame, e.g. event handling, each simulation update and drawing.
+# Finished frames go into a ring buffer holding the last `capacity` frames; each is
+# (start, end, phases) with phases a list of (name, depth, start, end) in perf_counter seconds, where
+# depth counts the phases it is nested in. A disabled profiler records nothing and costs one check.
+#
+#   profiler.begin_frame()
+#   with profiler.phase("events"):
+#       ...
+#   profiler.end_frame()
+class FrameProfiler:
+    def __init__(self, capacity=600, enabled=True):
+        self.frames = deque(maxlen=capacity)
+        self.enabled = enabled
+        self.current = None  # Phases of the frame being recorded
+        self.frame_start = None
+        self.depth = 0
+
+    def begin_frame(self):
+        if self.enabled:
+            self.current = []
+            self.depth = 0
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self.current is not None:
+            self.frames.append((self.frame_start, time.perf_counter(), self.current))
+            self.current = None
+
+    def phase(self, name):
+        if self.current is None:
+            return null_phase
+        return Phase(self, name)
+
+    def clear(self):
+        self.frames.clear()
+
+    # Summaries
+
+    def get_frame_times(self, count=None):
+        # Durations of the last count frames in milliseconds, oldest first
+        frames = list(self.frames)[-count:] if count else self.frames
+        return [(end - start) * 1000 for start, end, _ in frames]
+
+    def get_fps(self, count=60):
+        frames = list(self.frames)[-count:]
+        if len(frames) < 2:
+            return 0
+        return (len(frames) - 1) / (frames[-1][0] - frames[0][0])
+
+    def get_phase_times(self, count=60):
+        # Average milliseconds per frame of every phase over the last count frames, slowest first
+        frames = list(self.frames)[-count:]
+        totals = {}
+        for _, _, phases in frames:
+            for name, _, start, end in phases:
+                totals[name] = totals.get(name, 0) + (end - start)
+        return sorted(((name, total * 1000 / len(frames)) for name, total in totals.items()),
+                      key=lambda item: item[1], reverse=True)
+
+    # Exports
+
+    def export_json(self, path):
+        origin = self.frames[0][0] if self.frames else 0
+        frames = [{
+            "start_ms": (start - origin) * 1000,
+            "duration_ms": (end - start) * 1000,
+            "phases": [{"name": name, "depth": depth, "start_ms": (phase_start - origin) * 1000,
+                        "duration_ms": (phase_end - phase_start) * 1000}
+                       for name, depth, phase_start, phase_end in phases],
+        } for start, end, phases in self.frames]
+        with open(path, "w") as output_file:
+            json.dump({"frames": frames}, output_file, indent=1)
+
+    def export_csv(self, path):
+        # One row per phase, plus a "frame" row per frame
+        origin = self.frames[0][0] if self.frames else 0
+        with open(path, "w", newline="") as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(["frame", "name", "depth", "start_ms", "duration_ms"])
+            for number, (start, end, phases) in enumerate(self.frames):
+                writer.writerow([number, "frame", -1, round((start - origin) * 1000, 4), round((end - start) * 1000, 4)])
+                for name, depth, phase_start, phase_end in phases:
+                    writer.writerow([number, name, depth, round((phase_start - origin) * 1000, 4),
+                                     round((phase_end - phase_start) * 1000, 4)])
+
+    def export_chrome_trace(self, path):
+        # Trace Event Format, for chrome://tracing or Perfetto
+        origin = self.frames[0][0] if self.frames else 0
+        events = []
+        for start, end, phases in self.frames:
+            events.append(trace_event("frame", start, end, origin))
+            for name, _, phase_start, phase_end in phases:
+                events.append(trace_event(name, phase_start, phase_end, origin))
+        with open(path, "w") as output_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, output_file)
+
+    def export(self, prefix):
+        # Write all three formats next to each other. Returns the paths.
+        paths = [prefix + ".json", prefix + ".csv", prefix + ".trace.json"]
+        self.export_json(paths[0])
+        self.export_csv(paths[1])
+        self.export_chrome_trace(paths[2])
+        return paths
+
+def trace_event(name, start, end, origin):
+    # A complete ("X") event; times are in microseconds
+    return {"name": name, "ph": "X", "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6, "pid": 1, "tid": 1}
+
+class Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.depth += 1
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler.depth -= 1
+        if profiler.current is not None:
+            profiler.current.append((self.name, profiler.depth, self.start, end))
+
+class NullPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+null_phase = NullPhase()
+
+# FPS, a graph of recent frame times against the 60 fps budget and the slowest phases, drawn over the game.
+# The panel is redrawn once per frame by update(); draw() blits it, so it can be drawn clipped many times.
+class ProfilerOverlay:
+    def __init__(self, profiler, position=(10, 50), graph_frames=120, top_phases=6, text_interval=30):
+        self.profiler = profiler
+        self.graph_frames = graph_frames
+        self.top_phases = top_phases
+        self.text_interval = text_interval  # Frames between refreshes of the numbers, so they are readable
+        self.line_height = 18
+        self.graph_height = 60
+        width = graph_frames * 2 + 10
+        height = self.graph_height + 10 + self.line_height * (top_phases + 1) + 10
+        self.rect = pygame.Rect(position, (width, height))
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.lines = []
+        self.frames_since_text = text_interval
+        # Load the font now rather than the first time the overlay is shown, in the middle of a frame
+        text_cache.preload((OVERLAY_TEXT_SIZE,))
+
+    def update(self):
+        profiler = self.profiler
+        self.frames_since_text += 1
+        if self.frames_since_text >= self.text_interval:
+            self.frames_since_text = 0
+            self.lines = [f"{profiler.get_fps():5.1f} fps"]
+            for name, milliseconds in profiler.get_phase_times()[:self.top_phases]:
+                self.lines.append(f"{milliseconds:6.2f} ms  {name}")
+
+        surface = self.surface
+        surface.fill((0, 0, 0, 160))
+        # Frame time bars, with the line at the 60 fps budget
+        scale = self.graph_height / (FRAME_BUDGET_MS * 2)
+        base = 5 + self.graph_height
+        for index, milliseconds in enumerate(profiler.get_frame_times(self.graph_frames)):
+            height = min(milliseconds * scale, self.graph_height)
+            color = (220, 60, 60) if milliseconds > SLOW_FRAME_MS else (80, 200, 80)
+            pygame.draw.line(surface, color, (5 + index * 2, base), (5 + index * 2, base - height))
+        budget_y = base - FRAME_BUDGET_MS * scale
+        pygame.draw.line(surface, (255, 255, 0), (5, budget_y), (self.rect.width - 5, budget_y))
+        y = base + 5
+        for line in self.lines:
+            surface.blit(text_cache.render(line, OVERLAY_TEXT_SIZE, (255, 255, 255)), (5, y))
+            y += self.line_height
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
@@ -0,0 +1,238 @@
+import heapq
+import itertools
+import math
+
+INF = float("inf")
+
+# Markers for the query's start and goal in the abstract graph, so they can't clash with node ids
+START = "start"
+GOAL = "goal"
+
+# Hierarchical pathfinding (HPA*-style) over a Graph.
+# Nodes are grouped into square regions of the map. Where edges cross from one region into another, one
+# edge per stretch of border (per portal_spacing) is kept as an entrance, and its end nodes are portals.
+# The shortest path inside a region between every pair of its portals is precomputed, so a query only
+# searches the start and goal regions node by node and everything in between is a search over portals.
+# Paths go through the kept entrances only, so they can be longer than the shortest: usually by a little,
+# but by half again on small or sparse graphs where an entrance sits far from the straight line.
+# find_path_segments() hands out the route a piece at a time, expanding each piece only when it is asked for.
+class RegionGraph:
+    def __init__(self, graph, region_size=320, portal_spacing=None):
+        self.graph = graph
+        self.region_size = region_size
+        self.portal_spacing = portal_spacing or region_size / 4
+        self.positions = {}  # key: node id, value: (x, y)
+        self.region_of = {}  # key: node id, value: region key (col, row)
+        self.members = {}  # key: region key, value: set of node ids
+        self.component_of = {}  # key: node id, value: number of its connected piece within its region
+        self.adjacent = {}  # key: region key, value: set of region keys an edge crosses into
+        self.entrances = {}  # key: (region, region) in sorted order, value: dict of entrance key -> (node, node, cost)
+        self.portals = {}  # key: region key, value: set of portal node ids
+        self.exits = {}  # key: portal id, value: list of (node in another region, cost) entrance edges
+        self.intra_costs = {}  # key: portal id, value: dict of other portal in the same region -> cost
+        self.intra_paths = {}  # key: region key, value: dict of (portal, portal) -> node ids between them
+        for node_id, pos in graph.nodes.items():
+            self.add_node(node_id, pos)
+        self.refresh_regions(list(self.members))
+        graph.add_listener(self)
+
+    def add_node(self, node_id, pos):
+        self.positions[node_id] = (pos[0], pos[1])
+        region = (int(pos[0] // self.region_size), int(pos[1] // self.region_size))
+        self.region_of[node_id] = region
+        self.members.setdefault(region, set()).add(node_id)
+
+    def distance(self, a, b):
+        (ax, ay), (bx, by) = self.positions[a], self.positions[b]
+        return math.hypot(ax - bx, ay - by)
+
+    def search_region(self, source, region):
+        # Dijkstra from source that never leaves the region. Returns (cost, came_from) dicts.
+        region_of = self.region_of
+        cost_so_far = {source: 0}
+        came_from = {source: None}
+        frontier = [(0, source)]
+        while frontier:
+            cost, current = heapq.heappop(frontier)
+            if cost > cost_so_far[current]:
+                continue
+            for neighbor, edge_cost in self.graph.edges[current]:
+                if region_of[neighbor] != region:
+                    continue
+                new_cost = cost + edge_cost
+                if new_cost < cost_so_far.get(neighbor, INF):
+                    cost_so_far[neighbor] = new_cost
+                    came_from[neighbor] = current
+                    heapq.heappush(frontier, (new_cost, neighbor))
+        return cost_so_far, came_from
+
+    def label_components(self, region):
+        # Number the pieces of a region that are connected without leaving it
+        region_of = self.region_of
+        unlabeled = set(self.members.get(region, ()))
+        component = 0
+        while unlabeled:
+            stack = [unlabeled.pop()]
+            while stack:
+                node_id = stack.pop()
+                self.component_of[node_id] = component
+                for neighbor, _ in self.graph.edges[node_id]:
+                    if neighbor in unlabeled and region_of[neighbor] == region:
+                        unlabeled.discard(neighbor)
+                        stack.append(neighbor)
+            component += 1
+
+    def refresh_regions(self, regions):
+        # Recompute the entrances around some regions, then the portals of every region they touch
+        region_of = self.region_of
+        component_of = self.component_of
+        spacing = self.portal_spacing
+        touched = set(regions)
+        for region in regions:
+            self.label_components(region)
+            for other in self.adjacent.pop(region, ()):
+                self.entrances.pop((min(region, other), max(region, other)), None)
+                self.adjacent.get(other, set()).discard(region)
+                touched.add(other)
+        for region in regions:
+            adjacent = self.adjacent.setdefault(region, set())
+            for node_id in self.members.get(region, ()):
+                for neighbor, edge_cost in self.graph.edges[node_id]:
+                    other = region_of[neighbor]
+                    if other == region:
+                        continue
+                    adjacent.add(other)
+                    self.adjacent.setdefault(other, set()).add(region)
+                    touched.add(other)
+                    # Store the edge oriented from the lower region, so both sides pick the same one
+                    if other < region:
+                        edge = (neighbor, node_id, edge_cost)
+                    else:
+                        edge = (node_id, neighbor, edge_cost)
+                    low, high = edge[0], edge[1]
+                    middle_x = (self.positions[low][0] + self.positions[high][0]) / 2
+                    middle_y = (self.positions[low][1] + self.positions[high][1]) / 2
+                    # Edges along the same stretch of border that join the same pieces are interchangeable
+                    key = (component_of[low], component_of[high], int(middle_x // spacing), int(middle_y // spacing))
+                    entrances = self.entrances.setdefault((region_of[low], region_of[high]), {})
+                    if key not in entrances or edge < entrances[key]:
+                        entrances[key] = edge
+        for region in touched:
+            self.refresh_portals(region)
+
+    def refresh_portals(self, region):
+        # Recompute the portals of a region and the paths between them
+        for portal in self.portals.get(region, ()):
+            self.intra_costs.pop(portal, None)
+            self.exits.pop(portal, None)
+        portals = set()
+        for other in self.adjacent.get(region, ()):
+            for low, high, edge_cost in self.entrances.get((min(region, other), max(region, other)), {}).values():
+                portal, outside = (low, high) if self.region_of[low] == region else (high, low)
+                portals.add(portal)
+                self.exits.setdefault(portal, []).append((outside, edge_cost))
+        self.portals[region] = portals
+        intra_paths = self.intra_paths[region] = {}
+        for portal in portals:
+            cost_so_far, came_from = self.search_region(portal, region)
+            self.intra_costs[portal] = {}
+            for other in portals:
+                if other != portal and other in cost_so_far:
+                    self.intra_costs[portal][other] = cost_so_far[other]
+                    intra_paths[(portal, other)] = trace_back(came_from, other)[1:]
+
+    # Graph listener callbacks
+
+    def node_added(self, node_id):
+        self.add_node(node_id, self.graph.nodes[node_id])
+        self.refresh_regions([self.region_of[node_id]])
+
+    def edge_added(self, from_node, to_node, cost):
+        self.refresh_regions(list({self.region_of[from_node], self.region_of[to_node]}))
+
+    def edge_removed(self, from_node, to_node, cost):
+        self.edge_added(from_node, to_node, cost)
+
+    # Queries
+
+    def find_path(self, start, goal):
+        # The whole path as one list, shaped like astar_search's result. Empty if goal is unreachable.
+        path = []
+        for segment in self.find_path_segments(start, goal):
+            path.extend(segment)
+        return path
+
+    def find_path_segments(self, start, goal):
+        # Search the abstract graph now, then yield the path in pieces: the first piece starts with
+        # start, and later pieces continue from where the previous one ended. Nothing is yielded if
+        # goal is unreachable.
+        start_region = self.region_of[start]
+        goal_region = self.region_of[goal]
+        start_costs, start_came_from = self.search_region(start, start_region)
+        goal_costs, goal_came_from = self.search_region(goal, goal_region)
+
+        # Abstract edges out of the start, into the goal, and straight across a shared region
+        start_edges = {portal: start_costs[portal] for portal in self.portals[start_region] if portal in start_costs}
+        goal_edges = {portal: goal_costs[portal] for portal in self.portals[goal_region] if portal in goal_costs}
+        if start_region == goal_region and goal in start_costs:
+            start_edges[GOAL] = start_costs[goal]
+
+        abstract_path = self.search_abstract(start_edges, goal_edges, goal)
+        if abstract_path is None:
+            return iter(())
+        return self.refine(abstract_path, start, goal, start_came_from, goal_came_from)
+
+    def search_abstract(self, start_edges, goal_edges, goal):
+        # A* over portals, from START to GOAL
+        counter = itertools.count()  # Tie-breaker, since START and GOAL don't compare with node ids
+        cost_so_far = {START: 0}
+        came_from = {START: None}
+        frontier = [(0, next(counter), START)]
+        while frontier:
+            _, _, current = heapq.heappop(frontier)
+            if current == GOAL:
+                break
+            if current == START:
+                edges = start_edges.items()
+            else:
+                edges = list(self.intra_costs.get(current, {}).items())
+                edges.extend(self.exits.get(current, ()))
+                if current in goal_edges:
+                    edges.append((GOAL, goal_edges[current]))
+            for neighbor, edge_cost in edges:
+                new_cost = cost_so_far[current] + edge_cost
+                if new_cost < cost_so_far.get(neighbor, INF):
+                    cost_so_far[neighbor] = new_cost
+                    came_from[neighbor] = current
+                    estimate = 0 if neighbor == GOAL else self.distance(neighbor, goal)
+                    heapq.heappush(frontier, (new_cost + estimate, next(counter), neighbor))
+        if GOAL not in came_from:
+            return None
+        return trace_back(came_from, GOAL)
+
+    def refine(self, abstract_path, start, goal, start_came_from, goal_came_from):
+        # Expand the abstract path into graph nodes one step at a time
+        region_of = self.region_of
+        for index in range(len(abstract_path) - 1):
+            current = abstract_path[index]
+            following = abstract_path[index + 1]
+            if current == START and following == GOAL:
+                yield trace_back(start_came_from, goal)
+            elif current == START:
+                yield trace_back(start_came_from, following)
+            elif following == GOAL:
+                # The goal search ran from the goal, so its path is walked backwards
+                yield trace_back(goal_came_from, current)[::-1][1:]
+            elif region_of[current] == region_of[following]:
+                yield list(self.intra_paths[region_of[current]][(current, following)])
+            else:
+                yield [following]
+
+def trace_back(came_from, node):
+    # Path from the search's source to node, following came_from links
+    path = []
+    while node is not None:
+        path.append(node)
+        node = came_from[node]
+    path.reverse()
+    return path
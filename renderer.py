@@ -0,0 +1,220 @@
+import pygame
+from text_cache import text_cache
+
+CLOCK_POSITION = (10, 10)  # Top-left corner of the time display
+
+# Draw an "X" on the screen at the given position
+def draw_x(surface, position, size=20, color=(255, 0, 0)):
+    pygame.draw.line(surface, color, (position.x - size, position.y - size), (position.x + size, position.y + size), 3)
+    pygame.draw.line(surface, color, (position.x + size, position.y - size), (position.x - size, position.y + size), 3)
+
+# Merge overlapping rects so no area is redrawn twice
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+# Draws the state of a Simulation; it never changes that state.
+# The map, location markers and roads are composited once into a static layer. Each frame only the areas
+# that changed (moving characters, the clock text and the modal) are restored from that layer, redrawn
+# and passed to pygame.display.update; nothing is sent to the display when nothing changed.
+# With a Camera and MapTiles the world scrolls and zooms and the map is streamed from tiles. When the view
+# pans, the static layer is scrolled and only the strips that came into view are drawn; it is rebuilt
+# when the view zooms or streamed tiles arrive.
+class Renderer:
+    # background_image is the map already scaled to the screen, e.g. from an AssetLoader; if left out and
+    # there are no map tiles, map.jpg is loaded here
+    def __init__(self, screen, simulation, camera=None, map_tiles=None, background_image=None):
+        self.screen = screen
+        self.simulation = simulation
+        self.camera = camera
+        self.map_tiles = map_tiles
+
+        # Load the HUD, modal and button fonts before the frame loop starts
+        text_cache.preload((24, 36))
+
+        if map_tiles is None and background_image is None:
+            # Load the background image and scale it to full screen
+            background_image_original = pygame.image.load("map.jpg")
+            background_image = pygame.transform.scale(background_image_original, screen.get_size())
+        self.background_image = background_image
+        self.camera_version = camera.version if camera is not None else None
+        self.camera_center = None  # View the static layer was drawn for
+        self.camera_zoom = None
+        self.prefetched_path = None
+        self.static_layer = self.build_static_layer()
+
+        # What was drawn last frame, to find what changed
+        self.character_rects = {}  # key: character name, value: (rect, sprite)
+        self.clock_text = None
+        self.clock_surf = None
+        self.clock_rect = pygame.Rect(CLOCK_POSITION, (0, 0))
+        self.modal_was_active = False
+        self.needs_full_redraw = True
+        self.overlay = None  # Drawn on top of everything and redrawn every frame, e.g. a ProfilerOverlay
+
+    def to_screen(self, pos):
+        # World position to screen position
+        if self.camera is None:
+            return pos
+        return self.camera.world_to_screen(pos)
+
+    def build_static_layer(self):
+        layer = pygame.Surface(self.screen.get_size())
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+        self.draw_static(layer)
+        self.save_view()
+        return layer
+
+    def scroll_static_layer(self, dx, dy):
+        # Move the static layer by whole pixels and draw the strips that came into view
+        layer = self.static_layer
+        width, height = layer.get_size()
+        if abs(dx) >= width or abs(dy) >= height:
+            self.static_layer = self.build_static_layer()
+            return
+        layer.scroll(dx, dy)
+        strips = []
+        if dx:
+            strips.append(pygame.Rect(0 if dx > 0 else width + dx, 0, abs(dx), height))
+        if dy:
+            strips.append(pygame.Rect(0, 0 if dy > 0 else height + dy, width, abs(dy)))
+        for strip in strips:
+            layer.set_clip(strip)
+            self.draw_static(layer)
+        layer.set_clip(None)
+        self.save_view()
+
+    def save_view(self):
+        if self.camera is not None:
+            self.camera_center = self.camera.center.copy()
+            self.camera_zoom = self.camera.zoom
+
+    def draw_static(self, layer):
+        # The map, location markers and roads, within the layer's clip area
+        graph = self.simulation.graph
+        if self.map_tiles is not None:
+            self.map_tiles.draw(layer, self.camera)
+        else:
+            layer.blit(self.background_image, layer.get_clip(), layer.get_clip())
+
+        # Draw allowed positions as "X" marks
+        for loc in self.simulation.world.allowed_positions:
+            draw_x(layer, self.to_screen(loc['pos']))
+
+        # Draw edges (paths) between nodes, once per pair of nodes
+        for node_id, edges in graph.edges.items():
+            for neighbor_id, _ in edges:
+                if node_id < neighbor_id:
+                    start_pos = self.to_screen(graph.nodes[node_id])
+                    end_pos = self.to_screen(graph.nodes[neighbor_id])
+                    pygame.draw.line(layer, (255, 255, 0), start_pos, end_pos, 2)
+
+    def update_view(self):
+        # Rebuild the static layer when the camera moved or streamed map tiles came in
+        if self.map_tiles is not None:
+            # Prefetch the tiles along the player's path whenever the player gets a new one
+            player = self.simulation.character_manager.player
+            if player.path and player.path is not self.prefetched_path:
+                self.prefetched_path = player.path
+                self.map_tiles.prefetch(self.camera, [self.simulation.graph.nodes[node] for node in player.path])
+            if self.map_tiles.poll():
+                self.invalidate(rebuild_static_layer=True)
+        camera = self.camera
+        if camera is not None and camera.version != self.camera_version:
+            self.camera_version = camera.version
+            # A background image stays put on screen, so only a tiled map can be scrolled
+            scroll = camera.get_scroll(self.camera_center, self.camera_zoom) if self.map_tiles is not None else None
+            if scroll is None:
+                self.invalidate(rebuild_static_layer=True)
+            elif scroll != (0, 0):
+                self.scroll_static_layer(*scroll)
+                self.invalidate()
+
+    def set_overlay(self, overlay):
+        self.overlay = overlay
+        self.invalidate()
+
+    def invalidate(self, rebuild_static_layer=False):
+        # Redraw the whole screen next frame, e.g. after the window was covered or the roads changed
+        if rebuild_static_layer:
+            self.static_layer = self.build_static_layer()
+        self.needs_full_redraw = True
+
+    # alpha is how far real time is between the last two ticks; characters are drawn that far between their
+    # positions at those ticks, so movement looks smooth when frames and ticks don't line up.
+    def draw(self, alpha=1):
+        screen = self.screen
+        simulation = self.simulation
+        modal = simulation.modal
+        character_manager = simulation.character_manager
+        self.update_view()
+        dirty = []
+
+        # Characters whose sprite or position changed dirty both their old and new area. Only characters that
+        # can be seen are in the batch, so one that left the view or went behind the modal counts as gone.
+        covered = modal.rect if modal.active else None
+        batch = character_manager.get_sprite_batch(alpha, self.camera, screen.get_rect(), covered)
+        character_rects = {}
+        for sprite, rect, character in batch:
+            character_rects[character.character_name] = (rect, sprite)
+            previous = self.character_rects.pop(character.character_name, None)
+            if previous is None:
+                dirty.append(rect)
+            elif previous[0] != rect or previous[1] is not sprite:
+                dirty.append(previous[0])
+                dirty.append(rect)
+        # Characters that are gone leave their old area dirty
+        for rect, _ in self.character_rects.values():
+            dirty.append(rect)
+        self.character_rects = character_rects
+
+        # The clock only changes when the displayed minute does
+        time_text = simulation.time_manager.get_time_text()
+        if time_text != self.clock_text:
+            dirty.append(self.clock_rect)
+            self.clock_text = time_text
+            self.clock_surf = text_cache.render(time_text, 36, (255, 255, 255))
+            self.clock_rect = self.clock_surf.get_rect(topleft=CLOCK_POSITION)
+            dirty.append(self.clock_rect)
+
+        # The modal's contents can change every frame while it is open
+        if modal.active or self.modal_was_active:
+            dirty.append(modal.rect)
+        self.modal_was_active = modal.active
+
+        if self.overlay is not None:
+            self.overlay.update()
+            dirty.append(self.overlay.rect)
+
+        if self.needs_full_redraw:
+            dirty = [screen.get_rect()]
+            self.needs_full_redraw = False
+        if not dirty:
+            return
+
+        dirty = [rect.clip(screen.get_rect()) for rect in merge_rects(dirty)]
+        sprites = [(sprite, rect) for sprite, rect, _ in batch]
+        rects = [rect for _, rect in sprites]
+        for area in dirty:
+            # Restore the static layer, then redraw everything on top of it, clipped to this area
+            screen.set_clip(area)
+            screen.blit(self.static_layer, area, area)
+            screen.blits([sprites[index] for index in area.collidelistall(rects)], doreturn=False)
+            if modal.active and modal.rect.colliderect(area):
+                modal.draw(screen)
+            if self.clock_rect.colliderect(area):
+                screen.blit(self.clock_surf, self.clock_rect)
+            if self.overlay is not None and self.overlay.rect.colliderect(area):
+                self.overlay.draw(screen)
+        screen.set_clip(None)
+
+        # Update only the changed areas of the display
+        pygame.display.update(dirty)
@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import pygame
+from simulation import Simulation
+from compact_graph import CompactGraph
+from savegame import to_bytes
+
+REPLAY_VERSION = 1
+
+# A recording is JSON lines:
+#   {"version": 1, "options": {...}}  The Simulation arguments, so the replay builds the same game
+#   {"tick": 12, "type": "click", "pos": [x, y], "button": 1, "world_pos": [x, y]}  One per input, in order;
+#       tick is Simulation.tick_count when the input was handled, i.e. before the ticks of its frame
+#   {"end_tick": 3600, "state_hash": "..."}  Written when recording stops
+# Only clicks change the simulation; keys and the mouse wheel only move the camera, so they aren't recorded.
+
+# Records the inputs handed to a Simulation with the tick they arrived on.
+# The simulation calls record_click() from handle_click() while this is its recorder.
+class InputRecorder:
+    def __init__(self, path, simulation):
+        self.path = path
+        self.simulation = simulation
+        self.input_count = 0
+        self.file = open(path, "w")
+        self.write({"version": REPLAY_VERSION, "options": get_options(simulation)})
+        simulation.recorder = self
+
+    def record_click(self, event, world_pos):
+        self.write({
+            "tick": self.simulation.tick_count,
+            "type": "click",
+            "pos": list(event.pos),
+            "button": event.button,
+            "world_pos": None if world_pos is None else [world_pos[0], world_pos[1]],
+        })
+        self.input_count += 1
+
+    def close(self):
+        # Ends the recording with the state it should reproduce. Returns the state hash.
+        simulation = self.simulation
+        simulation.recorder = None
+        digest = state_hash(simulation)
+        self.write({"end_tick": simulation.tick_count, "state_hash": digest})
+        self.file.close()
+        return digest
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()  # Keep what was recorded if the game crashes
+
+# Reads a recording and plays it into a headless Simulation as fast as it will run.
+#
+#   replayer = InputReplayer("session.replay")
+#   simulation = replayer.run()
+#   replayer.verify(simulation)
+class InputReplayer:
+    def __init__(self, path):
+        self.path = path
+        self.options = None
+        self.inputs = []
+        self.end_tick = None  # None if the recording was cut off before it was closed
+        self.state_hash = None
+        with open(path) as recording:
+            for line_number, line in enumerate(recording, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if line_number == 1:
+                    if entry.get("version") != REPLAY_VERSION:
+                        raise ValueError(f"{path} is not a version {REPLAY_VERSION} recording")
+                    self.options = entry["options"]
+                elif "end_tick" in entry:
+                    self.end_tick = entry["end_tick"]
+                    self.state_hash = entry["state_hash"]
+                else:
+                    self.inputs.append(entry)
+
+    def make_simulation(self):
+        options = dict(self.options)
+        path_budget_ms = options.pop("path_budget_ms", None)
+        simulation = Simulation(load_images=False, **options)
+        path_service = simulation.character_manager.path_service
+        if path_service is not None:
+            path_service.budget_ms = path_budget_ms
+        return simulation
+
+    def run(self, simulation=None, end_tick=None):
+        # Play every input at its tick, then run on to end_tick (by default where the recording ended).
+        # Returns the Simulation.
+        if simulation is None:
+            simulation = self.make_simulation()
+        for entry in self.inputs:
+            simulation.step(entry["tick"] - simulation.tick_count)
+            event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=tuple(entry["pos"]), button=entry["button"])
+            world_pos = entry["world_pos"]
+            simulation.handle_click(event, None if world_pos is None else tuple(world_pos))
+        if end_tick is None:
+            end_tick = self.end_tick if self.end_tick is not None else simulation.tick_count
+        simulation.step(max(end_tick - simulation.tick_count, 0))
+        return simulation
+
+    def verify(self, simulation):
+        # True if simulation ended where the recorded game did. Raises ValueError if nothing was recorded to check.
+        if self.state_hash is None:
+            raise ValueError(f"{self.path} has no end state; the recording wasn't closed")
+        return simulation.tick_count == self.end_tick and state_hash(simulation) == self.state_hash
+
+def get_options(simulation):
+    # The Simulation arguments that change how it plays out
+    world = simulation.world
+    character_manager = simulation.character_manager
+    path_service = character_manager.path_service
+    return {
+        "screen_width": world.screen_width,
+        "screen_height": world.screen_height,
+        "tick_rate": simulation.tick_rate,
+        "compact_graph": isinstance(world.graph, CompactGraph),
+        "use_path_table": world.path_table is not None,
+        "region_size": world.region_graph.region_size if world.region_graph is not None else None,
+        "flow_fields": world.flow_fields is not None,
+        "batch_movement": character_manager.mover is not None,
+        "async_paths": path_service is not None,
+        # Paths planned within a time budget, or in other processes, arrive on ticks that depend on the machine,
+        # so a replay only matches if the recorded game had no budget and planned on its own process
+        "path_budget_ms": path_service.budget_ms if path_service is not None else None,
+        "separation": character_manager.separation is not None,
+        "farm_clock": simulation.farm_clock,
+    }
+
+def state_hash(simulation):
+    # SHA-256 of everything that decides how the game plays on from here, as a hex string.
+    # Equal hashes mean the same tick, time, characters, NPC routines, modal and farm, down to the last bit of every float.
+    simulation.character_manager.sync()
+    digest = hashlib.sha256()
+    digest.update(struct.pack("<Qd", simulation.tick_count, simulation.time_manager.total_minutes))
+    characters = sorted(simulation.character_manager.get_characters(), key=lambda character: character.character_name)
+    for character in characters:
+        digest.update(repr((
+            character.character_name, tuple(character.pos), tuple(character.previous_pos), character.direction,
+            character.frame_index, character.idle_timer, character.is_idle, character.hunger, character.energy,
+            character.current_location_name, character.target_location_name, character.previous_location_name,
+            list(character.path), character.path_segments is not None,
+        )).encode("utf-8"))
+    for name, routine in sorted(simulation.npc_scheduler.routines.items()):
+        digest.update(repr((name, routine.need, routine.needs_minutes, routine.wake_time)).encode("utf-8"))
+    modal = simulation.modal
+    digest.update(repr((modal.active, modal.location_name)).encode("utf-8"))
+    farm_game = simulation.farm_game
+    digest.update(to_bytes(farm_game.planted, "B"))
+    digest.update(to_bytes(farm_game.growth_stage, "b"))
+    digest.update(to_bytes(farm_game.next_growth_time, "d"))
+    return digest.hexdigest()
+
+if __name__ == "__main__":
+    # Usage: python replay.py session.replay [--ticks 100000]
+    parser = argparse.ArgumentParser(description="Replay recorded input headlessly and check the end state")
+    parser.add_argument("recording")
+    parser.add_argument("--ticks", type=int, help="Run to this tick instead of where the recording ended")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Replays run without a window
+    pygame.init()
+    replayer = InputReplayer(args.recording)
+    start = time.perf_counter()
+    simulation = replayer.run(end_tick=args.ticks)
+    elapsed = time.perf_counter() - start
+    print(f"{len(replayer.inputs)} inputs, {simulation.tick_count} ticks in {elapsed:.2f} s "
+          f"({simulation.tick_count / max(elapsed, 1e-9):.0f} ticks/s)")
+    print("State hash:", state_hash(simulation))
+    matched = None
+    if args.ticks is None and replayer.state_hash is not None:
+        matched = replayer.verify(simulation)
+        print("Matches the recording" if matched else f"DIFFERS from the recording: {replayer.state_hash}")
+    simulation.close()
+    if matched is not None:
+        sys.exit(0 if matched else 1)
@@ -0,0 +1,288 @@
+import os
+import struct
+import zlib
+from array import array
+from farm import np
+from movement import DIRECTIONS, DIRECTION_CODES
+
+SAVE_PATH = "savegame.dat"
+MAGIC = b"MEDSAVE2"
+FULL = 1  # Record kinds
+DELTA = 2
+
+RECORD_HEADER = struct.Struct("<BIQI")  # Kind, payload length, simulation tick count, CRC-32 of the payload
+TIME = struct.Struct("<d")  # TimeManager.total_minutes
+COUNT = struct.Struct("<I")
+STRING_LENGTH = struct.Struct("<H")
+CHARACTER = struct.Struct("<4dB")  # pos x, pos y, hunger, energy, direction code
+ROUTINE = struct.Struct("<Bdd")  # NEEDS code, minutes when needs were last updated, wake time
+NEEDS = (None, "eat", "rest")  # Routine.need by code
+NO_STRING = 0xFFFF  # STRING_LENGTH of None
+
+# Layout of a save file:
+#   MAGIC, then records. Each record is a RECORD_HEADER and a payload:
+#     TIME
+#     COUNT characters, each: name, CHARACTER, current, target and previous location names (strings are
+#       STRING_LENGTH and UTF-8, None is NO_STRING), then COUNT path node ids as int32
+#     Farm: in a FULL record COUNT cells, then every cell's planted flag (uint8), growth stage (int8) and
+#       next growth time (float64) as three arrays. In a DELTA record the same, but preceded by the uint32
+#       cell numbers the arrays are for.
+#     COUNT NPC routines, each: character name, ROUTINE
+#   The first record is FULL. Each DELTA record only holds the characters, cells and routines that changed
+#   since the record before it, so loading replays them in order. A record cut short by a crash is ignored.
+
+# Saves a Simulation as a full snapshot followed by an append-only journal of changes.
+# save() appends a DELTA record with only what changed since the last save, so autosaving a large,
+# mostly idle world writes little. Once the journal outgrows compact_ratio times the snapshot, the next
+# save rewrites the file as a single FULL record.
+class SaveJournal:
+    def __init__(self, path=SAVE_PATH, compact_ratio=4):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.saved_characters = None  # key: character name, value: change key as of the last save
+        self.saved_farm = None  # Copies of the farm arrays as of the last save
+        self.saved_routines = None  # key: character name, value: Routine state as of the last save
+        self.snapshot_size = 0  # Bytes in the FULL record
+        self.file_size = 0
+
+    def save(self, simulation):
+        # Returns the number of bytes written
+        if (self.saved_characters is None or not os.path.exists(self.path)
+                or self.file_size > self.compact_ratio * self.snapshot_size):
+            return self.save_full(simulation)
+        simulation.character_manager.sync()
+        changed = [character for character in simulation.character_manager.get_characters()
+                   if get_change_key(character) != self.saved_characters.get(character.character_name)]
+        cells = self.get_changed_cells(simulation.farm_game)
+        routines = [routine for name, routine in simulation.npc_scheduler.routines.items()
+                    if get_routine_key(routine) != self.saved_routines.get(name)]
+        record = self.make_record(DELTA, simulation, changed, cells, routines)
+        with open(self.path, "ab") as save_file:
+            save_file.write(record)
+        self.file_size += len(record)
+        return len(record)
+
+    def save_full(self, simulation):
+        simulation.character_manager.sync()
+        self.saved_characters = {}
+        self.saved_routines = {}
+        record = self.make_record(FULL, simulation, simulation.character_manager.get_characters(), None,
+                                  simulation.npc_scheduler.routines.values())
+        # Write a new file and swap it in, so a crash leaves the old save intact
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as save_file:
+            save_file.write(MAGIC)
+            save_file.write(record)
+        os.replace(temporary_path, self.path)
+        self.snapshot_size = len(record)
+        self.file_size = len(MAGIC) + len(record)
+        return self.file_size
+
+    def load(self, simulation):
+        # Restore a Simulation from the file. Raises ValueError if it isn't a save file.
+        with open(self.path, "rb") as save_file:
+            data = save_file.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a save file")
+        characters = {character.character_name: character for character in simulation.character_manager.get_characters()}
+        farm_game = simulation.farm_game
+        offset = len(MAGIC)
+        self.saved_characters = {}
+        self.saved_routines = {}
+        loaded = {}  # key: character name, value: Character that a record changed
+        while offset + RECORD_HEADER.size <= len(data):
+            kind, length, tick_count, checksum = RECORD_HEADER.unpack_from(data, offset)
+            payload = memoryview(data)[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break  # Torn write at the end of the journal
+            if kind == FULL:
+                self.snapshot_size = RECORD_HEADER.size + length
+            self.apply_record(kind, payload, simulation, characters, loaded)
+            simulation.tick_count = tick_count
+            offset += RECORD_HEADER.size + length
+        self.file_size = offset
+        if offset < len(data):
+            # Drop the damaged tail so later records are appended after the last good one
+            with open(self.path, "r+b") as save_file:
+                save_file.truncate(offset)
+        farm_game.reschedule()
+        self.saved_farm = copy_farm(farm_game)
+        simulation.npc_scheduler.reschedule()
+
+        # Paths handed out in pieces, or still being planned, were saved only as far as they were known
+        world = simulation.world
+        for character in loaded.values():
+            if character.mover is not None:
+                character.mover.reset_character(character)
+            target = character.target_location_name
+            if target is not None and character.current_location_name != target:
+                if not character.path or character.path[-1] != world.node_ids[target]:
+                    character.compute_path()
+
+    # Writing
+
+    def make_record(self, kind, simulation, characters, cells, routines):
+        farm_game = simulation.farm_game
+        parts = [TIME.pack(simulation.time_manager.total_minutes), COUNT.pack(len(characters))]
+        for character in characters:
+            parts.append(encode_string(character.character_name))
+            parts.append(CHARACTER.pack(character.pos.x, character.pos.y, character.hunger, character.energy,
+                                        DIRECTION_CODES[character.direction]))
+            parts.append(encode_string(character.current_location_name))
+            parts.append(encode_string(character.target_location_name))
+            parts.append(encode_string(character.previous_location_name))
+            parts.append(COUNT.pack(len(character.path)))
+            parts.append(array("i", character.path).tobytes())
+            self.saved_characters[character.character_name] = get_change_key(character)
+
+        if kind == FULL:
+            parts.append(COUNT.pack(len(farm_game.planted)))
+            parts.append(to_bytes(farm_game.planted, "B"))
+            parts.append(to_bytes(farm_game.growth_stage, "b"))
+            parts.append(to_bytes(farm_game.next_growth_time, "d"))
+        else:
+            parts.append(COUNT.pack(len(cells)))
+            parts.append(array("I", cells).tobytes())
+            parts.append(bytes(int(farm_game.planted[cell]) for cell in cells))
+            parts.append(array("b", (int(farm_game.growth_stage[cell]) for cell in cells)).tobytes())
+            parts.append(array("d", (float(farm_game.next_growth_time[cell]) for cell in cells)).tobytes())
+        self.saved_farm = copy_farm(farm_game)
+
+        routines = list(routines)
+        parts.append(COUNT.pack(len(routines)))
+        for routine in routines:
+            name = routine.character.character_name
+            parts.append(encode_string(name))
+            parts.append(ROUTINE.pack(NEEDS.index(routine.need), routine.needs_minutes, routine.wake_time))
+            self.saved_routines[name] = get_routine_key(routine)
+
+        payload = b"".join(parts)
+        return RECORD_HEADER.pack(kind, len(payload), simulation.tick_count, zlib.crc32(payload)) + payload
+
+    def get_changed_cells(self, farm_game):
+        saved_planted, saved_stage, saved_time = self.saved_farm
+        if np is not None:
+            changed = ((farm_game.planted != saved_planted) | (farm_game.growth_stage != saved_stage)
+                       | (farm_game.next_growth_time != saved_time))
+            return np.flatnonzero(changed).tolist()
+        if (farm_game.planted == saved_planted and farm_game.growth_stage == saved_stage
+                and farm_game.next_growth_time == saved_time):
+            return []
+        return [cell for cell in range(len(saved_planted))
+                if farm_game.planted[cell] != saved_planted[cell] or farm_game.growth_stage[cell] != saved_stage[cell]
+                or farm_game.next_growth_time[cell] != saved_time[cell]]
+
+    # Reading
+
+    def apply_record(self, kind, payload, simulation, characters, loaded):
+        reader = Reader(payload)
+        (simulation.time_manager.total_minutes,) = reader.unpack(TIME)
+        (character_count,) = reader.unpack(COUNT)
+        for _ in range(character_count):
+            name = reader.read_string()
+            character = characters.get(name)
+            if character is None:
+                raise ValueError(f"Save file has a character that isn't in the game: {name}")
+            x, y, character.hunger, character.energy, direction = reader.unpack(CHARACTER)
+            character.pos.update(x, y)
+            character.previous_pos.update(x, y)
+            character.direction = DIRECTIONS[direction]
+            character.current_location_name = reader.read_string()
+            character.target_location_name = reader.read_string()
+            character.previous_location_name = reader.read_string()
+            (path_length,) = reader.unpack(COUNT)
+            character.path = reader.read_array("i", path_length).tolist()
+            character.path_segments = None
+            character.path_ticket = None
+            loaded[name] = character
+            self.saved_characters[name] = get_change_key(character)
+
+        farm_game = simulation.farm_game
+        (cell_count,) = reader.unpack(COUNT)
+        if kind == FULL:
+            if cell_count != len(farm_game.planted):
+                raise ValueError(f"Save file has {cell_count} farm tiles, the game has {len(farm_game.planted)}")
+            cells = None
+        else:
+            cells = reader.read_array("I", cell_count)
+        planted = reader.read_array("B", cell_count)
+        growth_stage = reader.read_array("b", cell_count)
+        next_growth_time = reader.read_array("d", cell_count)
+        if np is not None:
+            cells = slice(None) if cells is None else np.asarray(cells)
+            farm_game.planted[cells] = np.asarray(planted).astype(bool)
+            farm_game.growth_stage[cells] = np.asarray(growth_stage)
+            farm_game.next_growth_time[cells] = np.asarray(next_growth_time)
+        elif cells is None:
+            farm_game.planted[:] = array("b", planted)
+            farm_game.growth_stage[:] = growth_stage
+            farm_game.next_growth_time[:] = next_growth_time
+        else:
+            for index, cell in enumerate(cells):
+                farm_game.planted[cell] = planted[index]
+                farm_game.growth_stage[cell] = growth_stage[index]
+                farm_game.next_growth_time[cell] = next_growth_time[index]
+
+        routines = simulation.npc_scheduler.routines
+        (routine_count,) = reader.unpack(COUNT)
+        for _ in range(routine_count):
+            name = reader.read_string()
+            routine = routines.get(name)
+            if routine is None:
+                raise ValueError(f"Save file has a routine for a character without one: {name}")
+            need, routine.needs_minutes, routine.wake_time = reader.unpack(ROUTINE)
+            routine.need = NEEDS[need]
+            self.saved_routines[name] = get_routine_key(routine)
+
+# Reads values from a payload in order
+class Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def read_string(self):
+        (length,) = self.unpack(STRING_LENGTH)
+        if length == NO_STRING:
+            return None
+        text = bytes(self.data[self.offset:self.offset + length]).decode("utf-8")
+        self.offset += length
+        return text
+
+    def read_array(self, typecode, count):
+        values = array(typecode)
+        end = self.offset + count * values.itemsize
+        values.frombytes(self.data[self.offset:end])
+        self.offset = end
+        return values
+
+def encode_string(text):
+    if text is None:
+        return STRING_LENGTH.pack(NO_STRING)
+    encoded = text.encode("utf-8")
+    return STRING_LENGTH.pack(len(encoded)) + encoded
+
+def get_change_key(character):
+    # Everything saved for a character, cheaply. A path only ever changes by being replaced, shortened
+    # from the front or extended, so its identity, length and first node stand in for its contents.
+    path = character.path
+    return (character.pos.x, character.pos.y, character.hunger, character.energy, character.direction,
+            character.current_location_name, character.target_location_name, character.previous_location_name,
+            id(path), len(path), path[0] if path else None)
+
+def get_routine_key(routine):
+    return (routine.need, routine.needs_minutes, routine.wake_time)
+
+def to_bytes(values, typecode):
+    # Raw bytes of a farm array, whether it is a NumPy array or an array.array
+    if np is not None:
+        return values.astype({"B": np.uint8, "b": np.int8, "d": np.float64}[typecode]).tobytes()
+    return array(typecode, values).tobytes()
+
+def copy_farm(farm_game):
+    arrays = (farm_game.planted, farm_game.growth_stage, farm_game.next_growth_time)
+    return tuple(values.copy() if np is not None else values[:] for values in arrays)
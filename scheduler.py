@@ -0,0 +1,42 @@
+import heapq
+import itertools
+
+# Priority queue of timed events.
+# Items are popped in time order once their time has passed, so each update only touches the items that
+# are due instead of everything that is waiting. Times can be in any unit (milliseconds, in-game minutes).
+class EventScheduler:
+    def __init__(self):
+        self.heap = []  # Entries are [time, sequence number, item]
+        self.counter = itertools.count()  # Keeps equal times in scheduling order
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, time, item):
+        # Returns the entry, which can be passed to cancel()
+        entry = [time, next(self.counter), item]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def schedule_all(self, events):
+        # Schedule many (time, item) pairs at once, in linear time
+        self.heap.extend([time, next(self.counter), item] for time, item in events)
+        heapq.heapify(self.heap)
+
+    def cancel(self, entry):
+        # Cancelled entries stay in the heap and are skipped when they come up
+        entry[2] = None
+
+    def peek_time(self):
+        # Time of the next event, or None if nothing is scheduled
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        # Yield (time, item) for every event strictly before now, including ones scheduled while iterating
+        heap = self.heap
+        while heap and heap[0][0] < now:
+            time, _, item = heapq.heappop(heap)
+            if item is not None:
+                yield time, item
@@ -0,0 +1,272 @@
+import math
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from movement import BatchMovement, DIRECTIONS, np
+from world import World
+from characters import Character, npc_animations_config, npc_idle_config
+
+DEFAULT_SHARD_REGION_SIZE = 320  # Width of the region columns the map is split into
+
+# Per-character arrays kept in shared memory: (name, dtype, values per character).
+# Row i is the character add_character() returned i for, whichever shard is moving it.
+SHARED_FIELDS = (
+    ("pos", "float64", 2),
+    ("previous_pos", "float64", 2),
+    ("frame_index", "float64", 1),
+    ("direction", "int8", 1),
+    ("is_idle", "bool", 1),
+    ("shard", "int16", 1),  # Shard moving the character, -1 for an unused row
+)
+
+# A population of characters moved by several worker processes, for headless simulations too big for one core.
+# The map is cut into shards along columns of graph regions, balanced by how many nodes they hold, and each
+# shard's characters are moved by BatchMovement in its own process with its own copy of the World.
+# Workers write positions and animation state straight into shared memory, so positions, previous_positions,
+# frame_index, direction and is_idle here are read without anything being pickled. Commands and handoffs
+# go over pipes: after each step a character that has walked into another shard's columns is passed there
+# with its path. The graph is copied when the workers start; changes to it after that don't reach them.
+#
+#   population = ShardedPopulation(shard_count=8, capacity=100000)
+#   index = population.add_character("Villager", pos, speed=1)
+#   population.set_target(index, "Tavern")
+#   population.step()
+#   population.positions[index]
+#   population.close()
+class ShardedPopulation:
+    def __init__(self, shard_count, capacity=1024, screen_width=1280, screen_height=720, use_path_table=True,
+                 region_size=None, shard_region_size=DEFAULT_SHARD_REGION_SIZE):
+        if np is None:
+            raise ImportError("ShardedPopulation needs NumPy")
+        self.world = World(screen_width, screen_height, use_path_table=use_path_table, region_size=region_size)
+        self.shard_count = shard_count
+        self.capacity = capacity
+        self.count = 0
+        self.shard_region_size = shard_region_size
+        self.shard_of_column = partition_columns(self.world, shard_region_size, shard_count)
+        self.state = SharedState(capacity)
+        self.state.shard[:] = -1
+        world_args = (screen_width, screen_height, use_path_table, region_size)
+        self.connections = []
+        self.processes = []
+        for shard in range(shard_count):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_shard, daemon=True,
+                args=(shard, worker_connection, self.state.memory.name, capacity, world_args,
+                      self.shard_of_column, shard_region_size))
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    # Shared state, in rows by character index
+
+    @property
+    def positions(self):
+        return self.state.pos[:self.count]
+
+    @property
+    def previous_positions(self):
+        return self.state.previous_pos[:self.count]
+
+    def get_draw_positions(self, alpha=1):
+        # Positions alpha of the way from the previous tick's, like Character.get_draw_pos
+        if alpha >= 1:
+            return self.positions
+        return self.previous_positions + (self.positions - self.previous_positions) * alpha
+
+    def get_direction(self, index):
+        return DIRECTIONS[self.state.direction[index]]
+
+    # Commands
+
+    def add_character(self, character_name, initial_pos, speed, direction="down"):
+        # Returns the character's index
+        if self.count == self.capacity:
+            raise ValueError(f"ShardedPopulation is full at {self.capacity} characters")
+        index = self.count
+        self.count += 1
+        character_state = {
+            "name": character_name, "pos": (initial_pos[0], initial_pos[1]),
+            "previous_pos": (initial_pos[0], initial_pos[1]), "speed": speed, "direction": direction,
+        }
+        self.send_to_shard(index, self.get_shard(initial_pos), character_state)
+        return index
+
+    def set_target(self, index, location_name):
+        # Walk the character to a named location
+        self.connections[self.state.shard[index]].send(("target", index, location_name))
+
+    def get_character(self, index):
+        # Everything the owning shard knows about the character, as a dict
+        connection = self.connections[self.state.shard[index]]
+        connection.send(("get", index))
+        return connection.recv()
+
+    def step(self, n=1, dt=1):
+        # Advance every shard by n ticks of dt 1/60 s at once, then hand over whoever crossed into another shard.
+        # Returns the number of handoffs.
+        for connection in self.connections:
+            connection.send(("step", n, dt))
+        handoffs = []
+        for connection in self.connections:
+            handoffs.extend(connection.recv())
+        for index, character_state in handoffs:
+            self.send_to_shard(index, self.get_shard(character_state["pos"]), character_state)
+        return len(handoffs)
+
+    def send_to_shard(self, index, shard, character_state):
+        self.state.shard[index] = shard
+        self.connections[shard].send(("add", index, character_state))
+
+    def get_shard(self, pos):
+        column = min(max(int(pos[0] // self.shard_region_size), 0), len(self.shard_of_column) - 1)
+        return self.shard_of_column[column]
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close",))
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.state.close()
+        self.state.memory.unlink()
+
+def partition_columns(world, region_size, shard_count):
+    # Shard number of every column of regions across the map. Each shard gets a run of neighboring
+    # columns, with about the same number of graph nodes in each.
+    column_count = max(math.ceil(world.screen_width / region_size), 1)
+    node_counts = [0] * column_count
+    for pos in world.graph.nodes.values():
+        node_counts[min(max(int(pos[0] // region_size), 0), column_count - 1)] += 1
+    total = sum(node_counts) or 1
+    shard_of_column = []
+    before = 0
+    for count in node_counts:
+        # The shard whose share of the nodes this column's middle falls in
+        shard_of_column.append(min(int((before + count / 2) / total * shard_count), shard_count - 1))
+        before += count
+    return shard_of_column
+
+# NumPy views of SHARED_FIELDS over one shared memory block, created if name is None or else attached to
+class SharedState:
+    def __init__(self, capacity, name=None):
+        layout = []
+        size = 0
+        for field, dtype, width in SHARED_FIELDS:
+            shape = (capacity, width) if width > 1 else (capacity,)
+            layout.append((field, np.dtype(dtype), shape, size))
+            size += -(-capacity * width * np.dtype(dtype).itemsize // 8) * 8  # Keep every array 8-byte aligned
+        self.memory = SharedMemory(name=name, create=name is None, size=max(size, 1))
+        for field, dtype, shape, offset in layout:
+            setattr(self, field, np.ndarray(shape, dtype, buffer=self.memory.buf, offset=offset))
+
+    def close(self):
+        # The views have to go before the memory can be unmapped
+        for field, _, _ in SHARED_FIELDS:
+            setattr(self, field, None)
+        self.memory.close()
+
+# Worker process side
+
+def run_shard(shard, connection, memory_name, capacity, world_args, shard_of_column, shard_region_size):
+    screen_width, screen_height, use_path_table, region_size = world_args
+    world = World(screen_width, screen_height, use_path_table=use_path_table, region_size=region_size)
+    state = SharedState(capacity, memory_name)
+    shard_of_column = np.asarray(shard_of_column)
+    mover = BatchMovement(world.graph)
+    characters = {}  # key: character index, value: Character moved by this shard
+    rows = None  # Character index of every mover row, rebuilt when characters come or go
+
+    while True:
+        message = connection.recv()
+        command = message[0]
+        if command == "step":
+            _, n, dt = message
+            for _ in range(n):
+                mover.update(dt)
+            count = mover.count
+            if rows is None:
+                rows = np.fromiter((character.shard_index for character in mover.characters), np.int64, count)
+            state.pos[rows] = mover.pos[:count]
+            state.previous_pos[rows] = mover.previous_pos[:count]
+            state.frame_index[rows] = mover.frame_index[:count]
+            state.direction[rows] = mover.direction[:count]
+            state.is_idle[rows] = mover.is_idle[:count]
+
+            # Hand over the characters now in another shard's columns, last row first so removing
+            # one doesn't move another that is leaving
+            columns = np.clip((mover.pos[:count, 0] // shard_region_size).astype(np.int64), 0, len(shard_of_column) - 1)
+            handoffs = []
+            for row in np.flatnonzero(shard_of_column[columns] != shard)[::-1]:
+                character = mover.characters[row]
+                mover.remove(character)
+                del characters[character.shard_index]
+                handoffs.append((character.shard_index, get_character_state(character)))
+            if handoffs:
+                rows = None
+            connection.send(handoffs)
+        elif command == "add":
+            _, index, character_state = message
+            character = make_character(world, character_state)
+            character.shard_index = index  # Its row in the shared arrays
+            characters[index] = character
+            mover.add(character)
+            rows = None
+            row = character.mover_index
+            state.pos[index] = mover.pos[row]
+            state.previous_pos[index] = mover.previous_pos[row]
+            state.frame_index[index] = mover.frame_index[row]
+            state.direction[index] = mover.direction[row]
+            state.is_idle[index] = mover.is_idle[row]
+        elif command == "target":
+            _, index, location_name = message
+            character = characters[index]
+            character.target_location_name = location_name
+            character.compute_path()
+        elif command == "get":
+            character = characters[message[1]]
+            mover.sync_character(character)
+            connection.send(get_character_state(character))
+        elif command == "close":
+            break
+    state.close()
+    connection.close()
+
+def get_character_state(character):
+    # What a shard needs to carry on moving a character, as plain values for the pipe.
+    # A path still handed out in pieces is expanded, since the pieces come from a generator.
+    path = list(character.path)
+    if character.path_segments is not None:
+        for segment in character.path_segments:
+            path.extend(segment)
+    return {
+        "name": character.character_name,
+        "pos": (character.pos.x, character.pos.y),
+        "previous_pos": (character.previous_pos.x, character.previous_pos.y),
+        "speed": character.speed,
+        "direction": character.direction,
+        "frame_index": character.frame_index,
+        "idle_timer": character.idle_timer,
+        "is_idle": character.is_idle,
+        "hunger": character.hunger,
+        "energy": character.energy,
+        "current_location_name": character.current_location_name,
+        "target_location_name": character.target_location_name,
+        "previous_location_name": character.previous_location_name,
+        "path": path,
+    }
+
+def make_character(world, character_state):
+    character = Character(world, character_state["name"], None, npc_animations_config, npc_idle_config,
+                          character_state["pos"], character_state["speed"], character_state["direction"],
+                          load_images=False)
+    character.previous_pos.update(character_state["previous_pos"])
+    for field in ("frame_index", "idle_timer", "is_idle", "hunger", "energy", "current_location_name",
+                  "target_location_name", "previous_location_name", "path"):
+        if field in character_state:
+            setattr(character, field, character_state[field])
+    if "current_location_name" not in character_state and not character.check_for_allowed_position():
+        character.current_location_name = None
+    return character
@@ -0,0 +1,134 @@
+import pygame
+from world import World
+from characters import CharacterManager, player_animations_config, player_idle_config, npc_animations_config, npc_idle_config
+from time_manager import TimeManager
+from farm import FarmGame
+from ui import Modal
+from profiler import FrameProfiler
+from npc_schedule import NPCScheduler, daily_schedules
+
+in_game_movement_speed = 200  # Pixels per in-game minute
+base_tick_rate = 60  # Character speeds, animation speeds and idle timers are per tick at this rate
+
+# Sprite sheets used by the starting characters, so they can be loaded ahead of time
+player_sheet_path = "Cute_Fantasy_Free/Player/Player.png"
+skeleton_sheet_path = "Cute_Fantasy_Free/Enemies/Skeleton.png"
+sprite_sheet_paths = [player_sheet_path, skeleton_sheet_path]
+growth_stage_minutes = [60, 60, 60]  # In-game minutes for each crop stage when farms follow TimeManager
+
+# Game state that advances in fixed ticks, with or without a display.
+# Rendering only reads from it, so the frame rate and the tick rate can differ.
+class Simulation:
+    def __init__(self, screen_width=1280, screen_height=720, tick_rate=60, load_images=True, compact_graph=False, use_path_table=True, region_size=None, flow_fields=False, batch_movement=False, async_paths=False, path_processes=0, separation=False, farm_clock="ms"):
+        self.tick_rate = tick_rate  # Ticks per simulated second
+        self.tick_count = 0
+        self.tick_scale = base_tick_rate / tick_rate  # Length of a tick in 1/60 s
+        self.profiler = FrameProfiler(enabled=False)  # Times the update phases of each tick when enabled
+        self.recorder = None  # InputRecorder logging the clicks handled, if any
+
+        self.world = World(screen_width, screen_height, compact_graph, use_path_table, region_size, flow_fields)
+        self.graph = self.world.graph
+        self.time_manager = TimeManager()
+
+        # Initialize the CharacterManager and add characters
+        self.character_manager = CharacterManager(self.world, load_images, batch_movement, async_paths, path_processes, separation)
+        self.add_characters()
+
+        # Send NPCs about their daily routines
+        self.npc_scheduler = NPCScheduler()
+        for character_name, schedule in daily_schedules.items():
+            self.npc_scheduler.add(self.character_manager.NPC[character_name], schedule, self.time_manager.total_minutes)
+
+        # Initialize the Modal
+        self.modal = Modal(self.world.modal_position, self.world.modal_size)
+
+        # Initialize the FarmGame once when the simulation is created.
+        # Crops grow in simulated milliseconds ("ms") or in TimeManager minutes ("minutes").
+        self.farm_clock = farm_clock
+        if farm_clock == "minutes":
+            self.farm_game = FarmGame(self.modal.rect, growth_stage_minutes)
+        elif farm_clock == "ms":
+            self.farm_game = FarmGame(self.modal.rect)
+        else:
+            raise ValueError(f"Unknown farm clock: {farm_clock}")
+        self.modal.farm_game = self.farm_game
+
+    def add_characters(self):
+        world = self.world
+        initial_pos = world.allowed_positions[0]['pos']
+        self.character_manager.add_character("player", player_sheet_path, player_animations_config, player_idle_config,
+                                             initial_pos=initial_pos, speed=20, is_player=True)
+        self.character_manager.add_character("enemy1", skeleton_sheet_path, npc_animations_config, npc_idle_config,
+                                             initial_pos=(world.scale_position(pygame.Vector2(2990, 3860))), direction="left", speed=1)
+        self.character_manager.add_character("enemy2", skeleton_sheet_path, npc_animations_config, npc_idle_config,
+                                             initial_pos=(world.scale_position(pygame.Vector2(3000, 4350))), direction="left", speed=1)
+        self.character_manager.add_character("butcher", player_sheet_path, npc_animations_config, npc_idle_config,
+                                             initial_pos=world.allowed_positions[5]['pos'], speed=1)
+        self.character_manager.add_character("brewer", player_sheet_path, npc_animations_config, npc_idle_config,
+                                             initial_pos=world.allowed_positions[4]['pos'], speed=1)
+
+    def get_sim_time_ms(self):
+        # Simulated milliseconds since the start, used instead of the wall clock
+        return self.tick_count * 1000 // self.tick_rate
+
+    def get_farm_time(self):
+        if self.farm_clock == "minutes":
+            return self.time_manager.total_minutes
+        return self.get_sim_time_ms()
+
+    def handle_click(self, event, world_pos=None):
+        # world_pos is the click in world coordinates when the view is scrolled or zoomed
+        if self.recorder is not None:
+            self.recorder.record_click(event, world_pos)
+        if self.modal.active:
+            self.modal.handle_event(event)
+        if world_pos is None:
+            world_pos = event.pos
+        self.character_manager.player.handle_input(pygame.Vector2(world_pos))
+
+    def step(self, n=1):
+        # Run the n ticks of one frame
+        self.character_manager.begin_frame()
+        for _ in range(n):
+            self.tick()
+
+    def close(self):
+        # Release what outlives the game otherwise, i.e. path planning worker processes
+        self.character_manager.close()
+
+    def tick(self):
+        self.tick_count += 1
+        modal = self.modal
+        character_manager = self.character_manager
+
+        profiler = self.profiler
+
+        if modal.active:
+            with profiler.phase("modal.update"):
+                modal.update()
+
+        # Update mini-games
+        with profiler.phase("farm_game.update"):
+            self.farm_game.update(self.get_farm_time())
+
+        # Update character positions and get distance moved by player
+        with profiler.phase("character_manager.update"):
+            distance_moved = character_manager.update(self.tick_scale)
+
+        # Advance time whenever Player is moving
+        if distance_moved > 0:
+            time_increment_in_minutes = distance_moved / in_game_movement_speed
+            self.time_manager.advance_time(time_increment_in_minutes)
+
+        # Let the NPCs whose time has come choose where to go
+        with profiler.phase("npc_scheduler.update"):
+            self.npc_scheduler.update(self.time_manager.total_minutes)
+
+        # Check if player has arrived at a new location
+        with profiler.phase("arrivals"):
+            if character_manager.player.has_arrived_at_new_location():
+                # Display modal
+                modal.active = True
+                modal.set_content(character_manager.player.current_location_name)
+            elif character_manager.player.current_location_name is None:
+                modal.active = False
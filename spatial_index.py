@@ -0,0 +1,159 @@
+import math
+from array import array
+
+# Uniform grid of square cells for nearest-point lookups.
+# Items are stored by key in the cell containing their position, so a query only looks at the cells
+# around the query point instead of every item.
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # key: (cell_x, cell_y), value: list of (key, x, y)
+        self.positions = {}  # key: item key, value: (x, y)
+        # Bounds of the occupied cells, so searches stop once they have covered every item
+        self.min_cell_x = self.min_cell_y = math.inf
+        self.max_cell_x = self.max_cell_y = -math.inf
+
+    def __len__(self):
+        return len(self.positions)
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, pos):
+        x, y = pos
+        cell = self.cell_of(x, y)
+        self.cells.setdefault(cell, []).append((key, x, y))
+        self.positions[key] = (x, y)
+        self.min_cell_x = min(self.min_cell_x, cell[0])
+        self.min_cell_y = min(self.min_cell_y, cell[1])
+        self.max_cell_x = max(self.max_cell_x, cell[0])
+        self.max_cell_y = max(self.max_cell_y, cell[1])
+
+    def remove(self, key):
+        x, y = self.positions.pop(key)
+        cell = self.cell_of(x, y)
+        bucket = self.cells[cell]
+        bucket[:] = [item for item in bucket if item[0] != key]
+        if not bucket:
+            del self.cells[cell]
+
+    def nearest(self, pos, max_distance=math.inf):
+        # Key of the item closest to pos that is strictly closer than max_distance, or None
+        if not self.positions:
+            return None
+        x, y = pos
+        cell_x, cell_y = self.cell_of(x, y)
+        cells = self.cells
+        cell_size = self.cell_size
+        best_key = None
+        best_dist_sq = max_distance * max_distance
+
+        # Rings of cells at growing distance; ring r is the border of the (2r+1)x(2r+1) block around the query cell
+        max_ring = max(cell_x - self.min_cell_x, self.max_cell_x - cell_x,
+                       cell_y - self.min_cell_y, self.max_cell_y - cell_y, 0)
+        ring = 0
+        while ring <= max_ring:
+            for ring_x in range(cell_x - ring, cell_x + ring + 1):
+                # Whole columns on the left and right edge, only the top and bottom cell in between
+                step = 1 if ring_x in (cell_x - ring, cell_x + ring) else 2 * ring or 1
+                for ring_y in range(cell_y - ring, cell_y + ring + 1, step):
+                    bucket = cells.get((ring_x, ring_y))
+                    if not bucket:
+                        continue
+                    for key, item_x, item_y in bucket:
+                        dist_sq = (item_x - x) ** 2 + (item_y - y) ** 2
+                        if dist_sq < best_dist_sq:
+                            best_dist_sq = dist_sq
+                            best_key = key
+            # Anything in a later ring is at least ring * cell_size away
+            reach = ring * cell_size
+            if reach * reach >= best_dist_sq:
+                break
+            ring += 1
+        return best_key
+
+# Read-only SpatialGrid over points already held in coordinate arrays, e.g. a CompactGraph's xs and ys.
+# Keys are the indexes 0..n-1 into those arrays. Instead of dict buckets the keys are kept in one array
+# sorted by cell, with the cells of the bounding box in column-major (x-major) order and the keys of cell c at
+# keys[cell_offsets[c]:cell_offsets[c + 1]], so the index costs two ints per point plus one per cell.
+# Lookups visit cells and keys in the same order as SpatialGrid and give the same answers.
+class PackedSpatialGrid:
+    def __init__(self, xs, ys, cell_size):
+        self.xs = xs
+        self.ys = ys
+        self.cell_size = cell_size
+        count = len(xs)
+        if count:
+            cell_xs = array('i', (int(x // cell_size) for x in xs))
+            cell_ys = array('i', (int(y // cell_size) for y in ys))
+            self.min_cell_x, self.max_cell_x = min(cell_xs), max(cell_xs)
+            self.min_cell_y, self.max_cell_y = min(cell_ys), max(cell_ys)
+        else:
+            cell_xs = cell_ys = array('i')
+            self.min_cell_x = self.min_cell_y = 0
+            self.max_cell_x = self.max_cell_y = -1
+        self.columns = self.max_cell_x - self.min_cell_x + 1
+        self.rows = self.max_cell_y - self.min_cell_y + 1
+
+        # Counting sort of the keys by cell, keeping keys in the same cell in increasing order
+        cells = array('i', ((cell_x - self.min_cell_x) * self.rows + cell_y - self.min_cell_y
+                            for cell_x, cell_y in zip(cell_xs, cell_ys)))
+        del cell_xs, cell_ys
+        offsets = array('i', [0]) * (self.columns * self.rows + 1)
+        for cell in cells:
+            offsets[cell + 1] += 1
+        for cell in range(len(offsets) - 1):
+            offsets[cell + 1] += offsets[cell]
+        keys = array('i', [0]) * count
+        next_slot = offsets[:-1]
+        for key, cell in enumerate(cells):
+            keys[next_slot[cell]] = key
+            next_slot[cell] += 1
+        self.keys = keys
+        self.cell_offsets = offsets
+
+    def __len__(self):
+        return len(self.keys)
+
+    def nearest(self, pos, max_distance=math.inf):
+        # Key of the point closest to pos that is strictly closer than max_distance, or None
+        if not self.keys:
+            return None
+        x, y = pos
+        cell_size = self.cell_size
+        cell_x, cell_y = int(x // cell_size), int(y // cell_size)
+        xs = self.xs
+        ys = self.ys
+        keys = self.keys
+        offsets = self.cell_offsets
+        min_cell_x, max_cell_x = self.min_cell_x, self.max_cell_x
+        min_cell_y, max_cell_y = self.min_cell_y, self.max_cell_y
+        rows = self.rows
+        best_key = None
+        best_dist_sq = max_distance * max_distance
+
+        # Rings of cells at growing distance, as in SpatialGrid.nearest, skipping cells outside the bounding box
+        max_ring = max(cell_x - min_cell_x, max_cell_x - cell_x, cell_y - min_cell_y, max_cell_y - cell_y, 0)
+        ring = 0
+        while ring <= max_ring:
+            for ring_x in range(max(cell_x - ring, min_cell_x), min(cell_x + ring, max_cell_x) + 1):
+                column_start = (ring_x - min_cell_x) * rows - min_cell_y
+                if ring_x in (cell_x - ring, cell_x + ring):
+                    ring_ys = range(max(cell_y - ring, min_cell_y), min(cell_y + ring, max_cell_y) + 1)
+                else:
+                    # Only the top and bottom cell in between
+                    ring_ys = [ring_y for ring_y in (cell_y - ring, cell_y + ring) if min_cell_y <= ring_y <= max_cell_y]
+                for ring_y in ring_ys:
+                    cell = column_start + ring_y
+                    for index in range(offsets[cell], offsets[cell + 1]):
+                        key = keys[index]
+                        dist_sq = (xs[key] - x) ** 2 + (ys[key] - y) ** 2
+                        if dist_sq < best_dist_sq:
+                            best_dist_sq = dist_sq
+                            best_key = key
+            # Anything in a later ring is at least ring * cell_size away
+            reach = ring * cell_size
+            if reach * reach >= best_dist_sq:
+                break
+            ring += 1
+        return best_key
@@ -0,0 +1,113 @@
+import pygame
+
+# Function to load a specific row of sprites from a sprite sheet
+def load_sprites(sprite_sheet, row, num_columns, sprite_width=32, sprite_height=32, scale_factor=2, flip=False):
+    sprites = []
+    for col in range(num_columns):
+        sprite = sprite_sheet.subsurface((col * sprite_width, row * sprite_height, sprite_width, sprite_height))
+        sprite = pygame.transform.scale(sprite, (sprite_width * scale_factor, sprite_height * scale_factor))
+        if flip:
+            sprite = pygame.transform.flip(sprite, True, False)
+        sprites.append(sprite)
+    return sprites
+
+# Process-wide cache of sprite sheets and animation frames.
+# Characters that share a sheet, config, scale and flip share the same frame lists, so each sheet is
+# decoded, cut, scaled and flipped once no matter how many characters use it.
+class AnimationCache:
+    def __init__(self):
+        self.sheets = {}  # key: sheet path, value: decoded Surface
+        self.frames = {}  # key: (sheet path, row, num_columns, width, height, scale, flip), value: list of Surfaces
+        self.animations = {}  # key: (sheet path, config, scale), value: dict of direction -> frame list
+        self.atlas = None  # Surface all frames were packed into by pack_atlas, if any
+        self.loader = None  # AssetLoader that decodes sheets in the background, if any
+        self.bundle = None  # AssetBundle with baked frames, if any
+
+    def get_sheet(self, sheet_path):
+        sheet = self.sheets.get(sheet_path)
+        if sheet is None:
+            if self.loader is not None:
+                sheet = self.loader.get(sheet_path)
+            else:
+                sheet = pygame.image.load(sheet_path)
+            self.sheets[sheet_path] = sheet
+        return sheet
+
+    def get_frames(self, sheet_path, row, num_columns, sprite_width=32, sprite_height=32, scale_factor=2, flip=False):
+        key = (sheet_path, row, num_columns, sprite_width, sprite_height, scale_factor, flip)
+        frames = self.frames.get(key)
+        if frames is None and self.bundle is not None:
+            # Baked frames are used as they are, straight from the memory-mapped bundle, already in the display's
+            # pixel layout
+            frames = self.bundle.get_frames(key)
+            if frames is not None:
+                self.frames[key] = frames
+                self.atlas = self.bundle.get_atlas()
+        if frames is None:
+            frames = load_sprites(self.get_sheet(sheet_path), row, num_columns, sprite_width, sprite_height, scale_factor, flip)
+            # Match the display's pixel format once it exists, so blits don't convert every frame
+            if pygame.display.get_surface() is not None:
+                frames = [frame.convert_alpha() for frame in frames]
+            self.frames[key] = frames
+        return frames
+
+    def get_animations(self, sheet_path, config, scale_factor=2):
+        # config maps direction to (row, num_columns, flip), as in player_animations_config
+        key = (sheet_path, tuple(sorted(config.items())), scale_factor)
+        animations = self.animations.get(key)
+        if animations is None:
+            animations = {}
+            for direction, params in config.items():
+                row, num_columns, flip = params
+                animations[direction] = self.get_frames(sheet_path, row, num_columns, scale_factor=scale_factor, flip=flip)
+            self.animations[key] = animations
+        return animations
+
+    def pack_atlas(self, max_width=2048):
+        # Copy every cached frame into one texture and swap the frames for subsurfaces of it.
+        # Frame lists are updated in place, so characters already holding them see the atlas frames.
+        frame_lists = list(self.frames.values())
+        all_frames = [frame for frames in frame_lists for frame in frames]
+        if not all_frames:
+            return None
+        if self.atlas is not None and all(frame.get_parent() is self.atlas for frame in all_frames):
+            return self.atlas  # Already packed, e.g. every frame came from the bundle's atlas
+
+        # Shelf packing: fill rows left to right, start a new row when one is full
+        placements = []
+        x = y = shelf_height = width = 0
+        for frame in all_frames:
+            frame_width, frame_height = frame.get_size()
+            if x + frame_width > max_width:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            placements.append((x, y))
+            x += frame_width
+            width = max(width, x)
+            shelf_height = max(shelf_height, frame_height)
+        height = y + shelf_height
+
+        atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        index = 0
+        for frames in frame_lists:
+            for frame_number, frame in enumerate(frames):
+                atlas_x, atlas_y = placements[index]
+                atlas.blit(frame, (atlas_x, atlas_y))
+                frames[frame_number] = atlas.subsurface((atlas_x, atlas_y, *frame.get_size()))
+                index += 1
+        self.atlas = atlas
+        return atlas
+
+    def clear(self):
+        self.sheets.clear()
+        self.frames.clear()
+        self.animations.clear()
+        self.atlas = None
+        self.loader = None
+        self.bundle = None
+
+# Shared by every Character in the process
+animation_cache = AnimationCache()
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+import pygame
+
+# Shared fonts and rendered text.
+# Fonts are loaded once per (name, size), and rendered text surfaces are kept in an LRU cache keyed on
+# (font name, size, text, color), so text that doesn't change is never rendered twice.
+class TextCache:
+    def __init__(self, max_surfaces=256):
+        self.fonts = {}  # key: (font name, size), value: pygame.font.Font
+        self.surfaces = OrderedDict()  # key: (font name, size, text, color), value: rendered Surface
+        self.max_surfaces = max_surfaces
+
+    def get_font(self, size, font_name=None):
+        # font_name None is pygame's default font, as in pygame.font.Font(None, size)
+        key = (font_name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(font_name, size)
+            self.fonts[key] = font
+        return font
+
+    def preload(self, sizes, font_name=None):
+        # Load fonts up front, since loading one reads from disk
+        for size in sizes:
+            self.get_font(size, font_name)
+
+    def render(self, text, size, color, font_name=None):
+        key = (font_name, size, text, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.get_font(size, font_name).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+# Shared by the HUD, modals and buttons
+text_cache = TextCache()
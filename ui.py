@@ -0,0 +1,73 @@
+import pygame
+from text_cache import text_cache
+
+# Define a Button class for modal interactions
+class Button:
+    def __init__(self, rect, text, callback):
+        self.rect = rect
+        self.text = text
+        self.callback = callback
+        self.font = text_cache.get_font(24)
+        self.text_surf = text_cache.render(self.text, 24, (255, 255, 255))
+        self.text_rect = self.text_surf.get_rect(center=self.rect.center)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.rect.collidepoint(event.pos):
+                self.callback()
+
+    def draw(self, surface):
+        pygame.draw.rect(surface, (100, 100, 100), self.rect)
+        pygame.draw.rect(surface, (255, 255, 255), self.rect, 2)
+        surface.blit(self.text_surf, self.text_rect)
+
+# Define the Modal class to handle different modal windows
+class Modal:
+    def __init__(self, position, size):
+        self.rect = pygame.Rect(position.x, position.y, size.x, size.y)
+        self.active = False
+        self.background_image = None
+        self.interactive_elements = []
+        self.location_name = ""
+        self.farm_game = None  # The farming mini-game shown at the farm, set once it exists
+        self.curr_game = None  # Will hold the farming mini-game instance when at farm
+
+    def set_content(self, location_name):
+        self.location_name = location_name
+        self.curr_game = None
+        # Load the background image and interactive components based on location
+        if self.location_name == "Farm":
+            self.background_image = pygame.Surface(self.rect.size)
+            self.background_image.fill((200, 255, 200))  # Light green background
+            self.curr_game = self.farm_game
+        else:
+            self.background_image = pygame.Surface(self.rect.size)
+            self.background_image.fill((200, 200, 200))
+            self.curr_game = None  # No farming game at other locations
+
+    def handle_event(self, event):
+        if self.active:
+            if self.curr_game is not None and self.curr_game == self.farm_game:
+                self.farm_game.handle_event(event)
+
+    def update(self):
+        """
+        if self.active:
+            if self.curr_game == self.farm_game:
+                self.farm_game.update()
+        """
+
+    def draw(self, surface):
+        if self.active:
+            # Draw the modal background
+            surface.blit(self.background_image, self.rect.topleft)
+            # Draw the interactive elements
+            if self.location_name == "Farm":
+                self.farm_game.draw(surface)
+            else:
+                # For other locations, display the location name
+                text_surf = text_cache.render(self.location_name, 36, (0, 0, 0))
+                text_rect = text_surf.get_rect(center=self.rect.center)
+                surface.blit(text_surf, text_rect)
+            # Draw the modal border
+            pygame.draw.rect(surface, (0, 0, 0), self.rect, 3)
@@ -0,0 +1,247 @@
+import pygame
+import math
+import struct
+import heapq  # For priority queue in A* algorithm
+from path_table import PathTable
+from compact_graph import CompactGraph
+from regions import RegionGraph
+from flow_field import FlowFieldCache
+from spatial_index import SpatialGrid
+
+MAP_PATH = "map.jpg"
+
+
+def read_jpeg_size(path):
+    # Width and height from a JPEG's start-of-frame header, without decoding the image
+    with open(path, "rb") as image_file:
+        if image_file.read(2) != b"\xff\xd8":
+            raise ValueError(f"{path} is not a JPEG")
+        while True:
+            marker = image_file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError(f"No frame header found in {path}")
+            if marker[1] in (0x01, 0xFF) or 0xD0 <= marker[1] <= 0xD7:
+                continue  # Fill bytes and markers without a length
+            (length,) = struct.unpack(">H", image_file.read(2))
+            # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">xHH", image_file.read(5))
+                return width, height
+            image_file.seek(length - 2, 1)
+
+
+# Size of map.jpg, so positions can be scaled without decoding the image
+map_width, map_height = read_jpeg_size(MAP_PATH)
+
+# Grid settings
+grid_size = 20  # Size of each grid cell in pixels
+
+# Define allowed movement positions with names based on the original image's coordinates
+allowed_positions_original = [
+    {"name": "Farm", "pos": pygame.Vector2(1300, 2500)},
+    {"name": "Miller", "pos": pygame.Vector2(1100, 5000)},
+    {"name": "Tavern", "pos": pygame.Vector2(4100, 630)},
+    {"name": "Bakery", "pos": pygame.Vector2(5300, 630)},
+    {"name": "Brewery", "pos": pygame.Vector2(6600, 630)},
+    {"name": "Butcher", "pos": pygame.Vector2(7900, 630)},
+    {"name": "Herbalist", "pos": pygame.Vector2(4300, 2600)},
+    {"name": "Cartwright", "pos": pygame.Vector2(4200, 4800)},
+    {"name": "Carpenter", "pos": pygame.Vector2(5000, 5800)},
+    {"name": "Blacksmith", "pos": pygame.Vector2(6400, 5800)},
+    {"name": "Elder", "pos": pygame.Vector2(7600, 5800)},
+    {"name": "Manor", "pos": pygame.Vector2(9700, 5900)},
+    {"name": "Church", "pos": pygame.Vector2(9500, 4300)},
+    {"name": "Market", "pos": pygame.Vector2(9300, 1800)},
+]
+# Define modal coordinates (position and size)
+modal_position_original = pygame.Vector2(4800, 1720)
+modal_size_original = pygame.Vector2(3000, 3380)
+
+# Define intermediate nodes (positions the player passes through but can't stop at)
+intermediate_positions_original = [
+    {"pos": pygame.Vector2(2500, 4500)},
+    {"pos": pygame.Vector2(3500, 2500)},
+    {"pos": pygame.Vector2(4500, 2500)},
+]
+
+# Intermediate nodes get the ids after the named locations
+intermediate_node_ids = list(range(len(allowed_positions_original), len(allowed_positions_original) + len(intermediate_positions_original)))
+
+# Define connections
+connections = [
+    ("Farm", intermediate_node_ids[0]),
+    (intermediate_node_ids[0], "Herbalist"),
+    ("Herbalist", "Tavern"),
+    ("Tavern", "Bakery"),
+    ("Bakery", "Brewery"),
+    ("Brewery", "Butcher"),
+    ("Herbalist", "Cartwright"),
+    ("Cartwright", "Miller"),
+    ("Miller", "Carpenter"),
+    ("Carpenter", "Blacksmith"),
+    ("Blacksmith", "Elder"),
+    ("Elder", "Manor"),
+    ("Manor", "Church"),
+    ("Church", "Market"),
+    ("Market", "Butcher"),
+    ("Butcher", "Elder"),
+    # ... add more connections as needed
+]
+
+# Define the graph nodes and edges
+class Graph:
+    def __init__(self, cell_size=grid_size):
+        self.nodes = {}  # key: node id, value: position
+        self.edges = {}  # key: node id, value: list of tuples (neighbor_id, cost)
+        self.node_index = SpatialGrid(cell_size)  # Node positions for nearest-node lookups
+        self.listeners = []  # Objects told about node and edge changes, e.g. a PathTable
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def add_node(self, node_id, position):
+        self.nodes[node_id] = position
+        self.edges[node_id] = []
+        self.node_index.insert(node_id, position)
+        for listener in self.listeners:
+            listener.node_added(node_id)
+
+    def add_bidirectional_edge(self, from_node, to_node, cost):
+        self.edges[from_node].append((to_node, cost))
+        self.edges[to_node].append((from_node, cost))
+        for listener in self.listeners:
+            listener.edge_added(from_node, to_node, cost)
+
+    def remove_bidirectional_edge(self, from_node, to_node):
+        # Remove the edge between the two nodes in both directions
+        for neighbor, cost in self.edges[from_node]:
+            if neighbor == to_node:
+                break
+        else:
+            raise KeyError((from_node, to_node))
+        self.edges[from_node].remove((to_node, cost))
+        self.edges[to_node].remove((from_node, cost))
+        for listener in self.listeners:
+            listener.edge_removed(from_node, to_node, cost)
+
+    def nearest_node(self, pos):
+        # Find the closest node to a position (could be an intermediate node)
+        return self.node_index.nearest(pos)
+
+# Add edges (paths) between nodes
+def distance(pos1, pos2):
+    return (pos1 - pos2).length()
+
+# A* Pathfinding algorithm
+def heuristic(graph, a, b):
+    if isinstance(graph, CompactGraph):
+        return graph.heuristic(a, b)
+    return (graph.nodes[a] - graph.nodes[b]).length()
+
+def astar_search(graph, start, goal):
+    if isinstance(graph, CompactGraph):
+        return graph.astar_search(start, goal)
+
+    frontier = []
+    heapq.heappush(frontier, (0, start))
+    came_from = {start:None}
+    cost_so_far = {start: 0}
+
+    while frontier:
+        _, current = heapq.heappop(frontier)
+
+        if current == goal:
+            break
+
+        for neighbor, cost in graph.edges[current]:
+            new_cost = cost_so_far[current] + cost
+            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
+                cost_so_far[neighbor] = new_cost
+                priority = new_cost + heuristic(graph, goal, neighbor)
+                heapq.heappush(frontier, (priority, neighbor))
+                came_from[neighbor] = current
+
+    # Reconstruct path
+    current = goal
+    path = []
+    while current != start:
+        path.append(current)
+        current = came_from[current]
+    path.append(start)
+    path.reverse()
+    return path
+
+# The town scaled to the display size: named locations, modal placement and the road graph
+# Set compact_graph to store the graph as a CompactGraph, and use_path_table=False to route with A*
+# instead of the all-pairs table, which grows with the square of the node count. Without the table,
+# region_size routes through a RegionGraph of regions that size instead of a flat A* over the whole graph,
+# and flow_fields routes everyone heading to the same place along one shared FlowField, ahead of either.
+class World:
+    def __init__(self, screen_width, screen_height, compact_graph=False, use_path_table=True, region_size=None, flow_fields=False):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.grid_size = grid_size
+
+        # Scale allowed positions
+        self.allowed_positions = []
+        for loc in allowed_positions_original:
+            scaled_pos = self.scale_position(loc["pos"])
+            self.allowed_positions.append({"name": loc["name"], "pos": scaled_pos})
+
+        # Index named locations by position, keyed by their index in allowed_positions
+        self.location_index = SpatialGrid(grid_size)
+        for index, loc in enumerate(self.allowed_positions):
+            self.location_index.insert(index, loc['pos'])
+
+        # Scale modal position and size
+        self.modal_position = self.scale_position(modal_position_original)
+        self.modal_size = self.scale_position(modal_size_original)
+
+        # Scale intermediate positions
+        self.intermediate_positions = [self.scale_position(node['pos']) for node in intermediate_positions_original]
+
+        # Number the nodes: named locations first, then intermediate nodes
+        self.node_ids = {loc['name']: node_id for node_id, loc in enumerate(self.allowed_positions)}  # Map location names to node ids
+        positions = [loc['pos'] for loc in self.allowed_positions] + self.intermediate_positions
+        edges = ((from_node, to_node, distance(positions[from_node], positions[to_node]))
+                 for from_node, to_node in ((self.get_node_id(from_loc), self.get_node_id(to_loc))
+                                            for from_loc, to_loc in connections))
+
+        # Create the graph; the compact one is filled straight from the nodes and edges
+        if compact_graph:
+            self.graph = CompactGraph.from_edges(positions, edges, grid_size)
+        else:
+            self.graph = Graph()
+            for node_id, pos in enumerate(positions):
+                self.graph.add_node(node_id, pos)
+            for from_node, to_node, cost in edges:
+                self.graph.add_bidirectional_edge(from_node, to_node, cost)
+
+        # Shortest paths between every pair of nodes, kept up to date as edges change
+        self.path_table = PathTable(self.graph) if use_path_table else None
+
+        # Portal graph over regions of the map, for towns too big for the path table
+        self.region_graph = RegionGraph(self.graph, region_size) if region_size and not use_path_table else None
+
+        # Next hops towards each destination characters are heading for, for crowds without the path table
+        self.flow_fields = FlowFieldCache(self.graph) if flow_fields and not use_path_table else None
+
+    def scale_position(self, pos):
+        # Scale a position from the original image size to the scaled display size.
+        x_scale = self.screen_width / map_width
+        y_scale = self.screen_height / map_height
+        return pygame.Vector2(pos.x * x_scale, pos.y * y_scale)
+
+    def nearest_location(self, pos, max_distance=math.inf):
+        # The named location closest to pos and strictly closer than max_distance, or None
+        index = self.location_index.nearest(pos, max_distance)
+        if index is None:
+            return None
+        return self.allowed_positions[index]
+
+    # Convert named locations to node IDs in connections
+    def get_node_id(self, name_or_id):
+        if isinstance(name_or_id, str):
+            return self.node_ids[name_or_id]
+        else:
+            return name_or_id